@@ -6,9 +6,10 @@ import numpy as np
 import pandas as pd
 from tqdm import tqdm
 from datetime import date, datetime, timedelta
-from sqlalchemy import create_engine, insert, delete
+from sqlalchemy import create_engine, insert, delete, inspect, text
 import json
 import os
+from google_flight_analysis.normalize import normalize
 
 __all__ = ['CacheControl']
 
@@ -36,7 +37,8 @@ class _CacheControl:
 	def cache(self, obj, db = True):
 		fname = self.directory + _CacheControl._get_file_name(obj.origin, obj.dest, access = False)
 		access = self.access + _CacheControl._get_file_name(obj.origin, obj.dest, access = True)
-		df = obj.data
+		# store the normalized numeric/categorical columns too
+		df = normalize(obj.data.copy())
 		current_access = df['Access Date'].values[0]
 
 		if db:
@@ -48,6 +50,7 @@ class _CacheControl:
 					raise Exception("The provided db file name does not exist or URL is malformed.")
 		
 			engine = create_engine("sqlite:///{db}".format(db = self.directory))
+			_CacheControl._add_columns(engine, 'flights', df)
 			df.to_sql(name='flights', index = False, if_exists='append', con=engine)
 			engine.dispose()
 
@@ -68,6 +71,22 @@ class _CacheControl:
 		with open(access, 'w') as file:
 			file.write(current_access)
 
+	'''
+		Add the columns of df that an existing table lacks (tables written before the
+		normalized columns existed), so rows can still be appended to it
+	'''
+	@staticmethod
+	def _add_columns(engine, table, df):
+		inspector = inspect(engine)
+		if not inspector.has_table(table):
+			return
+
+		existing = {column['name'] for column in inspector.get_columns(table)}
+		with engine.begin() as conn:
+			for name in df.columns:
+				if name not in existing:
+					conn.execute(text('ALTER TABLE "{t}" ADD COLUMN "{c}" {type}'.format(t = table, c = name, type = _sql_type(df[name]))))
+
 	'''
 		Check that the scraping instance is valid
 	'''
@@ -103,4 +122,14 @@ class _CacheControl:
 
 
 
+def _sql_type(col):
+	if pd.api.types.is_bool_dtype(col) or pd.api.types.is_integer_dtype(col):
+		return 'INTEGER'
+	if pd.api.types.is_float_dtype(col):
+		return 'REAL'
+	if pd.api.types.is_datetime64_any_dtype(col):
+		return 'TIMESTAMP'
+	return 'TEXT'
+
+
 CacheControl = _CacheControl()
\ No newline at end of file
@@ -0,0 +1,218 @@
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException, TimeoutException
+import chromedriver_autoinstaller
+from contextlib import contextmanager
+from collections import deque
+import threading
+
+__all__ = ['DriverPool', 'make_driver', 'lean_options', 'BLOCKED_URLS']
+
+_install_lock = threading.Lock()
+_installed = False
+
+# Requests the lean profile drops through CDP. Results are read from page text only,
+# so images, fonts, media and third-party trackers are never needed.
+BLOCKED_URLS = [
+	# images
+	'*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*',
+	# fonts
+	'*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*fonts.googleapis.com*', '*fonts.gstatic.com*',
+	# media
+	'*.mp4*', '*.webm*', '*.mp3*', '*.ogg*',
+	# third-party / tracking
+	'*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*',
+	'*googleadservices.com*', '*googlesyndication.com*', '*play.google.com/log*'
+]
+
+def lean_options():
+	'''
+		Chrome options for scraping: headless, no images and an eager page load strategy.
+	'''
+	options = webdriver.ChromeOptions()
+	options.add_argument('--headless=new')
+	options.add_argument('--window-size=1920,1080')
+	options.add_argument('--disable-gpu')
+	options.add_argument('--disable-extensions')
+	options.add_argument('--mute-audio')
+	options.add_argument('--blink-settings=imagesEnabled=false')
+	options.add_experimental_option('prefs', {
+		'profile.managed_default_content_settings.images': 2,
+		'profile.managed_default_content_settings.media_stream': 2
+	})
+	# return after DOMContentLoaded, readiness is decided by the results wait
+	options.page_load_strategy = 'eager'
+	return options
+
+def make_driver(lean = False):
+	'''
+		Start Chrome, installing chromedriver on first use only.
+
+		lean: run the lean profile (see lean_options), blocking BLOCKED_URLS through CDP
+	'''
+	global _installed
+	with _install_lock:
+		if not _installed:
+			chromedriver_autoinstaller.install() # check if chromedriver is installed correctly and on path
+			_installed = True
+
+	if not lean:
+		driver = webdriver.Chrome()
+		driver.maximize_window()
+		return driver
+
+	driver = webdriver.Chrome(options = lean_options())
+	driver.execute_cdp_cmd('Network.enable', {})
+	driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
+	return driver
+
+
+class DriverPool:
+	'''
+		Pool of reusable WebDriver instances.
+
+		size: max number of live browsers
+		max_pages: recycle a browser after it has loaded this many pages (None to never recycle)
+		factory: callable returning a new driver, defaults to make_driver
+		lean: start browsers with the lean scraping profile when using the default factory
+		scheduler: optional ResourceScheduler, new browsers are only started within its
+		memory/CPU budget and browsers it finds oversized are recycled
+		poll: seconds between budget checks while waiting for one
+	'''
+
+	def __init__(self, size = 1, max_pages = 50, factory = None, lean = False, scheduler = None, poll = 1.0):
+		assert size >= 1, "Pool size must be at least 1."
+		self.size = size
+		self.max_pages = max_pages
+		self.factory = factory if factory is not None else (lambda: make_driver(lean = lean))
+		self.scheduler = scheduler
+		self.poll = poll
+
+		self._idle = deque()
+		self._pages = {}
+		self._lock = threading.Condition()
+		self._created = 0
+		self._closed = False
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def __repr__(self):
+		return "DriverPool(size:{size}, live:{live}, idle:{idle})".format(
+			size = self.size, live = self._created, idle = len(self._idle)
+		)
+
+	def __str__(self):
+		return self.__repr__()
+
+	def acquire(self):
+		assert not self._closed, "Can't acquire a driver from a closed pool."
+
+		while True:
+			driver = self._take()
+			if self.healthy(driver):
+				return driver
+			self._discard(driver)
+
+	def release(self, driver, pages = 1):
+		'''
+			Return a driver to the pool after it has loaded `pages` pages.
+		'''
+		with self._lock:
+			self._pages[id(driver)] = self._pages.get(id(driver), 0) + pages
+			count = self._pages[id(driver)]
+
+		if self._closed or (self.max_pages is not None and count >= self.max_pages):
+			self._discard(driver)
+		elif self.scheduler is not None and self.scheduler.oversized(driver):
+			self._discard(driver)
+		else:
+			with self._lock:
+				self._idle.append(driver)
+				self._lock.notify()
+
+	@contextmanager
+	def driver(self, pages = 1):
+		driver = self.acquire()
+		try:
+			yield driver
+		except BaseException as e:
+			# the slot always comes back; the browser only stays when its session still works,
+			# so a timed out page (ScrapeError) doesn't cost a restart
+			broken = isinstance(e, WebDriverException) and not isinstance(e, TimeoutException)
+			if broken or not self.healthy(driver):
+				self._discard(driver)
+			else:
+				self.release(driver, pages)
+			raise
+		else:
+			self.release(driver, pages)
+
+	def close(self):
+		self._closed = True
+		with self._lock:
+			idle, self._idle = list(self._idle), deque()
+		for driver in idle:
+			self._discard(driver)
+
+	@staticmethod
+	def healthy(driver):
+		try:
+			driver.current_url
+			return True
+		except Exception:
+			return False
+
+	'''
+		Pop an idle driver, start a new one if under size (and within the scheduler's budget),
+		otherwise wait for a release. The budget is measured outside the lock, so releases
+		don't wait for the scan; the pool is checked again before a browser is started.
+	'''
+	def _take(self):
+		while True:
+			with self._lock:
+				while not self._idle and self._created >= self.size:
+					self._lock.wait()
+				if self._idle:
+					return self._idle.popleft()
+				created = self._created
+				if self.scheduler is None:
+					self._created += 1
+					break
+
+			admitted = self.scheduler.admits(created)
+
+			with self._lock:
+				if self._idle:
+					return self._idle.popleft()
+				if admitted and self._created == created:
+					self._created += 1
+					break
+				if not admitted:
+					# the budget frees up without a release when other processes exit
+					self._lock.wait(self.poll)
+
+		try:
+			driver = self.factory()
+			if self.scheduler is not None:
+				self.scheduler.register(driver)
+			return driver
+		except Exception:
+			with self._lock:
+				self._created -= 1
+				self._lock.notify()
+			raise
+
+	def _discard(self, driver):
+		if self.scheduler is not None:
+			self.scheduler.unregister(driver)
+		with self._lock:
+			self._created -= 1
+			self._pages.pop(id(driver), None)
+			self._lock.notify()
+		try:
+			driver.quit()
+		except Exception:
+			pass
@@ -0,0 +1,139 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from tqdm import tqdm
+
+from google_flight_analysis.scrape import _Scrape
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.policy import ScrapeError
+
+__all__ = ['async_scrape_objects', 'scrape_objects', 'stream_objects', 'iter_objects']
+
+'''
+	Concurrent scraping engine.
+
+	The URLs of every object are fanned out over `concurrency` browsers, one Selenium session
+	each. Selenium blocks, so each page load runs on a worker thread owned by the engine while
+	the event loop schedules and collects them. stream_objects hands out every URL's frame as
+	it finishes; the other entry points are built on it.
+'''
+
+async def stream_objects(objs, concurrency = 4, pool = None, throttle = None, on_result = None, on_done = None, keep = True):
+	'''
+		Scrape all URLs of objs with up to `concurrency` pages in flight, yielding (obj, frame)
+		for every URL as soon as it finishes, in completion order. Failed URLs are not yielded,
+		they are in obj.failures once the object is done.
+
+		throttle: optional Throttle rate limiting page loads and tuning how many of the
+		`concurrency` browsers are active at once
+		on_result: optional callback, called with (obj, frame) for every URL as it finishes
+		on_done: optional callback, called with each object as soon as all its URLs finished
+		keep: merge the frames of finished objects into obj.data; with False only the yielded
+		frames exist, so memory does not grow with the number of objects
+	'''
+	if type(objs) is _Scrape:
+		objs = [objs]
+
+	owned = pool is None
+	if owned:
+		pool = DriverPool(size = concurrency)
+
+	loop = asyncio.get_running_loop()
+	executor = ThreadPoolExecutor(max_workers = concurrency)
+	results = [[None] * len(obj.url) for obj in objs]
+	remaining = [len(obj.url) for obj in objs]
+	progress = tqdm(total = sum(remaining), desc = "Scraping URLs")
+
+	async def fetch(n, i, url):
+		return n, i, await loop.run_in_executor(executor, _fetch, pool, url, objs[n].date[i], throttle)
+
+	tasks = [asyncio.ensure_future(fetch(n, i, url)) for n, obj in enumerate(objs) for i, url in enumerate(obj.url)]
+	try:
+		for task in asyncio.as_completed(tasks):
+			n, i, result = await task
+			progress.update()
+
+			failed = isinstance(result, ScrapeError)
+			results[n][i] = result if keep or failed else None
+			remaining[n] -= 1
+			if remaining[n] == 0:
+				# the object is complete before its last frame is handed out
+				_finish(objs[n], results[n], keep)
+				results[n] = None
+				if on_done is not None:
+					on_done(objs[n])
+
+			if not failed:
+				if on_result is not None:
+					on_result(objs[n], result)
+				yield objs[n], result
+	finally:
+		for task in tasks:
+			task.cancel()
+		progress.close()
+		# an abandoned stream lets the pages in flight finish before closing their browsers
+		executor.shutdown(wait = True, cancel_futures = True)
+		if owned:
+			pool.close()
+
+def iter_objects(objs, concurrency = 4, pool = None, throttle = None, on_result = None, on_done = None, keep = True):
+	'''
+		Blocking generator over stream_objects. Pages keep loading while the caller handles
+		a frame; breaking out of the loop stops scraping.
+	'''
+	loop = asyncio.new_event_loop()
+	stream = stream_objects(objs, concurrency = concurrency, pool = pool, throttle = throttle,
+		on_result = on_result, on_done = on_done, keep = keep)
+	try:
+		while True:
+			try:
+				item = loop.run_until_complete(stream.__anext__())
+			except StopAsyncIteration:
+				break
+			yield item
+	finally:
+		loop.run_until_complete(stream.aclose())
+		loop.close()
+
+async def async_scrape_objects(objs, concurrency = 4, pool = None, throttle = None, on_done = None):
+	'''
+		Scrape all URLs of objs with up to `concurrency` pages in flight.
+		Modifies the objects in-place and returns them in the given order.
+
+		throttle: optional Throttle rate limiting page loads and tuning how many of the
+		`concurrency` browsers are active at once
+		on_done: optional callback, called with each object as soon as all its URLs finished
+	'''
+	if type(objs) is _Scrape:
+		objs = [objs]
+
+	async for _ in stream_objects(objs, concurrency = concurrency, pool = pool, throttle = throttle, on_done = on_done):
+		pass
+	return objs
+
+def scrape_objects(objs, concurrency = 4, pool = None, throttle = None, on_done = None):
+	'''
+		Blocking wrapper around async_scrape_objects.
+	'''
+	return asyncio.run(async_scrape_objects(objs, concurrency = concurrency, pool = pool, throttle = throttle, on_done = on_done))
+
+def _finish(obj, results, keep):
+	if keep:
+		obj._merge_results(results)
+	else:
+		obj._failures = [r.report() for r in results if isinstance(r, ScrapeError)]
+
+def _fetch(pool, url, date, throttle = None):
+	# cached URLs never touch a browser
+	if _Scrape.result_cache is not None:
+		cached = _Scrape.result_cache.get(url)
+		if cached is not None:
+			return cached
+
+	try:
+		with throttle.slot() if throttle is not None else nullcontext():
+			with pool.driver() as driver:
+				return _Scrape._get_results(url, date, driver)
+	except ScrapeError as e:
+		# reported per object by _merge_results
+		return e
@@ -0,0 +1,186 @@
+import asyncio
+import importlib.util
+from urllib.parse import urlsplit
+from tqdm import tqdm
+
+from google_flight_analysis.scrape import _Scrape
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.policy import ScrapeError
+
+__all__ = ['HttpFetcher', 'fetch_objects']
+
+'''
+	Browserless fetch backend.
+
+	Results pages carry their flights in the data blob of the initial HTML (see payload.py),
+	so they can be fetched with a plain HTTP client instead of a browser: one pooled client
+	keeps connections alive (HTTP/2 when the h2 package is installed) and fetches a batch of
+	URLs concurrently. Pages whose source can't be decoded are scraped with the browser as
+	before. Needs httpx (pip install google-flight-analysis[http]).
+'''
+
+HEADERS = {
+	'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36',
+	'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+	'Accept-Language': 'en-US,en;q=0.9'
+}
+
+# accepts the consent interstitial served to some regions before the results
+COOKIES = {'CONSENT': 'YES+cb'}
+
+def _httpx():
+	try:
+		import httpx
+	except ImportError:
+		raise ImportError("The HTTP fetch backend needs httpx, install it with pip install httpx[http2].")
+	return httpx
+
+
+class HttpFetcher:
+	'''
+		max_connections: connections kept open to the server, also the number of requests in flight
+		http2: use HTTP/2 when the h2 package is installed
+		timeout: seconds per request, defaults to the timeout of _Scrape.retry_policy
+		host: send requests to this origin (e.g. 'http://localhost:8000') instead of the URL's own
+	'''
+
+	def __init__(self, max_connections = 20, http2 = True, timeout = None, headers = None, host = None):
+		self.max_connections = max_connections
+		self.http2 = http2 and importlib.util.find_spec('h2') is not None
+		self.timeout = timeout
+		self.headers = dict(HEADERS, **(headers or {}))
+		self.host = host
+
+	def __repr__(self):
+		return "HttpFetcher({n} connections, {v})".format(n = self.max_connections, v = 'HTTP/2' if self.http2 else 'HTTP/1.1')
+
+	def __str__(self):
+		return self.__repr__()
+
+	def client(self):
+		httpx = _httpx()
+		timeout = _Scrape.retry_policy.timeout if self.timeout is None else self.timeout
+		return httpx.AsyncClient(
+			http2 = self.http2,
+			limits = httpx.Limits(max_connections = self.max_connections, max_keepalive_connections = self.max_connections),
+			timeout = timeout,
+			headers = self.headers,
+			cookies = COOKIES,
+			follow_redirects = True
+		)
+
+	async def fetch_all(self, urls, on_page = None):
+		'''
+			Page sources of urls, in order, over one pooled client. A URL that still fails after
+			the retries of _Scrape.retry_policy gives its ScrapeError instead.
+
+			on_page: optional callback, called with (index, source or ScrapeError) as pages arrive
+		'''
+		results = [None] * len(urls)
+		async with self.client() as client:
+			async def fetch(i, url):
+				results[i] = await self._fetch(client, url)
+				if on_page is not None:
+					on_page(i, results[i])
+
+			await asyncio.gather(*[fetch(i, url) for i, url in enumerate(urls)])
+		return results
+
+	async def _fetch(self, client, url):
+		policy = _Scrape.retry_policy
+		breaker = _Scrape.circuit_breaker
+		target = self._target(url)
+
+		for attempt in range(policy.retries + 1):
+			# shared with the browsers, pauses while failures point at throttling
+			await asyncio.get_running_loop().run_in_executor(None, breaker.wait)
+			try:
+				response = await client.get(target)
+				response.raise_for_status()
+			except _httpx().HTTPError as e:
+				breaker.record(False)
+				if attempt == policy.retries:
+					return ScrapeError(url, None, attempt + 1, e)
+				await asyncio.sleep(policy.delay(attempt))
+			else:
+				breaker.record(True)
+				return response.text
+
+	def _target(self, url):
+		if self.host is None:
+			return url
+		parts = urlsplit(url)
+		return self.host.rstrip('/') + parts.path + ('?' + parts.query if parts.query else '')
+
+
+async def _fetch_objects(objs, fetcher, pool, fallback):
+	jobs = []
+	results = [[None] * len(obj.url) for obj in objs]
+	for n, obj in enumerate(objs):
+		for i, url in enumerate(obj.url):
+			cached = None if _Scrape.result_cache is None else _Scrape.result_cache.get(url)
+			if cached is not None:
+				results[n][i] = cached
+			else:
+				jobs += [(n, i, url)]
+
+	progress = tqdm(total = len(jobs), desc = "Fetching URLs")
+	failed = []
+
+	def on_page(k, source):
+		n, i, url = jobs[k]
+		progress.update()
+		if isinstance(source, ScrapeError):
+			source.date = objs[n].date[i]
+			failed.append((k, source))
+			return
+
+		df = _Scrape._parse_source(url, objs[n].date[i], source)
+		if df is None:
+			failed.append((k, ScrapeError(url, objs[n].date[i], 1, ValueError("No flight data in the page source"))))
+		else:
+			results[n][i] = df
+
+	try:
+		await fetcher.fetch_all([url for _, _, url in jobs], on_page = on_page)
+	finally:
+		progress.close()
+
+	# pages without decodable data go through the browser
+	if failed and fallback:
+		owned = pool is None
+		if owned:
+			pool = DriverPool()
+		try:
+			for k, _ in tqdm(sorted(failed, key = lambda f: f[0]), desc = "Browser fallback"):
+				n, i, url = jobs[k]
+				try:
+					with pool.driver() as driver:
+						results[n][i] = _Scrape._get_results(url, objs[n].date[i], driver)
+				except ScrapeError as e:
+					results[n][i] = e
+		finally:
+			if owned:
+				pool.close()
+	else:
+		for k, error in failed:
+			n, i, _ = jobs[k]
+			results[n][i] = error
+
+	for obj, result in zip(objs, results):
+		obj._merge_results(result)
+	return objs
+
+def fetch_objects(objs, fetcher = None, pool = None, fallback = True):
+	'''
+		Scrape objs over HTTP. Modifies the objects in-place and returns them.
+
+		fetcher: HttpFetcher, defaults to HttpFetcher()
+		pool: DriverPool for pages that need the browser, one is started only if needed
+		fallback: scrape undecodable pages with the browser, otherwise report them in
+		obj.failures
+	'''
+	if type(objs) is _Scrape:
+		objs = [objs]
+	fetcher = HttpFetcher() if fetcher is None else fetcher
+	return asyncio.run(_fetch_objects(objs, fetcher, pool, fallback))
@@ -1,19 +1,55 @@
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
+import re
+from google_flight_analysis.normalize import duration_minutes, stop_airports, carrier_code, operating_code
 
 __all__ = ['Flight']
 
+# "10:45 PM", "4:25 PM+1", "11:50 PM-1" (Google separates AM/PM with a narrow no-break space)
+_TIME = re.compile(r"(\d{1,2}):(\d{2})[ \u202f\u00a0]*([AP])M(?:([+-])(\d))?$")
+
+_DAYS = [timedelta(days = n) for n in range(4)]
+
+_NAT = np.datetime64('NaT')
+
+'''
+	Categorical columns are built from codes assigned while filling, skipping factorization.
+'''
+def _category_code(categories, value):
+	if value is None:
+		return -1
+	return categories.setdefault(value, len(categories))
+
+def _categorical(codes, categories):
+	return pd.Categorical.from_codes(codes, dtype = pd.CategoricalDtype(list(categories)), validate = False)
+
+'''
+	Midnight of a YYYY-MM-DD date and its ISO day of week, parsed once per date.
+'''
+@lru_cache(maxsize = 4096)
+def _base_date(date):
+	base = datetime(int(date[:4]), int(date[5:7]), int(date[8:10]))
+	return base, base.isoweekday()
+
 
 class Flight:
 
+	__slots__ = (
+		'_id', '_origin', '_dest', '_date', '_dow', '_airline', '_flight_time', '_num_stops',
+		'_stops', '_co2', '_emissions', '_price', '_times', '_time_leave', '_time_arrive',
+		'_trash', '_round_trip', '_round_trip_return_date', '_operator',
+		'_travel_min', '_layover_min', '_marketing'
+	)
+
 	def __init__(self, date, *args):
 		self._id = 1
 		self._origin = None
 		self._dest = None
 		self._date = date
-		self._dow = datetime.strptime(date, '%Y-%m-%d').isoweekday() # day of week
+		self._dow = _base_date(date)[1] # day of week
 		self._airline = None
 		self._flight_time = None
 		self._num_stops = None
@@ -27,6 +63,11 @@ class Flight:
 		self._trash = []
 		self._round_trip = False
 		self._round_trip_return_date = None
+		self._operator = None
+		# exact values from structured sources, preferred over parsing the texts above
+		self._travel_min = None
+		self._layover_min = None
+		self._marketing = None
 		self._parse_args(*args)
 
 	def __repr__(self):
@@ -122,48 +163,10 @@ class Flight:
 		self._round_trip_return_date = x
      
 	def _classify_arg(self, arg):
-		if ('AM' in arg or 'PM' in arg) and len(self._times) < 2 and ':' in arg:
-			# arrival or departure time
-			delta = timedelta(days = 0)
-			if arg[-2] == '+':
-				delta = timedelta(days = int(arg[-1]))
-				arg = arg[:-2]
-
-			date_format = "%Y-%m-%d %I:%M %p"
-			self._times += [datetime.strptime(self._date + " " + arg, date_format) + delta]
-
-		elif ('hr' in arg or 'min'in arg) and self._flight_time is None:
-			# flight time
-			self._flight_time = arg
-		elif 'stop' in arg and self._num_stops is None:
-			# num stops
-			self._num_stops = 0 if arg == 'Nonstop' else int(arg.split()[0])
-
-		elif 'CO2' in arg and self._co2 is None:
-			# co2
-			self._co2 = int(arg.split()[0].replace(',',''))
-		elif 'emissions' in arg and self._emissions is None:
-			# emmision
-			emission_val = arg.split()[0]
-			self._emissions = 0 if emission_val == 'Avg' else int(emission_val[:-1])
-		elif '$' in arg and self._price is None:
-			# price
-			self._price = int(arg[1:].replace(',',''))
-		elif len(arg) == 6 and arg.isupper() and self._origin is None and self._dest is None:
-			# origin/dest
-			self._origin = arg[:3]
-			self._dest = arg[3:]
-		elif ('hr' in arg and arg[-3:].isupper()) or (len(arg.split(', ')) > 1 and arg.isupper()):
-			# 1 stop + time at stop
-			# or multiple stops
-			self._stops = arg
-		elif len(arg) > 0 and arg != 'Separate tickets booked together' and arg != 'Change of airport' and 'Avoids as much' not in arg \
-      		and "round trip" not in arg:
-			val = arg.split(',')
-			val = [elem.split('Operated')[0] for elem in val]
-			self._airline = ','.join(val)
-		elif 'round trip' in arg:
-			self._round_trip = True
+		# first rule in _RULES that accepts the arg wins
+		for rule in _RULES:
+			if rule(self, arg):
+				break
 		else:
 			self._trash += [arg]
 			# airline and other stuff idk
@@ -178,47 +181,149 @@ class Flight:
 		if self._round_trip:
 			self._round_trip_return_date = self._time_leave + timedelta(days = 1)
 
+	'''
+		Build a flight from already decoded fields rather than page text (see payload.py).
+		Texts are given in the form the results page shows them, e.g. flight_time "9 hr 40 min"
+		and stops "2 hr 15 min WAW" or "AMS, BUD". travel_min, layover_min and marketing
+		(IATA code) fill the normalized columns directly when known.
+	'''
+	@staticmethod
+	def from_fields(date, origin, dest, time_leave, time_arrive, airline = None, flight_time = None,
+		num_stops = None, stops = None, co2 = None, emissions = None, price = None, round_trip = False,
+		round_trip_return_date = None, operator = None, travel_min = None, layover_min = None, marketing = None):
+		flight = Flight(date, [])
+		flight._origin, flight._dest = origin, dest
+		flight._times = [time_leave, time_arrive]
+		flight._time_leave, flight._time_arrive = time_leave, time_arrive
+		flight._airline = airline
+		flight._flight_time = flight_time
+		flight._num_stops = num_stops
+		flight._stops = stops
+		flight._co2 = co2
+		flight._emissions = emissions
+		flight._price = price
+		flight._round_trip = round_trip
+		flight._round_trip_return_date = round_trip_return_date
+		flight._operator = operator
+		flight._travel_min = travel_min
+		flight._layover_min = layover_min
+		flight._marketing = marketing
+		return flight
+
+	'''
+		Build a typed frame from flights (any iterable, e.g. _Scrape._iter_flights).
+		Columns are filled into preallocated arrays in one pass over the flights.
+	'''
 	@staticmethod
 	def dataframe(flights):
-		data = {
-			'Departure datetime': [],
-			'Arrival datetime': [],
-			'Origin' : [],
-			'Destination' : [],
-			'Airline(s)' : [],
-			'Travel Time' : [],
-			'Price ($)' : [],
-			'Num Stops' : [],
-			'Layover' : [],
-			'Access Date' : [],
+		flights = flights if isinstance(flights, list) else list(flights)
+		n = len(flights)
+
+		leave = np.empty(n, dtype = 'datetime64[ns]')
+		arrive = np.empty(n, dtype = 'datetime64[ns]')
+		return_date = np.empty(n, dtype = 'datetime64[ns]')
+		origin, origin_cats = np.empty(n, dtype = np.int32), {}
+		dest, dest_cats = np.empty(n, dtype = np.int32), {}
+		airline, airline_cats = np.empty(n, dtype = np.int32), {}
+		travel_time = np.empty(n, dtype = object)
+		layover = np.empty(n, dtype = object)
+		travel_min, travel_min_na = np.zeros(n, dtype = np.int16), np.zeros(n, dtype = bool)
+		layover_min, layover_min_na = np.zeros(n, dtype = np.int16), np.zeros(n, dtype = bool)
+		airports, airports_cats = np.empty(n, dtype = np.int32), {}
+		marketing, marketing_cats = np.empty(n, dtype = np.int32), {}
+		operating, operating_cats = np.empty(n, dtype = np.int32), {}
+		round_trip = np.zeros(n, dtype = bool)
+		price, price_na = np.zeros(n, dtype = np.int32), np.zeros(n, dtype = bool)
+		stops, stops_na = np.zeros(n, dtype = np.int8), np.zeros(n, dtype = bool)
+		co2, co2_na = np.zeros(n, dtype = np.int32), np.zeros(n, dtype = bool)
+		emissions, emissions_na = np.zeros(n, dtype = np.int16), np.zeros(n, dtype = bool)
+
+		for i, flight in enumerate(flights):
+			leave[i] = _NAT if flight._time_leave is None else flight._time_leave
+			arrive[i] = _NAT if flight._time_arrive is None else flight._time_arrive
+			return_date[i] = _NAT if flight._round_trip_return_date is None else flight._round_trip_return_date
+			origin[i] = _category_code(origin_cats, flight._origin)
+			dest[i] = _category_code(dest_cats, flight._dest)
+			airline[i] = _category_code(airline_cats, flight._airline)
+			travel_time[i] = flight._flight_time
+			layover[i] = flight._stops
+			round_trip[i] = flight._round_trip
+
+			if flight._price is None: price_na[i] = True
+			else: price[i] = flight._price
+			if flight._num_stops is None: stops_na[i] = True
+			else: stops[i] = flight._num_stops
+			if flight._co2 is None: co2_na[i] = True
+			else: co2[i] = flight._co2
+			if flight._emissions is None: emissions_na[i] = True
+			else: emissions[i] = flight._emissions
+
+			# normalized columns, see normalize.py
+			minutes = flight._travel_min
+			if minutes is None and flight._flight_time is not None:
+				minutes = duration_minutes(flight._flight_time)
+			if minutes is None: travel_min_na[i] = True
+			else: travel_min[i] = minutes
+			minutes = flight._layover_min
+			if minutes is None and flight._stops is not None:
+				minutes = duration_minutes(flight._stops)
+			if minutes is None: layover_min_na[i] = True
+			else: layover_min[i] = minutes
+			airports[i] = _category_code(airports_cats, None if flight._stops is None else stop_airports(flight._stops))
+			code = flight._marketing
+			if code is None and flight._airline is not None:
+				code = carrier_code(flight._airline)
+			marketing[i] = _category_code(marketing_cats, code)
+			if flight._operator is not None:
+				code = operating_code(flight._operator) or code
+			operating[i] = _category_code(operating_cats, code)
+
+		# one access date per batch
+		access = np.full(n, np.datetime64(date.today(), 'ns'))
+
+		return pd.DataFrame({
+			'Departure datetime': leave,
+			'Arrival datetime': arrive,
+			'Origin' : _categorical(origin, origin_cats),
+			'Destination' : _categorical(dest, dest_cats),
+			'Airline(s)' : _categorical(airline, airline_cats),
+			'Travel Time' : travel_time,
+			'Price ($)' : pd.arrays.IntegerArray(price, price_na),
+			'Num Stops' : pd.arrays.IntegerArray(stops, stops_na),
+			'Layover' : layover,
+			'Access Date' : access,
 			#'Stop Location' : [],
-			'CO2 Emission (kg)' : [],
-			'Emission Diff (%)' : [],
-			'Round Trip' : [],
-			'Round Trip Return Date' : []
-		}
-
-		for flight in flights:
-			data['Departure datetime'] += [flight.time_leave]
-			data['Arrival datetime'] += [flight.time_arrive]
-
-			data['Airline(s)'] += [flight.airline]
-			data['Travel Time'] += [flight.flight_time]
-			data['Origin'] += [flight.origin]
-			data['Destination'] += [flight.dest]
-
-			data['Num Stops'] += [flight.num_stops]
-			data['Layover'] += [flight.stops]
-			#data['Stop Location'] += [flight.stops]
-			data['CO2 Emission (kg)'] += [flight.co2]
-			data['Emission Diff (%)'] += [flight.emissions]
-			data['Price ($)'] += [flight.price]
-			data['Access Date'] += [datetime.today().replace(hour = 0, minute = 0, second = 0, microsecond = 0)]
-			data['Round Trip'] += [flight.round_trip]
-			data['Round Trip Return Date'] += [flight.round_trip_return_date]
-   
-		return pd.DataFrame(data)
-
+			'CO2 Emission (kg)' : pd.arrays.IntegerArray(co2, co2_na),
+			'Emission Diff (%)' : pd.arrays.IntegerArray(emissions, emissions_na),
+			'Round Trip' : round_trip,
+			'Round Trip Return Date' : return_date,
+			'Travel Time (min)' : pd.arrays.IntegerArray(travel_min, travel_min_na),
+			'Layover (min)' : pd.arrays.IntegerArray(layover_min, layover_min_na),
+			'Stop Airports' : _categorical(airports, airports_cats),
+			'Marketing Carrier' : _categorical(marketing, marketing_cats),
+			'Operating Carrier' : _categorical(operating, operating_cats)
+		})
+
+	'''
+		pd.concat for frames of Flight.dataframe. Their categoricals have per-frame categories,
+		which pd.concat turns into object columns; here they are united first.
+	'''
+	@staticmethod
+	def concat(frames, ignore_index = False):
+		frames = list(frames)
+		united = {}
+		for df in frames:
+			for name in df.columns:
+				if isinstance(df[name].dtype, pd.CategoricalDtype):
+					united[name] = united.get(name, pd.Index([])).append(df[name].cat.categories).unique()
+
+		if united:
+			frames = [
+				df.assign(**{name: df[name].cat.set_categories(cats) for name, cats in united.items()
+					if name in df.columns and isinstance(df[name].dtype, pd.CategoricalDtype)})
+				for df in frames
+			]
+		return pd.concat(frames, ignore_index = ignore_index)
 
 	@staticmethod
 	def assert_error(x, arg):
@@ -233,3 +338,96 @@ class Flight:
 			"Parsing Arg 8 as emissions elem is incorrect.",
 			"Parsing Arg 9 as price elem is incorrect."
 		][x] + ": " + arg
+
+
+'''
+	Field rules for Flight._classify_arg, in priority order. Each takes (flight, arg) and
+	returns True when it consumed the arg.
+'''
+def _rule_time(flight, arg):
+	# arrival or departure time
+	if len(flight._times) >= 2 or ':' not in arg:
+		return False
+	match = _TIME.search(arg)
+	if match is None:
+		return False
+
+	hour, minute = int(match.group(1)), int(match.group(2))
+	if not 1 <= hour <= 12 or minute > 59:
+		return False
+
+	hour = hour % 12 + (12 if match.group(3) == 'P' else 0)
+	time = _base_date(flight._date)[0].replace(hour = hour, minute = minute)
+	if match.group(5) is not None:
+		days = _DAYS[int(match.group(5))] if int(match.group(5)) < len(_DAYS) else timedelta(days = int(match.group(5)))
+		time = time + days if match.group(4) == '+' else time - days
+
+	flight._times += [time]
+	return True
+
+def _rule_flight_time(flight, arg):
+	if flight._flight_time is None and ('hr' in arg or 'min' in arg):
+		flight._flight_time = arg
+		return True
+	return False
+
+def _rule_num_stops(flight, arg):
+	if flight._num_stops is None and 'stop' in arg:
+		flight._num_stops = 0 if arg == 'Nonstop' else int(arg.split()[0])
+		return True
+	return False
+
+def _rule_co2(flight, arg):
+	if flight._co2 is None and 'CO2' in arg:
+		flight._co2 = int(arg.split()[0].replace(',',''))
+		return True
+	return False
+
+def _rule_emissions(flight, arg):
+	if flight._emissions is None and 'emissions' in arg:
+		emission_val = arg.split()[0]
+		flight._emissions = 0 if emission_val == 'Avg' else int(emission_val[:-1])
+		return True
+	return False
+
+def _rule_price(flight, arg):
+	if flight._price is None and '$' in arg:
+		flight._price = int(arg[1:].replace(',',''))
+		return True
+	return False
+
+def _rule_route(flight, arg):
+	# origin/dest
+	if len(arg) == 6 and flight._origin is None and flight._dest is None and arg.isupper():
+		flight._origin = arg[:3]
+		flight._dest = arg[3:]
+		return True
+	return False
+
+def _rule_stops(flight, arg):
+	# 1 stop + time at stop, or multiple stops
+	if ('hr' in arg and arg[-3:].isupper()) or (', ' in arg and arg.isupper()):
+		flight._stops = arg
+		return True
+	return False
+
+_NOT_AIRLINE = frozenset(['', 'Separate tickets booked together', 'Change of airport'])
+
+def _rule_airline(flight, arg):
+	if arg in _NOT_AIRLINE or 'Avoids as much' in arg or 'round trip' in arg:
+		return False
+	flight._airline = ','.join(elem.split('Operated')[0] for elem in arg.split(','))
+	if 'Operated' in arg:
+		flight._operator = arg
+	return True
+
+def _rule_round_trip(flight, arg):
+	if 'round trip' in arg:
+		flight._round_trip = True
+		return True
+	return False
+
+_RULES = (
+	_rule_time, _rule_flight_time, _rule_num_stops, _rule_co2, _rule_emissions,
+	_rule_price, _rule_route, _rule_stops, _rule_airline, _rule_round_trip
+)
@@ -0,0 +1,181 @@
+from collections import namedtuple
+import heapq
+import numpy as np
+import pandas as pd
+from google_flight_analysis.scrape import ScrapeObjects
+from google_flight_analysis.driver import DriverPool
+
+__all__ = ['PriceEstimator', 'BestFirstSearch', 'Progress']
+
+'''
+    Best-first (branch and bound) search over fuzzy combinations.
+
+    Each combination is keyed by its expected price: the cheapest price seen for the same
+    route within `radius` days, from history or from combinations already scraped in this
+    search. The cheapest expected combination is scraped next. Combinations with no
+    estimate yet are scraped first, spread over the date window, so estimates appear quickly.
+    The search stops when the best price reaches the target, or when even the most promising
+    remaining combination, discounted by `tolerance`, can't beat the best found.
+'''
+
+Progress = namedtuple('Progress', ['obj', 'price', 'best', 'best_price', 'scraped', 'remaining'])
+
+
+def _days(dates):
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def _min_price(df):
+    if df is None or df.empty or 'Price ($)' not in df:
+        return None
+    prices = pd.to_numeric(df['Price ($)'], errors='coerce').dropna()
+    return None if prices.empty else float(prices.min())
+
+
+class PriceEstimator:
+    '''
+    Expected price of a query from prices seen nearby on the same route.
+
+    history: optional frame of past results (e.g. from CacheControl) with Origin, Destination,
+    Departure datetime and Price ($) columns; round trips also use Round Trip Return Date
+    radius: days a neighbouring date may differ (per leg)
+    '''
+
+    def __init__(self, history=None, radius=3):
+        self.radius = radius
+        self._seen = {}  # route -> (list of day vectors, list of prices)
+        if history is not None and not history.empty:
+            self._add_history(history)
+
+    def observe(self, obj, price):
+        if price is None:
+            return
+        days, prices = self._seen.setdefault(PriceEstimator._route(obj), ([], []))
+        days.append(_days(obj.date))
+        prices.append(price)
+
+    def estimate(self, obj):
+        '''
+        Cheapest neighbouring price on the same route, or None if there is none.
+        '''
+        seen = self._seen.get(PriceEstimator._route(obj))
+        if seen is None:
+            return None
+        days, prices = seen
+        dist = np.abs(np.array(days) - _days(obj.date)).max(axis=1)
+        near = dist <= self.radius
+        if not near.any():
+            return None
+        return float(np.array(prices)[near].min())
+
+    @staticmethod
+    def _route(obj):
+        return (tuple(obj.origin), tuple(obj.dest))
+
+    def _add_history(self, history):
+        history = history.dropna(subset=['Price ($)'])
+        depart = pd.to_datetime(history['Departure datetime']).dt.strftime('%Y-%m-%d')
+        round_trip = history['Round Trip'].astype(bool) if 'Round Trip' in history else pd.Series(False, index=history.index)
+
+        for i, (org, dest, date, price, rt) in enumerate(zip(
+            history['Origin'].astype(str), history['Destination'].astype(str), depart, history['Price ($)'], round_trip
+        )):
+            if rt:
+                ret = pd.Timestamp(history['Round Trip Return Date'].iloc[i]).strftime('%Y-%m-%d')
+                route, dates = ((org, dest), (dest, org)), (date, ret)
+            else:
+                route, dates = ((org,), (dest,)), (date,)
+            days, prices = self._seen.setdefault(route, ([], []))
+            days.append(_days(dates))
+            prices.append(float(price))
+
+
+class BestFirstSearch:
+    '''
+    objs: Scrape objects to choose from (one-way or round trips)
+    target: stop as soon as a price at or below this is found
+    tolerance: stop when the best remaining estimate * (1 - tolerance) is not below the best
+    price, i.e. estimates may be this much too high before a combination is worth a look
+    scrape: callable filling one object, defaults to ScrapeObjects with the pool
+    '''
+
+    def __init__(self, objs, history=None, target=None, tolerance=0.05, radius=3, scrape=None):
+        self.objs = list(objs)
+        self.target = target
+        self.tolerance = tolerance
+        self.estimator = PriceEstimator(history, radius=radius)
+        self.scrape = scrape
+
+        self.best = None
+        self.best_price = None
+        self.scraped = []
+        self.skipped = []
+
+    def __repr__(self):
+        return "BestFirstSearch({n} combinations, {s} scraped, best:{p})".format(
+            n=len(self.objs), s=len(self.scraped), p=self.best_price
+        )
+
+    def __str__(self):
+        return self.__repr__()
+
+    def run(self, pool=None):
+        '''
+        Scrape combinations in order of expected price, yielding a Progress after each one.
+        '''
+        owned = pool is None and self.scrape is None
+        if owned:
+            pool = DriverPool()
+        scrape = self.scrape if self.scrape is not None else (lambda obj: ScrapeObjects(obj, pool=pool))
+
+        # unknown combinations first, in an order that spreads them over the window
+        remaining = list(enumerate(BestFirstSearch._spread(len(self.objs))))
+
+        try:
+            while remaining:
+                # a new price can lower the estimate of any neighbour, so re-key everything
+                heap = [(self._key(self.objs[i]), rank, i) for rank, i in remaining]
+                heapq.heapify(heap)
+                key, rank, i = heapq.heappop(heap)
+                remaining = [(r, j) for _, r, j in heap]
+                obj = self.objs[i]
+
+                if self._bounded(key):
+                    self.skipped = [obj] + [self.objs[j] for _, j in remaining]
+                    break
+
+                scrape(obj)
+                price = _min_price(obj.data)
+                self.estimator.observe(obj, price)
+                self.scraped.append(obj)
+                if price is not None and (self.best_price is None or price < self.best_price):
+                    self.best, self.best_price = obj, price
+
+                yield Progress(obj, price, self.best, self.best_price, len(self.scraped), len(remaining))
+
+                if self.target is not None and self.best_price is not None and self.best_price <= self.target:
+                    self.skipped = [self.objs[j] for _, j in remaining]
+                    break
+        finally:
+            if owned:
+                pool.close()
+
+    def _key(self, obj):
+        estimate = self.estimator.estimate(obj)
+        return float('-inf') if estimate is None else estimate
+
+    def _bounded(self, key):
+        if self.best_price is None or key == float('-inf'):
+            return False
+        return key * (1 - self.tolerance) >= self.best_price
+
+    @staticmethod
+    def _spread(n):
+        '''
+        0..n-1 reordered so every prefix is spread over the range (bit-reversal order).
+        '''
+        if n == 0:
+            return []
+        bits = max(1, (n - 1).bit_length())
+        order = sorted(range(2 ** bits), key=lambda i: int(format(i, '0{}b'.format(bits))[::-1], 2))
+        return [i for i in order if i < n]
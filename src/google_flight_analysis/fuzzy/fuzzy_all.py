@@ -1,17 +1,26 @@
 from google_flight_analysis.fuzzy.utils.location import LOCATIONS, LocationCls
+from contextlib import contextmanager
 import pandas as pd
-from google_flight_analysis.scrape import Scrape, ScrapeObjects, date_format
+from google_flight_analysis.scrape import Scrape
+from google_flight_analysis.spec import plan_queries, plan_round_trips, plan_chains
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.throttle import Throttle
+from google_flight_analysis.scheduler import ResourceScheduler
 from google_flight_analysis.fuzzy.utils.date_process import DateParser
-import concurrent
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from google_flight_analysis.fuzzy.search import FuzzySearch
 import psutil
-from queue import Queue
-import time
-class FuzzyDateLocationScrape():
+
+class FuzzyDateLocationScrape(FuzzySearch):
     '''
     This class is used to generate a list of Scrape objects based on a list of locations
     '''
-    def __init__(self, *args):
+    def __init__(self, *args, min_stay=None, max_stay=None, weekdays=None, limit=None):
+        '''
+        min_stay/max_stay: days between departure and return (or between chain legs)
+        weekdays: allowed weekdays (0 = Monday), for every leg or one collection per leg
+        limit: cap on the number of date combinations
+        '''
+        self._constraints = dict(min_stay=min_stay, max_stay=max_stay, weekdays=weekdays, limit=limit)
         self._locations = None
         self._data = pd.DataFrame()
         self._url = None
@@ -45,9 +54,9 @@ class FuzzyDateLocationScrape():
             self._origin, self._dest, self._date = [args[0]], [args[1]], [args[2]]
 
             assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
-            combinations = DateParser._parse_date(self._date[0])
-            self.generated_scrape_objs = [Scrape(src, dst, date.strftime("%Y-%m-%d")) for date in combinations
-                                                      for src in self._origin[0].location for dst in self._dest[0].location]
+            combinations = [dates[0] for dates in DateParser.generate_date_combinations(self._date, **self._constraints)]
+            specs = plan_queries(self._origin[0].location, self._dest[0].location, combinations)
+            self.generated_scrape_objs = [Scrape.from_spec(spec) for spec in specs]
             
         # round-trip
         elif len(args) == 4:
@@ -59,105 +68,101 @@ class FuzzyDateLocationScrape():
             self._origin, self._dest, self._date = [args[0], args[1]], [args[1], args[0]], args[2:]
             assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
             self._type = 'round-trip'
-            combinations = DateParser.generate_date_combinations(self._date)
-            self.generated_scrape_objs = [Scrape(src, dst, date_list[0].strftime("%Y-%m-%d"), date_list[1].strftime("%Y-%m-%d")) for date_list in combinations if date_list[0] < date_list[1]
-                                                      for src in self._origin[0].location for dst in self._dest[0].location]
+            combinations = DateParser.generate_date_combinations(self._date, **self._constraints)
+            specs = plan_round_trips(self._origin[0].location, self._dest[0].location, combinations)
+            self.generated_scrape_objs = [Scrape.from_spec(spec) for spec in specs]
 
         # chain-trip, chain is component of 3s, check that last one is an actual date to not confuse w perfect
-        elif len(args) >= 3 and len(args) % 3 == 0 and len(args[-1]) == 10 and type(args[-1]) == str:
+        elif len(args) >= 3 and len(args) % 3 == 0 and DateParser.is_date(args[-1]):
             self._origin, self._dest, self._date = [], [], []
 
             for i in range(0, len(args), 3):
-                assert len(args[i]) == 3 and type(args[i]) == str, "Issue with arg {}, see docs".format(i)
-                assert len(args[i + 1]) == 3 and type(args[i+1]) == str, "Issue with arg {}, see docs".format(i+1)
-                assert len(args[i + 2]) == 10 and type(args[i + 2]) == str, "Issue with arg {}, see docs".format(i+2)
-                
-                if i > 0:
-                    assert datetime.strptime(self._date[-1], date_format) < datetime.strptime(args[i + 2], date_format), "Dates are not in order ({d1} > {d2}). Make sure to provide them in increasing order in YYYY-MM-DD format.".format(d1 = self._date[-1], d2 = args[i+2])
+                assert self._is_location(args[i]), "Issue with arg {}, see docs".format(i)
+                assert self._is_location(args[i + 1]), "Issue with arg {}, see docs".format(i+1)
+                assert DateParser.is_date(args[i + 2]), "Issue with arg {}, see docs".format(i+2)
 
                 self._origin += [args[i]]
                 self._dest += [args[i + 1]]
                 self._date += [args[i + 2]]
 
             assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
-            self._url = self._make_url()
             self._type = 'chain-trip'
-
+            # the generator keeps every combination in increasing date order
+            combinations = DateParser.generate_date_combinations(self._date, **self._constraints)
+            legs = [(self._codes(origin), self._codes(dest)) for origin, dest in zip(self._origin, self._dest)]
+            specs = plan_chains(self._type, legs, combinations)
+            self.generated_scrape_objs = [Scrape.from_spec(spec) for spec in specs]
 
         # perfect-chain
-        elif len(args) >= 4 and len(args) % 2 == 1 and len(args[-1]) == 3 and type(args[-1]) == str:
-            assert len(args[0]) == 3 and type(args[0]) == str, "Issue with arg 0, see docs"
-            assert len(args[1]) == 10 and type(args[1]) == str, "Issue with arg 1, see docs"
+        elif len(args) >= 5 and len(args) % 2 == 1 and self._is_location(args[-1]):
+            assert self._is_location(args[0]), "Issue with arg 0, see docs"
+            assert DateParser.is_date(args[1]), "Issue with arg 1, see docs"
 
             self._origin, self._dest, self._date = [args[0]], [], [args[1]]
 
             for i in range(2, len(args)-1, 2):
-                assert len(args[i]) == 3 and type(args[i]) == str, "Issue with arg {}, see docs".format(i)
-                assert len(args[i + 1]) == 10 and type(args[i + 1]) == str, "Issue with arg {}, see docs".format(i+1)
-                assert datetime.strptime(self._date[-1], date_format) < datetime.strptime(args[i + 1], date_format), "Dates are not in order ({d1} > {d2}). Make sure to provide them in increasing order in YYYY-MM-DD format.".format(d1 = self._date[-1], d2 = args[i+1])
+                assert self._is_location(args[i]), "Issue with arg {}, see docs".format(i)
+                assert DateParser.is_date(args[i + 1]), "Issue with arg {}, see docs".format(i+1)
 
                 self._origin += [args[i]]
                 self._dest += [args[i]]
                 self._date += [args[i+1]]
 
-            assert len(args[-1]) == 3 and type(args[-1]) == str, "Issue with last arg, see docs"
             self._dest += [args[-1]]
 
             assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
-            self._url = self._make_url()
             self._type = 'perfect-chain'
+            combinations = DateParser.generate_date_combinations(self._date, **self._constraints)
+            stops = [self._codes(stop) for stop in self._origin + self._dest[-1:]]
+            specs = plan_chains(self._type, stops, combinations)
+            self.generated_scrape_objs = [Scrape.from_spec(spec) for spec in specs]
 
         else:
             raise NotImplementedError()
 
+    @staticmethod
+    def _is_location(arg):
+        # chains take a LocationCls or a plain airport code at every stop
+        return isinstance(arg, LocationCls) or (isinstance(arg, str) and len(arg) == 3)
+
+    @staticmethod
+    def _codes(arg):
+        return arg.location if isinstance(arg, LocationCls) else [arg]
+
+    def _default_threads(self):
+        return psutil.cpu_count(logical=True)
+
+    @contextmanager
+    def _threads(self, max_threads, pool, max_memory=None, pages_per_minute=None, autotune=False):
+        owned = pool is None
+        if owned:
+            # one browser per thread, reused across all of its queries; browsers are only
+            # started while they fit in the memory budget and recycled when they grow too large
+            pool = DriverPool(size=max_threads, scheduler=ResourceScheduler(max_memory=max_memory))
+        throttle = None
+        if pages_per_minute is not None or autotune:
+            throttle = Throttle(pages_per_minute=pages_per_minute, max_workers=max_threads,
+                                min_workers=1 if autotune else max_threads)
+        try:
+            yield pool, throttle
+        finally:
+            if owned:
+                pool.close()
+
+    def search_and_merge_multithread(self, file_name="output.xlsx", max_threads=None, max_memory=None, pool=None,
+                                     pages_per_minute=None, autotune=False, journal=None, processes=None, writer=None):
+        '''
+        pages_per_minute: cap on page loads across all threads
+        autotune: adapt the number of threads loading pages from page latency and timeouts
+        max_memory: bytes all browsers together may use (measured RSS of their process trees),
+        defaults to 80% of the available memory
 
-    def search_and_merge(self, file_name="output.xlsx"):
-        data_frame = []
-        for scrape_obj in self.generated_scrape_objs:
-            ScrapeObjects(scrape_obj)
-            data_frame.append(scrape_obj.data)
-        merged_df = pd.concat(data_frame)
-        merged_df.to_excel(file_name)
-        return merged_df
-
-
-    def search_and_merge_multithread(self, file_name="output.xlsx", max_threads=None, max_memory=None):
-        if max_threads is None:
-            max_threads = psutil.cpu_count(logical=True)
-        if max_memory is None:
-            max_memory = psutil.virtual_memory().available * 0.8
-            
-        def scrape_and_collect_data(scrape_obj):
-            ScrapeObjects(scrape_obj)
-            return scrape_obj.data
-
-        # Check available memory
-        def check_memory_limit():
-            return psutil.virtual_memory().available > max_memory
-
-        # Create a ThreadPoolExecutor with a limited number of threads
-        with ThreadPoolExecutor(max_workers=max_threads) as executor:
-            futures = []
-            tasks_queue = Queue()
-            for scrape_obj in self.generated_scrape_objs:
-                tasks_queue.put(scrape_obj)
-                
-            while not tasks_queue.empty():
-                if check_memory_limit():
-                    scrape_obj = tasks_queue.get()
-                    future = executor.submit(scrape_and_collect_data, scrape_obj)
-                    futures.append(future)
-                else:
-                    time.sleep(1)  # Sleep for a short time before re-checking memory
-                    print("Memory limit reached, deferring task.")
-
-            data_frame = []
-            for future in as_completed(futures):
-                data_frame.append(future.result())
-
-        merged_df = pd.concat(data_frame, ignore_index=True)
-        merged_df.to_excel(file_name, index=False)
-        return merged_df
+        The other arguments are those of FuzzySearch.search_and_merge_multithread, search_and_write
+        takes the same options. Returns the merged results.
+        '''
+        return super().search_and_merge_multithread(file_name, max_threads=max_threads, pool=pool, journal=journal,
+                                                    processes=processes, writer=writer, max_memory=max_memory,
+                                                    pages_per_minute=pages_per_minute, autotune=autotune)
     
     
     
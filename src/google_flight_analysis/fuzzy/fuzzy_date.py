@@ -1,16 +1,21 @@
-from datetime import datetime
 from typing import Any
 import pandas as pd
-from google_flight_analysis.scrape import Scrape, ScrapeObjects, date_format
+from google_flight_analysis.scrape import Scrape
+from google_flight_analysis.spec import plan_queries, plan_round_trips, plan_chains
 from google_flight_analysis.fuzzy.utils.date_process import DateParser
-import concurrent
-from concurrent.futures import ThreadPoolExecutor
-class FuzzyDateScrape():
+from google_flight_analysis.fuzzy.search import FuzzySearch
+class FuzzyDateScrape(FuzzySearch):
     '''
     The differenee here is that in the ending of each date, we can a +n and or -n 
     to indicate that we want to search for flights n days before or after the date
     '''
-    def __init__(self, *args):
+    def __init__(self, *args, min_stay=None, max_stay=None, weekdays=None, limit=None):
+        '''
+        min_stay/max_stay: days between departure and return (or between chain legs)
+        weekdays: allowed weekdays (0 = Monday), for every leg or one collection per leg
+        limit: cap on the number of date combinations
+        '''
+        self._constraints = dict(min_stay=min_stay, max_stay=max_stay, weekdays=weekdays, limit=limit)
         self._origin = None
         self._dest = None
         self._date = None
@@ -46,8 +51,9 @@ class FuzzyDateScrape():
             self._origin, self._dest, self._date = [args[0]], [args[1]], [args[2]]
 
             assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
-            combinations = DateParser._parse_date(self._date[0])
-            self.generated_scrape_objs = [Scrape(self._origin[0], self._dest[0], date.strftime("%Y-%m-%d")) for date in combinations]
+            combinations = [dates[0] for dates in DateParser.generate_date_combinations(self._date, **self._constraints)]
+            specs = plan_queries(self._origin[:1], self._dest[:1], combinations)
+            self.generated_scrape_objs = [Scrape.from_spec(spec) for spec in specs]
             
         # round-trip
         elif len(args) == 4:
@@ -59,81 +65,58 @@ class FuzzyDateScrape():
             self._origin, self._dest, self._date = [args[0], args[1]], [args[1], args[0]], args[2:]
             assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
             self._type = 'round-trip'
-            combinations = DateParser.generate_date_combinations(self._date)
-            self.generated_scrape_objs = [Scrape(args[0], args[1], date_list[0].strftime("%Y-%m-%d"), date_list[1].strftime("%Y-%m-%d")) for date_list in combinations if date_list[0] < date_list[1]]
+            combinations = DateParser.generate_date_combinations(self._date, **self._constraints)
+            specs = plan_round_trips(self._origin[:1], self._dest[:1], combinations)
+            self.generated_scrape_objs = [Scrape.from_spec(spec) for spec in specs]
 
         # chain-trip, chain is component of 3s, check that last one is an actual date to not confuse w perfect
-        elif len(args) >= 3 and len(args) % 3 == 0 and len(args[-1]) == 10 and type(args[-1]) == str:
+        elif len(args) >= 3 and len(args) % 3 == 0 and DateParser.is_date(args[-1]):
             self._origin, self._dest, self._date = [], [], []
 
             for i in range(0, len(args), 3):
                 assert len(args[i]) == 3 and type(args[i]) == str, "Issue with arg {}, see docs".format(i)
-                assert len(args[i + 1]) == 3 and type(args[i+1]) == str, "Issue with arg {}, see docs".format(i+1)
-                assert len(args[i + 2]) == 10 and type(args[i + 2]) == str, "Issue with arg {}, see docs".format(i+2)
-                
-                if i > 0:
-                    assert datetime.strptime(self._date[-1], date_format) < datetime.strptime(args[i + 2], date_format), "Dates are not in order ({d1} > {d2}). Make sure to provide them in increasing order in YYYY-MM-DD format.".format(d1 = self._date[-1], d2 = args[i+2])
+                assert len(args[i + 1]) == 3 and type(args[i + 1]) == str, "Issue with arg {}, see docs".format(i+1)
+                assert DateParser.is_date(args[i + 2]), "Issue with arg {}, see docs".format(i+2)
 
                 self._origin += [args[i]]
                 self._dest += [args[i + 1]]
                 self._date += [args[i + 2]]
 
             assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
-            self._url = self._make_url()
             self._type = 'chain-trip'
-
+            # the generator keeps every combination in increasing date order
+            combinations = DateParser.generate_date_combinations(self._date, **self._constraints)
+            legs = [([origin], [dest]) for origin, dest in zip(self._origin, self._dest)]
+            specs = plan_chains(self._type, legs, combinations)
+            self.generated_scrape_objs = [Scrape.from_spec(spec) for spec in specs]
 
         # perfect-chain
-        elif len(args) >= 4 and len(args) % 2 == 1 and len(args[-1]) == 3 and type(args[-1]) == str:
+        elif len(args) >= 5 and len(args) % 2 == 1 and len(args[-1]) == 3 and type(args[-1]) == str:
             assert len(args[0]) == 3 and type(args[0]) == str, "Issue with arg 0, see docs"
-            assert len(args[1]) == 10 and type(args[1]) == str, "Issue with arg 1, see docs"
+            assert DateParser.is_date(args[1]), "Issue with arg 1, see docs"
 
             self._origin, self._dest, self._date = [args[0]], [], [args[1]]
 
             for i in range(2, len(args)-1, 2):
                 assert len(args[i]) == 3 and type(args[i]) == str, "Issue with arg {}, see docs".format(i)
-                assert len(args[i + 1]) == 10 and type(args[i + 1]) == str, "Issue with arg {}, see docs".format(i+1)
-                assert datetime.strptime(self._date[-1], date_format) < datetime.strptime(args[i + 1], date_format), "Dates are not in order ({d1} > {d2}). Make sure to provide them in increasing order in YYYY-MM-DD format.".format(d1 = self._date[-1], d2 = args[i+1])
+                assert DateParser.is_date(args[i + 1]), "Issue with arg {}, see docs".format(i+1)
 
                 self._origin += [args[i]]
                 self._dest += [args[i]]
                 self._date += [args[i+1]]
 
-            assert len(args[-1]) == 3 and type(args[-1]) == str, "Issue with last arg, see docs"
             self._dest += [args[-1]]
 
             assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
-            self._url = self._make_url()
             self._type = 'perfect-chain'
+            combinations = DateParser.generate_date_combinations(self._date, **self._constraints)
+            stops = [[stop] for stop in self._origin + self._dest[-1:]]
+            specs = plan_chains(self._type, stops, combinations)
+            self.generated_scrape_objs = [Scrape.from_spec(spec) for spec in specs]
 
         else:
             raise NotImplementedError()
 
-    def search_and_merge(self, file_name="output.xlsx"):
-        data_frame = []
-        for scrape_obj in self.generated_scrape_objs:
-            ScrapeObjects(scrape_obj)
-            data_frame.append(scrape_obj.data)
-        merged_df = pd.concat(data_frame)
-        merged_df.to_excel(file_name)
-        return merged_df
-
-
-
-    def search_and_merge_multithread(self, file_name="output.xlsx"):
-        def scrape_and_collect_data(scrape_obj):
-            ScrapeObjects(scrape_obj)
-            return scrape_obj.data
-
-        with ThreadPoolExecutor() as executor:
-            # Submit all scraping tasks to the executor and store futures in a list
-            futures = [executor.submit(scrape_and_collect_data, scrape_obj) for scrape_obj in self.generated_scrape_objs]
-            # Collect results based on the order of submission
-            data_frame = [future.result() for future in futures]
-
-        merged_df = pd.concat(data_frame)
-        merged_df.to_excel(file_name)
-        return merged_df
 # test
 if __name__=='__main__':
     # print("Testing One Way:")
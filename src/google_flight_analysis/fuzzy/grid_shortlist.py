@@ -0,0 +1,107 @@
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from selenium.common.exceptions import NoSuchElementException
+from google_flight_analysis.scrape import Scrape
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.policy import ScrapeError
+
+__all__ = ['grid_centers', 'grid_prices', 'scrape_grids', 'shortlist']
+
+'''
+    Shortlisting round-trip combinations with the price calendar.
+
+    One date grid covers 7 departure x 7 return dates around its query, so a flexible window
+    needs only a few grid pages per route instead of a results page per combination. The
+    combinations are ranked by their grid price and only the cheapest get a full scrape.
+'''
+
+_HALF = 3  # the grid shows the query dates +- 3 days
+
+
+def _day(date):
+    return pd.Timestamp(date).normalize()
+
+
+def grid_centers(objs):
+    '''
+    Round-trip queries whose grids together cover every combination in objs. Greedy: the
+    earliest uncovered combination becomes the corner of the next grid.
+    '''
+    centers = []
+    routes = {}
+    for obj in objs:
+        assert obj.type == 'round-trip', "Grid shortlisting needs round trips."
+        routes.setdefault((obj.origin[0], obj.dest[0]), set()).add((_day(obj.date[0]), _day(obj.date[1])))
+
+    span = timedelta(days=2 * _HALF)
+    for (org, dest), pairs in routes.items():
+        remaining = sorted(pairs)
+        while remaining:
+            dep, ret = remaining[0]
+            centers += [Scrape(org, dest, (dep + timedelta(days=_HALF)).strftime('%Y-%m-%d'),
+                               (ret + timedelta(days=_HALF)).strftime('%Y-%m-%d'))]
+            remaining = [(d, r) for d, r in remaining if not (dep <= d <= dep + span and ret <= r <= ret + span)]
+    return centers
+
+
+def grid_prices(grids):
+    '''
+    Price per (origin, destination, departure, return) from scraped grid objects.
+    '''
+    prices = {}
+    for obj in grids:
+        if obj.grid is None:
+            continue
+        for (ret, dep), price in obj.grid.stack().items():
+            if not np.isnan(price):
+                prices[(obj.origin[0], obj.dest[0], dep, ret)] = price
+    return prices
+
+
+def scrape_grids(grids, pool=None, scrape_grid=None):
+    '''
+    Fill the grids one by one. A grid that fails (timeouts, no "Date grid" button on its page)
+    keeps grid None: it has no prices and the other grids still load.
+
+    scrape_grid: callable filling the grids of a list of objects, defaults to ScrapeGrid
+    '''
+    owned = pool is None and scrape_grid is None
+    if owned:
+        pool = DriverPool()
+
+    def fill(grid, driver=None):
+        try:
+            if driver is None:
+                scrape_grid([grid])
+            else:
+                grid._scrape_grid(driver)
+        except (ScrapeError, NoSuchElementException):
+            pass
+
+    try:
+        for grid in grids:
+            if scrape_grid is not None:
+                fill(grid)
+                continue
+            # a missing button leaves the browser healthy, so it is caught before the pool sees it
+            with pool.driver() as driver:
+                fill(grid, driver)
+    finally:
+        if owned:
+            pool.close()
+    return grids
+
+
+def shortlist(objs, k=10, pool=None, scrape_grid=None):
+    '''
+    The k combinations of objs with the cheapest grid price, cheapest first. Combinations the
+    grids have no price for, also those of grids that failed to load, come after all priced ones.
+
+    scrape_grid: callable filling the grids of a list of objects, defaults to ScrapeGrid
+    '''
+    grids = scrape_grids(grid_centers(objs), pool=pool, scrape_grid=scrape_grid)
+
+    prices = grid_prices(grids)
+    key = lambda obj: prices.get((obj.origin[0], obj.dest[0], _day(obj.date[0]), _day(obj.date[1])), np.inf)
+    return sorted(objs, key=key)[:k]
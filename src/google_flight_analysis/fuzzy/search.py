@@ -0,0 +1,162 @@
+from contextlib import contextmanager
+import os
+import pandas as pd
+from google_flight_analysis.scrape import ScrapeObjects
+from google_flight_analysis.flight import Flight
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.engine import iter_objects
+from google_flight_analysis.writers import open_writer
+from google_flight_analysis.procpool import scrape_processes
+from google_flight_analysis.fuzzy.best_first import BestFirstSearch
+from google_flight_analysis.fuzzy import grid_shortlist
+
+__all__ = ['FuzzySearch']
+
+
+class FuzzySearch():
+    '''
+    Searches over self.generated_scrape_objs, shared by the fuzzy searchers. Subclasses set
+    generated_scrape_objs and may change _default_threads and _threads.
+    '''
+
+    def _default_threads(self):
+        return min(32, (os.cpu_count() or 1) + 4)
+
+    @contextmanager
+    def _threads(self, max_threads, pool):
+        '''
+        (pool, throttle) for scraping on max_threads threads, extra keyword options of
+        search_and_merge_multithread/search_and_write are passed on here.
+        '''
+        yield pool, None
+
+    def shortlist(self, k=10, pool=None):
+        '''
+        Keep only the k round-trip combinations with the cheapest price calendar (date grid)
+        price, so search_and_merge scrapes just those. Returns the kept combinations.
+        '''
+        self.generated_scrape_objs = grid_shortlist.shortlist(self.generated_scrape_objs, k=k, pool=pool)
+        return self.generated_scrape_objs
+
+    def search_best(self, target=None, tolerance=0.05, radius=3, history=None, pool=None, scrape=None):
+        '''
+        Scrape the combinations cheapest-expected first instead of all of them, yielding a
+        Progress (with the best so far) after each page. Stops at target, or once the remaining
+        combinations can't beat the best within tolerance. See fuzzy.best_first.
+        '''
+        search = BestFirstSearch(self.generated_scrape_objs, history=history, target=target,
+                                 tolerance=tolerance, radius=radius, scrape=scrape)
+        return search.run(pool=pool)
+
+    def search_stream(self, max_threads=None, pool=None, on_result=None, keep=True):
+        '''
+        Scrape every combination, yielding (query, frame) as each page finishes so results can
+        be stored or analysed while scraping goes on. keep=False leaves the queries' data empty
+        so memory stays flat. See engine.stream_objects.
+        '''
+        if max_threads is None:
+            max_threads = self._default_threads()
+        return iter_objects(self.generated_scrape_objs, concurrency=max_threads, pool=pool, on_result=on_result, keep=keep)
+
+    def search_and_merge(self, file_name="output.xlsx", pool=None, journal=None, writer=None):
+        '''
+        Scrape the combinations one after another, writing each query's results as it finishes.
+
+        file_name: output file, its extension picks the format (.csv, .db, .parquet, .arrow or
+        .xlsx, see writers.open_writer)
+        writer: a ResultWriter to use instead of file_name
+        journal: optional JobJournal, finished queries are checkpointed and skipped when re-run
+
+        Returns the merged results.
+        '''
+        writer = open_writer(file_name if writer is None else writer)
+        owned = pool is None and journal is None
+        if owned:
+            pool = DriverPool()
+
+        try:
+            if journal is not None:
+                journal.run(self.generated_scrape_objs, pool=pool)
+                for scrape_obj in self.generated_scrape_objs:
+                    writer.write(scrape_obj.data)
+            else:
+                for scrape_obj in self.generated_scrape_objs:
+                    ScrapeObjects(scrape_obj, pool=pool)
+                    writer.write(scrape_obj.data)
+        finally:
+            writer.close()
+            if owned:
+                pool.close()
+        return self._merged()
+
+    def search_and_merge_multithread(self, file_name="output.xlsx", max_threads=None, pool=None, journal=None,
+                                     processes=None, writer=None, **options):
+        '''
+        file_name: output file, its extension picks the format (.csv, .db, .parquet, .arrow or
+        .xlsx, see writers.open_writer); results are written as each page finishes
+        writer: a ResultWriter to use instead of file_name
+        journal: optional JobJournal, finished queries are checkpointed and skipped when re-run
+        processes: scrape on this many worker processes (one browser each) instead of threads
+
+        Returns the merged results.
+        '''
+        self._scrape_into(file_name if writer is None else writer, True, max_threads, pool, journal, processes, options)
+        return self._merged()
+
+    def search_and_write(self, file_name, max_threads=None, pool=None, journal=None, processes=None, **options):
+        '''
+        As search_and_merge_multithread, but results only go to file_name (or a ResultWriter):
+        the queries keep no data, so memory stays flat however many combinations there are.
+
+        Returns the closed writer, writer.read() loads the results.
+        '''
+        return self._scrape_into(file_name, False, max_threads, pool, journal, processes, options)
+
+    def _merged(self):
+        return Flight.concat(scrape_obj.data for scrape_obj in self.generated_scrape_objs)
+
+    def _scrape_into(self, writer, keep, max_threads, pool, journal, processes, options):
+        if max_threads is None:
+            max_threads = self._default_threads()
+
+        writer = open_writer(writer)
+        scrape_objs, checkpoint = self.generated_scrape_objs, None
+        if journal is not None:
+            job = journal.plan(scrape_objs)
+            scrape_objs = journal.resume(job, scrape_objs)
+            for scrape_obj in scrape_objs:
+                journal.start(job, scrape_obj)
+            checkpoint = lambda scrape_obj: journal.complete(job, scrape_obj)
+
+        def on_done(scrape_obj):
+            if checkpoint is not None:
+                checkpoint(scrape_obj)
+            if not keep:
+                scrape_obj.data = pd.DataFrame()
+
+        try:
+            # queries finished in an earlier run come back from the journal
+            pending = set(map(id, scrape_objs))
+            for scrape_obj in self.generated_scrape_objs:
+                if id(scrape_obj) not in pending:
+                    writer.write(scrape_obj.data)
+                    if not keep:
+                        scrape_obj.data = pd.DataFrame()
+
+            if processes is not None:
+                def finished(scrape_obj):
+                    writer.write(scrape_obj.data)
+                    on_done(scrape_obj)
+
+                scrape_processes(scrape_objs, processes=processes, on_done=finished)
+                return writer
+
+            # every URL is spread over max_threads browsers and written as soon as it finishes;
+            # the journal checkpoints obj.data, so with one the frames are merged until on_done
+            with self._threads(max_threads, pool, **options) as (pool, throttle):
+                for _, df in iter_objects(scrape_objs, concurrency=max_threads, pool=pool, throttle=throttle,
+                                          on_done=on_done, keep=keep or checkpoint is not None):
+                    writer.write(df)
+        finally:
+            writer.close()
+        return writer
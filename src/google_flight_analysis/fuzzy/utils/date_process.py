@@ -1,13 +1,22 @@
 from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
 import re
 import itertools
 
 class DateParser:
+    # base date and any modifiers
+    PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})(\+(-?\d+))?(?:(\-)(\d+))?")
+
+    @staticmethod
+    def is_date(text) -> bool:
+        '''
+        Whether text is a date with optional modifiers ('2024-09-27', '2024-09-27+2-1').
+        '''
+        return isinstance(text, str) and DateParser.PATTERN.fullmatch(text) is not None
+
     @staticmethod
     def _parse_date(date_str: str) -> list:
-        # Pattern to match the base date and any modifiers
-        pattern = r"(\d{4}-\d{2}-\d{2})(\+(-?\d+))?(?:(\-)(\d+))?"
-        match = re.match(pattern, date_str)
+        match = DateParser.PATTERN.match(date_str)
         if not match:
             raise ValueError("Date format is incorrect. Expected format: '%Y-%m-%d[+m][-n]'.")
 
@@ -26,19 +35,67 @@ class DateParser:
         return [start_date + timedelta(days=x) for x in range((end_date - start_date).days + 1)]
 
     @staticmethod
-    def generate_date_combinations(date_strings: list):
+    def generate_date_combinations(date_strings: list, min_stay: int = None, max_stay: int = None,
+                                   weekdays=None, limit: int = None):
+        '''
+        Strictly increasing date combinations, one date per leg.
+
+        min_stay/max_stay: bounds in days between consecutive legs, min_stay at least 1
+        weekdays: allowed weekdays (0 = Monday), either one collection for every leg or one per leg
+        limit: stop after this many combinations
+        '''
+        # every query needs strictly increasing dates, so legs are at least a day apart
+        assert min_stay is None or min_stay >= 1, "min_stay must be at least 1 day, legs can't share a date."
         date_lists = [DateParser._parse_date(date_str) for date_str in date_strings]
-        return DateParser._generate_ordered_combinations(date_lists)
+        return DateParser._generate_ordered_combinations(date_lists, min_stay, max_stay, weekdays, limit)
+
+    @staticmethod
+    def _generate_ordered_combinations(date_lists, min_stay=None, max_stay=None, weekdays=None, limit=None):
+        '''
+        Walks the legs depth first and only visits dates that can follow the previous leg, found
+        by bisecting the sorted dates of the next leg, so invalid combinations are never built.
+        Combinations come out in the same (lexicographic) order as itertools.product.
+        '''
+        masks = DateParser._weekday_masks(weekdays, len(date_lists))
+        date_lists = [sorted(d for d in dates if masks[i] is None or d.weekday() in masks[i])
+                      for i, dates in enumerate(date_lists)]
+        if not date_lists or not all(date_lists):
+            return
+
+        gap_min = timedelta(days=1 if min_stay is None else min_stay)
+        gap_max = None if max_stay is None else timedelta(days=max_stay)
+
+        def extend(prefix, leg):
+            if leg == len(date_lists):
+                yield tuple(prefix)
+                return
+
+            dates = date_lists[leg]
+            lo, hi = 0, len(dates)
+            if prefix:
+                lo = bisect_left(dates, prefix[-1] + gap_min)
+                if gap_max is not None:
+                    hi = bisect_right(dates, prefix[-1] + gap_max)
+            for date in dates[lo:hi]:
+                prefix.append(date)
+                yield from extend(prefix, leg + 1)
+                prefix.pop()
+
+        yield from itertools.islice(extend([], 0), limit)
 
     @staticmethod
-    def _generate_ordered_combinations(date_lists):
-        for combination in itertools.product(*date_lists):
-            if all(earlier <= later for earlier, later in zip(combination, combination[1:])):
-                yield combination
+    def _weekday_masks(weekdays, legs):
+        if weekdays is None:
+            return [None] * legs
+        weekdays = list(weekdays)
+        if all(isinstance(day, int) for day in weekdays):
+            return [set(weekdays)] * legs
+        assert len(weekdays) == legs, "Give one weekday collection per leg, or one for all legs."
+        return [None if days is None else set(days) for days in weekdays]
 
 
 if __name__ == "__main__":
     date_strings = ["2023-06-15+2", "2023-06-18-3", "2023-06-18+0-0"]
     combinations = DateParser.generate_date_combinations(date_strings)
     for combination in combinations:
-        print([date.strftime("%Y-%m-%d") for date in combination])
\ No newline at end of file
+        print([date.strftime("%Y-%m-%d") for date in combination])
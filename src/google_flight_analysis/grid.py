@@ -0,0 +1,107 @@
+from datetime import datetime
+import re
+import numpy as np
+import pandas as pd
+
+__all__ = ['parse_grid', 'GRID_SUFFIX', 'GRID_SCRIPT']
+
+'''
+	Price calendar ("Date grid") of a round-trip search.
+
+	The grid opens over a results page and shows the cheapest round-trip price for a 7 x 7
+	window of departure x return dates around the query. Its text reads row by row:
+
+		Date grid, ..., <departure date> x 7, <return date>, <price or -> x 7, <return date>, ...
+
+	with dates as "Mon, May 15" (no year) and prices as "$512". parse_grid turns it into a
+	matrix indexed by return date with one column per departure date, NaN where there are
+	no flights.
+'''
+
+# recordings of a grid are stored under the results URL plus this suffix
+GRID_SUFFIX = '#date-grid'
+
+_DATE = re.compile(r"^(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun), ([A-Z][a-z]{2}) (\d{1,2})$")
+_PRICE = re.compile(r"^\$([\d,]+)$")
+_EMPTY = {'—', '–', '-', 'No flights'}
+
+def _grid_date(month, day, ref):
+	# the grid omits the year, take the one that puts the date closest to the query date
+	best = None
+	for year in (ref.year - 1, ref.year, ref.year + 1):
+		try:
+			date = datetime.strptime("{y} {m} {d}".format(y = year, m = month, d = day), "%Y %b %d")
+		except ValueError:
+			continue
+		if best is None or abs(date - ref) < abs(best - ref):
+			best = date
+	return best
+
+def parse_grid(lines, ref_date):
+	'''
+		Price matrix from the text lines of the date grid. ref_date is the query's departure
+		date ('YYYY-MM-DD'), used to place the year-less grid dates.
+	'''
+	ref = datetime.strptime(ref_date, "%Y-%m-%d")
+
+	tokens = []
+	for line in lines:
+		line = line.strip()
+		match = _DATE.match(line)
+		if match:
+			tokens += [('date', _grid_date(match.group(1), match.group(2), ref))]
+			continue
+		match = _PRICE.match(line)
+		if match:
+			tokens += [('price', float(match.group(1).replace(',', '')))]
+		elif line in _EMPTY and tokens:
+			tokens += [('price', np.nan)]
+
+	# leading dates: the departure header followed by the label of the first row
+	head = 0
+	while head < len(tokens) and tokens[head][0] == 'date':
+		head += 1
+	departs = [date for _, date in tokens[:head - 1]]
+	k = len(departs)
+	if k == 0:
+		return pd.DataFrame(index = pd.DatetimeIndex([], name = 'Return'), columns = pd.DatetimeIndex([], name = 'Departure'), dtype = float)
+
+	returns, rows = [], []
+	i = head - 1
+	while i + k < len(tokens) and tokens[i][0] == 'date':
+		cells = tokens[i + 1:i + 1 + k]
+		if any(kind != 'price' for kind, _ in cells):
+			break
+		returns += [tokens[i][1]]
+		rows += [[value for _, value in cells]]
+		i += k + 1
+
+	return pd.DataFrame(
+		np.array(rows, dtype = float).reshape(len(rows), k),
+		index = pd.DatetimeIndex(returns, name = 'Return'),
+		columns = pd.DatetimeIndex(departs, name = 'Departure')
+	)
+
+'''
+	Resolves with the text of the date grid dialog once all 49 cells show a price or a dash,
+	or once the number of filled cells has not changed for half a second (dates in the past
+	stay blank).
+'''
+GRID_SCRIPT = '''
+var done = arguments[arguments.length - 1];
+var CELL = /^(\\$[\\d,]+|\\u2014|\\u2013|-)$/;
+var last = -1, stable = 0;
+
+var timer = setInterval(function () {
+	var dialog = document.querySelector('[role="dialog"]');
+	if (!dialog || dialog.innerText.indexOf('Date grid') < 0) return;
+	var lines = dialog.innerText.split('\\n');
+	var cells = lines.filter(function (line) { return CELL.test(line.trim()); }).length;
+	stable = (cells > 0 && cells === last) ? stable + 1 : 0;
+	last = cells;
+	if (cells >= 49 || stable >= 5) {
+		clearInterval(timer);
+		done({state: 'ready', lines: lines});
+	}
+}, 100);
+'''
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from google_flight_analysis.scrape import ScrapeObjects
+from google_flight_analysis.driver import DriverPool
+
+__all__ = ['JobJournal']
+
+'''
+	Checkpoints for long batch scrapes.
+
+	A job is the set of queries it plans, identified by the hash of their URLs, so the same
+	job spec maps to the same job on every run. Each query is one row in a SQLite file with
+	its status (pending, running, done, failed), attempts and the file its result frame was
+	pickled to. Results are written as soon as a query finishes; running the job again only
+	scrapes queries that are not done.
+'''
+
+_SCHEMA = '''
+	CREATE TABLE IF NOT EXISTS items (
+		job TEXT NOT NULL,
+		key TEXT NOT NULL,
+		urls TEXT NOT NULL,
+		status TEXT NOT NULL DEFAULT 'pending',
+		attempts INTEGER NOT NULL DEFAULT 0,
+		result TEXT,
+		error TEXT,
+		updated REAL,
+		PRIMARY KEY (job, key)
+	)
+'''
+
+
+class JobJournal:
+
+	def __init__(self, path = 'jobs.sqlite', result_dir = None):
+		self.path = path
+		self.result_dir = result_dir if result_dir is not None else os.path.splitext(path)[0] + '_results'
+		os.makedirs(self.result_dir, exist_ok = True)
+
+		self._lock = threading.Lock()
+		self._conn = sqlite3.connect(path, check_same_thread = False, isolation_level = None)
+		self._conn.execute('PRAGMA journal_mode=WAL')
+		self._conn.execute(_SCHEMA)
+
+	def __repr__(self):
+		return "JobJournal({path}, {status})".format(path = self.path, status = self.status())
+
+	def __str__(self):
+		return self.__repr__()
+
+	def close(self):
+		with self._lock:
+			self._conn.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	@staticmethod
+	def item_key(obj):
+		return '\n'.join(obj.url)
+
+	@staticmethod
+	def job_id(objs):
+		keys = sorted(set(JobJournal.item_key(obj) for obj in objs))
+		return hashlib.sha1('\n\n'.join(keys).encode()).hexdigest()[:16]
+
+	def plan(self, objs):
+		'''
+			Register every query of the job, keeping the state of queries seen in earlier runs.
+			Returns the job id.
+		'''
+		job = JobJournal.job_id(objs)
+		rows = [(job, JobJournal.item_key(obj), json.dumps(obj.url)) for obj in objs]
+		with self._lock:
+			self._conn.executemany('INSERT OR IGNORE INTO items (job, key, urls) VALUES (?, ?, ?)', rows)
+		return job
+
+	def status(self, job = None):
+		'''
+			Number of queries per status, for one job or all of them.
+		'''
+		query = 'SELECT status, COUNT(*) FROM items'
+		params = ()
+		if job is not None:
+			query += ' WHERE job = ?'
+			params = (job,)
+		with self._lock:
+			return dict(self._conn.execute(query + ' GROUP BY status', params).fetchall())
+
+	def items(self, job):
+		with self._lock:
+			rows = self._conn.execute(
+				'SELECT key, status, attempts, result, error FROM items WHERE job = ?', (job,)
+			).fetchall()
+		return [dict(zip(('key', 'status', 'attempts', 'result', 'error'), row)) for row in rows]
+
+	def resume(self, job, objs):
+		'''
+			Fill the objects that finished in an earlier run from their stored results.
+			Returns the objects still to scrape.
+		'''
+		with self._lock:
+			done = dict(self._conn.execute(
+				"SELECT key, result FROM items WHERE job = ? AND status = 'done'", (job,)
+			).fetchall())
+
+		pending = []
+		for obj in objs:
+			fname = done.get(JobJournal.item_key(obj))
+			if fname is None or not self._load(obj, fname):
+				pending += [obj]
+		return pending
+
+	def start(self, job, obj):
+		self._update(job, obj, "status = 'running', attempts = attempts + 1")
+
+	def complete(self, job, obj):
+		'''
+			Persist the result of a finished query. Queries with failed legs are marked failed
+			(and retried on the next run), keeping the error report.
+		'''
+		if obj.failures:
+			self._update(job, obj, "status = 'failed', error = ?", json.dumps(obj.failures))
+			return
+
+		fname = os.path.join(self.result_dir, hashlib.sha1(JobJournal.item_key(obj).encode()).hexdigest() + '.pkl')
+		tmp = fname + '.tmp'
+		with open(tmp, 'wb') as file:
+			pickle.dump(obj.data, file, protocol = pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp, fname)
+		self._update(job, obj, "status = 'done', result = ?, error = NULL", fname)
+
+	def run(self, objs, pool = None):
+		'''
+			Scrape the unfinished queries of the job one by one, checkpointing each.
+			Modifies the objects in-place and returns them.
+		'''
+		job = self.plan(objs)
+		pending = self.resume(job, objs)
+
+		owned = pool is None
+		if owned:
+			pool = DriverPool()
+		try:
+			for obj in pending:
+				self.start(job, obj)
+				ScrapeObjects(obj, pool = pool)
+				self.complete(job, obj)
+		finally:
+			if owned:
+				pool.close()
+		return objs
+
+	def _update(self, job, obj, assignments, *params):
+		with self._lock:
+			self._conn.execute(
+				'UPDATE items SET {a}, updated = ? WHERE job = ? AND key = ?'.format(a = assignments),
+				(*params, time.time(), job, JobJournal.item_key(obj))
+			)
+
+	def _load(self, obj, fname):
+		try:
+			with open(fname, 'rb') as file:
+				obj.data = pickle.load(file)
+		except (OSError, EOFError, pickle.UnpicklingError):
+			return False
+		return True
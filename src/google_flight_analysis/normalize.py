@@ -0,0 +1,101 @@
+from functools import lru_cache
+import pandas as pd
+import re
+
+__all__ = ['normalize', 'CARRIER_CODES']
+
+'''
+	Numeric/categorical forms of the free text flight columns:
+
+	'Travel Time (min)'  minutes from 'Travel Time' ("6 hr 10 min")
+	'Layover (min)'      minutes from 'Layover' ("1 hr 15 min WAW"), NA when the page gives none
+	'Stop Airports'      comma separated stop airports from 'Layover' ("WAW" or "AMS,BUD")
+	'Marketing Carrier'  IATA code of the first airline in 'Airline(s)', the name if unknown
+	'Operating Carrier'  IATA code of the "Operated by" airline, else the marketing carrier
+
+	These texts repeat heavily, so every parser below is cached per distinct string and
+	frames are normalized by mapping their unique values only.
+
+	'Stop Airports' is a string rather than a list on purpose: a stop sequence such as
+	"AMS,BUD" is one category, which keeps the column categorical and lets it round-trip
+	through CSV, SQLite and Parquet unchanged. df['Stop Airports'].str.split(',') gives lists.
+'''
+
+CARRIER_CODES = {
+	'Aegean': 'A3', 'Aer Lingus': 'EI', 'Aeromexico': 'AM', 'Air Canada': 'AC', 'Air China': 'CA',
+	'Air Europa': 'UX', 'Air France': 'AF', 'Air India': 'AI', 'Alaska': 'AS', 'Alitalia': 'AZ',
+	'All Nippon Airways': 'NH', 'ANA': 'NH', 'American': 'AA', 'American Eagle': 'AA',
+	'Austrian': 'OS', 'Avianca': 'AV', 'British Airways': 'BA', 'Brussels Airlines': 'SN',
+	'Cathay Pacific': 'CX', 'China Eastern': 'MU', 'China Southern': 'CZ', 'Condor': 'DE',
+	'Copa': 'CM', 'Delta': 'DL', 'Egyptair': 'MS', 'Emirates': 'EK', 'Endeavor Air': '9E',
+	'Envoy Air': 'MQ', 'Etihad': 'EY', 'EVA Air': 'BR', 'Finnair': 'AY', 'Frontier': 'F9',
+	'Hainan': 'HU', 'Hawaiian': 'HA', 'Iberia': 'IB', 'Icelandair': 'FI', 'ITA': 'AZ',
+	'Japan Airlines': 'JL', 'JetBlue': 'B6', 'KLM': 'KL', 'Korean Air': 'KE', 'LATAM': 'LA',
+	'LOT': 'LO', 'Lufthansa': 'LH', 'Norse Atlantic Airways': 'N0', 'Pegasus': 'PC',
+	'Qantas': 'QF', 'Qatar Airways': 'QR', 'Republic Airways': 'YX', 'Royal Jordanian': 'RJ',
+	'Ryanair': 'FR', 'SAS': 'SK', 'Singapore Airlines': 'SQ', 'SkyWest': 'OO', 'Southwest': 'WN',
+	'Spirit': 'NK', 'Sun Country Airlines': 'SY', 'SWISS': 'LX', 'TAP Air Portugal': 'TP',
+	'Turkish Airlines': 'TK', 'United': 'UA', 'Virgin Atlantic': 'VS', 'Vueling': 'VY',
+	'WestJet': 'WS', 'Wizz Air': 'W6'
+}
+
+# longest names first so "American Eagle" wins over "American"
+_CARRIER_NAMES = sorted(CARRIER_CODES, key = len, reverse = True)
+
+_DURATION = re.compile(r'(?:(\d+) hr)?\s*(?:(\d+) min)?')
+_AIRPORT = re.compile(r'\b[A-Z]{3}\b')
+_OPERATED = re.compile(r'Operated by (.+?)(?: as |,|$)')
+
+@lru_cache(maxsize = 4096)
+def duration_minutes(text):
+	match = _DURATION.match(text.strip())
+	if match is None or (match.group(1) is None and match.group(2) is None):
+		return None
+	return int(match.group(1) or 0) * 60 + int(match.group(2) or 0)
+
+@lru_cache(maxsize = 4096)
+def stop_airports(text):
+	return ','.join(_AIRPORT.findall(text)) or None
+
+@lru_cache(maxsize = 4096)
+def carrier_code(name):
+	name = name.split(',')[0].split('Operated')[0].strip()
+	if name in CARRIER_CODES:
+		return CARRIER_CODES[name]
+	# Google runs multiple marketing carriers together ("LOTDelta"), match the leading one
+	for known in _CARRIER_NAMES:
+		if name.startswith(known):
+			return CARRIER_CODES[known]
+	return name
+
+@lru_cache(maxsize = 4096)
+def operating_code(text):
+	match = _OPERATED.search(text)
+	return None if match is None else carrier_code(match.group(1))
+
+def normalize(df, operating = None):
+	'''
+		Add the normalized columns to a flight frame (in place) and return it.
+
+		operating: per-row "Operated by" text, when the airline column no longer carries it
+	'''
+	if 'Travel Time (min)' in df.columns:
+		return df
+
+	df['Travel Time (min)'] = _map_unique(df['Travel Time'], duration_minutes).astype('Int16')
+	df['Layover (min)'] = _map_unique(df['Layover'], duration_minutes).astype('Int16')
+	df['Stop Airports'] = pd.Categorical(_map_unique(df['Layover'], stop_airports))
+
+	marketing = _map_unique(df['Airline(s)'], carrier_code)
+	df['Marketing Carrier'] = pd.Categorical(marketing)
+
+	operating = df['Airline(s)'] if operating is None else pd.Series(operating, index = df.index)
+	operated = _map_unique(operating, operating_code)
+	df['Operating Carrier'] = pd.Categorical(operated.where(operated.notna(), marketing))
+
+	return df
+
+def _map_unique(series, func):
+	series = series.astype(object)
+	uniques = [x for x in series.dropna().unique() if isinstance(x, str)]
+	return series.map(dict(zip(uniques, map(func, uniques))))
@@ -0,0 +1,194 @@
+from datetime import datetime
+import json
+import re
+from google_flight_analysis.flight import Flight
+
+__all__ = ['extract_blobs', 'find_results', 'payload_flights', 'return_date_of', 'use_extractor']
+
+'''
+	Flights from the data blob embedded in the results page source.
+
+	Google ships the data behind a results page as script calls in the HTML:
+
+		AF_initDataCallback({key: 'ds:1', hash: '2', data:[...], sideChannel: {}});
+
+	The results blob holds the top flights at data[2][0] and the other flights at data[3][0],
+	one entry per itinerary:
+
+		[itinerary, [[null, price], booking token]]
+
+	itinerary positions used here:
+
+		0 marketing carrier code ('multi' when several)   1 airline names
+		2 legs                                            3 origin, 4 departure [y, m, d], 5 [h, m]
+		6 destination, 7 arrival [y, m, d], 8 [h, m]      9 travel time (min)
+		13 layovers [minutes, airport, airport name]      22 emissions, 7: CO2 (g), 8: typical for the route (g)
+
+	leg positions: 2 "Operated by ..." text, 3 departure airport, 6 arrival airport,
+	22 [carrier code, flight number, null, carrier name].
+
+	Decoding skips rendering the page to text and the section/time heuristics of
+	_Scrape._iter_flights. Times carry their own dates (no "+1" guessing), every flight in
+	the list is kept (the text view drops the last one before "... more flights"), and the
+	layover and carrier columns come from exact minutes and IATA codes.
+'''
+
+_CALLBACK = re.compile(r"AF_initDataCallback\(\{key:\s*'([^']+)'")
+_DATA = re.compile(r"\bdata:")
+_RETURN = re.compile(r"roundtrip%20return%20on%20(\d{4}-\d{2}-\d{2})")
+_DECODER = json.JSONDecoder()
+
+_SECTIONS = (2, 3)
+_AIRLINE_CODE, _AIRLINES, _LEGS, _ORIGIN, _DEP_DATE, _DEP_TIME = 0, 1, 2, 3, 4, 5
+_DEST, _ARR_DATE, _ARR_TIME, _DURATION, _LAYOVERS, _EMISSIONS = 6, 7, 8, 9, 13, 22
+_LEG_OPERATOR, _LEG_FLIGHT = 2, 22
+_CO2, _TYPICAL = 7, 8
+
+def use_extractor(extractor = 'text'):
+	'''
+		How results pages are read: 'text' (the rendered page lines) or 'payload' (the data
+		blob in the page source, falling back to the text when the page has none).
+	'''
+	from google_flight_analysis.scrape import _Scrape
+
+	assert extractor in ('text', 'payload'), "Unknown extractor {e}, use 'text' or 'payload'.".format(e = extractor)
+	_Scrape.extractor = extractor
+
+def extract_blobs(html):
+	'''
+		Every AF_initDataCallback data array in the page source, by key ('ds:0', 'ds:1', ...).
+	'''
+	blobs = {}
+	for match in _CALLBACK.finditer(html):
+		data = _DATA.search(html, match.end())
+		if data is None:
+			break
+		try:
+			blobs[match.group(1)], _ = _DECODER.raw_decode(html, data.end())
+		except ValueError:
+			continue
+	return blobs
+
+def _section(data, i):
+	try:
+		entries = data[i][0]
+	except (IndexError, TypeError):
+		return None
+	return entries if isinstance(entries, list) else None
+
+def find_results(html):
+	'''
+		The flight results blob of a page, None when the page has none. The blob is recognised
+		by its shape rather than its key, which changes between page versions: at least one
+		flight entry, and nothing else, in its result sections.
+	'''
+	for data in extract_blobs(html).values():
+		if not isinstance(data, list):
+			continue
+		sections = [_section(data, i) for i in _SECTIONS]
+		entries = [entry for section in sections if section for entry in section]
+		if entries and all(_is_entry(entry) for entry in entries):
+			return data
+	return None
+
+def _is_entry(entry):
+	return (
+		isinstance(entry, list) and len(entry) > 1 and isinstance(entry[0], list)
+		and len(entry[0]) > _DURATION and isinstance(entry[0][_ORIGIN], str)
+	)
+
+def return_date_of(url):
+	'''
+		Return date of a round-trip results URL, None for one-way URLs.
+	'''
+	match = _RETURN.search(url)
+	return None if match is None else match.group(1)
+
+def payload_flights(html, date, return_date = None):
+	'''
+		Flights of a results page from its source, None when the page carries no results blob.
+
+		date: departure date of the query ('YYYY-MM-DD'), as for _Scrape._iter_flights
+		return_date: the return date of round-trip queries, marks the flights as round trips
+	'''
+	data = find_results(html)
+	if data is None:
+		return None
+
+	flights = []
+	for i in _SECTIONS:
+		for entry in _section(data, i) or []:
+			flights += [_flight(entry, date, return_date)]
+	return flights
+
+def _flight(entry, date, return_date):
+	itinerary = entry[0]
+	legs = itinerary[_LEGS] or []
+	layovers = _get(itinerary, _LAYOVERS) or []
+
+	travel_min = itinerary[_DURATION]
+	layover_min = sum(stop[0] for stop in layovers) if layovers else None
+	if len(layovers) == 1:
+		stops = "{t} {a}".format(t = _duration(layovers[0][0]), a = layovers[0][1])
+	elif layovers:
+		stops = ', '.join(stop[1] for stop in layovers)
+	else:
+		stops = None
+
+	co2, emissions = None, None
+	grams = _get(itinerary, _EMISSIONS)
+	if grams and _get(grams, _CO2) is not None:
+		co2 = round(grams[_CO2] / 1000)
+		if _get(grams, _TYPICAL):
+			emissions = round((grams[_CO2] - grams[_TYPICAL]) * 100 / grams[_TYPICAL])
+
+	operators = [leg[_LEG_OPERATOR] for leg in legs if _get(leg, _LEG_OPERATOR)]
+	marketing = itinerary[_AIRLINE_CODE]
+	if not _is_code(marketing) and legs and _get(legs[0], _LEG_FLIGHT):
+		marketing = legs[0][_LEG_FLIGHT][0]
+
+	price = None
+	try:
+		price = entry[1][0][1]
+	except (IndexError, TypeError):
+		pass
+
+	return Flight.from_fields(
+		date,
+		origin = itinerary[_ORIGIN],
+		dest = itinerary[_DEST],
+		time_leave = _datetime(itinerary[_DEP_DATE], itinerary[_DEP_TIME]),
+		time_arrive = _datetime(itinerary[_ARR_DATE], itinerary[_ARR_TIME]),
+		airline = ', '.join(itinerary[_AIRLINES] or []) or None,
+		flight_time = None if travel_min is None else _duration(travel_min),
+		num_stops = len(layovers) if legs or layovers else None,
+		stops = stops,
+		co2 = co2,
+		emissions = emissions,
+		price = price,
+		round_trip = return_date is not None,
+		round_trip_return_date = return_date,
+		operator = operators[0] if operators else None,
+		travel_min = travel_min,
+		layover_min = layover_min,
+		marketing = marketing if _is_code(marketing) else None
+	)
+
+def _get(array, i):
+	return array[i] if isinstance(array, list) and len(array) > i else None
+
+def _is_code(code):
+	return isinstance(code, str) and len(code) == 2 and code.isalnum() and code.isupper()
+
+def _datetime(day, time):
+	if not day:
+		return None
+	time = time or []
+	return datetime(day[0], day[1], day[2], _get(time, 0) or 0, _get(time, 1) or 0)
+
+def _duration(minutes):
+	# in the page's own format, "9 hr 40 min", "45 min", "3 hr"
+	hours, minutes = divmod(minutes, 60)
+	if hours and minutes:
+		return "{h} hr {m} min".format(h = hours, m = minutes)
+	return "{h} hr".format(h = hours) if hours else "{m} min".format(m = minutes)
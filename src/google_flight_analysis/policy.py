@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+
+__all__ = ['RetryPolicy', 'CircuitBreaker', 'ScrapeError']
+
+
+class ScrapeError(Exception):
+	'''
+		A query leg that failed after all retries.
+	'''
+
+	def __init__(self, url, date, attempts, cause):
+		super().__init__("{url} failed after {n} attempt(s): {cause!r}".format(url = url, n = attempts, cause = cause))
+		self.url = url
+		self.date = date
+		self.attempts = attempts
+		self.cause = cause
+
+	def report(self):
+		return {
+			'url': self.url,
+			'date': self.date,
+			'attempts': self.attempts,
+			'error': type(self.cause).__name__,
+			'message': str(self.cause)
+		}
+
+
+class RetryPolicy:
+	'''
+		retries: extra attempts after the first one
+		backoff: delay before the first retry in seconds, doubled for every further retry
+		max_backoff: cap on a single delay
+		jitter: fraction of each delay that is randomized, spreading out retries of many workers
+		timeout: seconds a single page may take to show results
+	'''
+
+	def __init__(self, retries = 2, backoff = 1.0, max_backoff = 30.0, jitter = 0.5, timeout = 10):
+		self.retries = retries
+		self.backoff = backoff
+		self.max_backoff = max_backoff
+		self.jitter = jitter
+		self.timeout = timeout
+
+	def __repr__(self):
+		return "RetryPolicy(retries:{r}, backoff:{b}s, timeout:{t}s)".format(r = self.retries, b = self.backoff, t = self.timeout)
+
+	def __str__(self):
+		return self.__repr__()
+
+	def delay(self, attempt):
+		delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+		return delay * (1 - self.jitter * random.random())
+
+
+class CircuitBreaker:
+	'''
+		Opens after `threshold` consecutive failures across all workers (usually throttling),
+		pausing every caller of wait() for `cooldown` seconds. Then it is half-open: one caller
+		goes through as a trial while the others keep waiting for its outcome. A success closes
+		the breaker, a failure opens it again.
+
+		trial_timeout: seconds before a trial that reported nothing is replaced by the next
+		caller, defaults to cooldown
+	'''
+
+	def __init__(self, threshold = 5, cooldown = 60, trial_timeout = None):
+		self.threshold = threshold
+		self.cooldown = cooldown
+		self.trial_timeout = cooldown if trial_timeout is None else trial_timeout
+
+		self._cond = threading.Condition()
+		self._failures = 0
+		self._open_until = 0.0
+		self._trial_until = 0.0
+		self.trips = 0
+
+	def __getstate__(self):
+		# a copy (e.g. in a worker process) keeps the settings and starts closed
+		return {'threshold': self.threshold, 'cooldown': self.cooldown, 'trial_timeout': self.trial_timeout}
+
+	def __setstate__(self, state):
+		self.__init__(**state)
+
+	def __repr__(self):
+		return "CircuitBreaker({state}, {n} consecutive failures)".format(state = self.state, n = self._failures)
+
+	def __str__(self):
+		return self.__repr__()
+
+	@property
+	def state(self):
+		if self._failures < self.threshold:
+			return 'closed'
+		return 'open' if time.monotonic() < self._open_until else 'half-open'
+
+	def wait(self):
+		with self._cond:
+			while True:
+				now = time.monotonic()
+				if self._failures < self.threshold:
+					return
+				if now < self._open_until:
+					self._cond.wait(self._open_until - now)
+				elif now >= self._trial_until:
+					# this caller is the trial, the others wait for it to record()
+					self._trial_until = now + self.trial_timeout
+					return
+				else:
+					self._cond.wait(self._trial_until - now)
+
+	def record(self, ok):
+		with self._cond:
+			self._trial_until = 0.0
+			if ok:
+				self._failures = 0
+			else:
+				self._failures += 1
+				if self._failures >= self.threshold:
+					self._open_until = time.monotonic() + self.cooldown
+					self.trips += 1
+			self._cond.notify_all()
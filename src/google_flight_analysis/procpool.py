@@ -0,0 +1,160 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from google_flight_analysis.scrape import Scrape, _Scrape
+from google_flight_analysis.driver import DriverPool
+
+__all__ = ['scrape_processes', 'encode_frame', 'decode_frame']
+
+'''
+	Process-pool scraping backend.
+
+	Each worker process owns one browser for its lifetime. Queries are sent as their Scrape
+	arguments, rebuilt in the worker, scraped and parsed there (so parsing runs on every core),
+	and sent back as compact column arrays rather than pickled DataFrames. A crashed worker
+	only loses the queries it held: the pool is restarted and the unfinished queries resent.
+
+	The _Scrape settings of the parent (extractor, retries, breaker, result cache, recording)
+	are copied into every worker when it starts. Breakers and in-memory cache tiers are per
+	process from then on, a cache directory is shared.
+'''
+
+_pool = None
+
+def encode_frame(df, format = 'numpy'):
+	'''
+		Compact, picklable form of a result frame.
+
+		numpy: one array per column, categoricals as codes plus categories and nullable
+		integers as values plus mask
+		arrow: Arrow IPC stream bytes (needs pyarrow)
+	'''
+	if format == 'arrow':
+		try:
+			import pyarrow as pa
+		except ImportError:
+			raise ImportError("format='arrow' needs pyarrow, install it or use format='numpy'.")
+
+		table = pa.Table.from_pandas(df, preserve_index = False)
+		sink = pa.BufferOutputStream()
+		with pa.ipc.new_stream(sink, table.schema) as writer:
+			writer.write_table(table)
+		return ('arrow', sink.getvalue().to_pybytes())
+
+	columns = []
+	for name in df.columns:
+		col = df[name]
+		if isinstance(col.dtype, pd.CategoricalDtype):
+			columns += [(name, 'category', col.cat.codes.to_numpy(), col.cat.categories.to_numpy(dtype = object))]
+		elif isinstance(col.array, pd.arrays.IntegerArray):
+			columns += [(name, str(col.dtype), col.array._data, col.array._mask)]
+		elif isinstance(col.dtype, np.dtype):
+			columns += [(name, None, col.to_numpy(), None)]
+		else:
+			columns += [(name, str(col.dtype), col.to_numpy(dtype = object), None)]
+	return ('numpy', columns)
+
+def decode_frame(payload):
+	format, body = payload
+	if format == 'arrow':
+		import pyarrow as pa
+		return pa.ipc.open_stream(body).read_pandas()
+
+	data = {}
+	for name, kind, values, extra in body:
+		if kind == 'category':
+			data[name] = pd.Categorical.from_codes(values, categories = extra)
+		elif extra is not None:
+			data[name] = pd.arrays.IntegerArray(values, extra)
+		elif kind is not None:
+			data[name] = pd.array(values, dtype = kind)
+		else:
+			data[name] = values
+	return pd.DataFrame(data)
+
+# class attributes of _Scrape a worker takes over from the parent
+_SETTINGS = ['extractor', 'retry_policy', 'circuit_breaker', 'result_cache', 'record_dir']
+
+def _settings():
+	return {name: getattr(_Scrape, name) for name in _SETTINGS}
+
+def _init_worker(factory, lean, max_pages, settings):
+	global _pool
+	for name, value in settings.items():
+		setattr(_Scrape, name, value)
+	_pool = DriverPool(factory = factory, lean = lean, max_pages = max_pages)
+
+	import atexit
+	atexit.register(_pool.close)
+
+def _scrape_spec(args, format):
+	obj = Scrape(*args)
+	try:
+		if not obj._scrape_cached():
+			with _pool.driver(pages = len(obj.url)) as driver:
+				obj._scrape_data(driver)
+	except Exception as e:
+		return args, None, [{'url': url, 'error': type(e).__name__, 'message': str(e)} for url in obj.url]
+	return args, encode_frame(obj.data, format), obj.failures
+
+def scrape_processes(objs, processes = None, factory = None, lean = False, max_pages = 50, format = 'numpy',
+	on_done = None, max_restarts = 3, context = 'spawn'):
+	'''
+		Scrape objs on `processes` worker processes, one browser each.
+		Modifies the objects in-place and returns them.
+
+		factory: picklable callable returning a driver in the worker, defaults to make_driver
+		format: 'numpy' or 'arrow', how results travel back (see encode_frame)
+		on_done: optional callback, called with each object as its results arrive
+		max_restarts: times the pool is restarted after a worker crash
+		context: multiprocessing start method; spawn keeps browser threads out of forked children
+	'''
+	if type(objs) is _Scrape:
+		objs = [objs]
+	if processes is None:
+		processes = os.cpu_count() or 1
+
+	# identical queries are scraped once and shared
+	by_args = {}
+	for obj in objs:
+		by_args.setdefault(tuple(obj.args), []).append(obj)
+	pending = list(by_args)
+
+	progress = tqdm(total = len(pending), desc = "Scraping Objects")
+	restarts = 0
+	try:
+		while pending:
+			executor = ProcessPoolExecutor(
+				max_workers = min(processes, len(pending)),
+				mp_context = multiprocessing.get_context(context),
+				initializer = _init_worker,
+				initargs = (factory, lean, max_pages, _settings())
+			)
+			try:
+				futures = [executor.submit(_scrape_spec, args, format) for args in pending]
+				for future in as_completed(futures):
+					args, payload, failures = future.result()
+					pending.remove(args)
+					progress.update()
+					for obj in by_args[args]:
+						obj._failures = failures
+						if payload is not None:
+							obj.data = decode_frame(payload)
+						if on_done is not None:
+							on_done(obj)
+			except BrokenProcessPool:
+				restarts += 1
+				if restarts > max_restarts:
+					raise
+				print("Worker crashed, restarting pool for {n} unfinished queries.".format(n = len(pending)))
+			finally:
+				executor.shutdown(wait = True, cancel_futures = True)
+	finally:
+		progress.close()
+
+	return objs
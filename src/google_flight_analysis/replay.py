@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import time
+from glob import glob
+from google_flight_analysis.grid import GRID_SUFFIX
+
+__all__ = ['ReplayDriver', 'record_pages', 'save_page', 'load_page', 'save_source', 'load_source', 'parse_throughput']
+
+'''
+	Record/replay of result pages.
+
+	While recording, every page read by _Scrape._make_url_request is saved as
+	<directory>/<sha1 of url>.json holding the URL, the wait state and the raw text lines.
+	ReplayDriver serves those files through the part of the WebDriver interface the scraper
+	uses, so ScrapeObjects --> _clean_results --> Flight.dataframe runs without Chrome.
+	Date grids are saved under the results URL plus GRID_SUFFIX. With the payload extractor
+	the page source is saved next to the lines as <sha1 of url>.html.
+'''
+
+def record_pages(directory):
+	'''
+		Save every scraped page to directory. Pass None to stop recording.
+	'''
+	from google_flight_analysis.scrape import _Scrape
+
+	if directory is not None:
+		os.makedirs(directory, exist_ok = True)
+	_Scrape.record_dir = directory
+
+def page_path(directory, url):
+	return os.path.join(directory, hashlib.sha1(url.encode()).hexdigest() + '.json')
+
+def save_page(directory, url, lines, state = 'ready'):
+	with open(page_path(directory, url), 'w') as file:
+		json.dump({'url': url, 'state': state, 'lines': lines}, file)
+
+def load_page(directory, url):
+	fname = page_path(directory, url)
+	if not os.path.isfile(fname):
+		raise FileNotFoundError("No recording of {url} in {dir}".format(url = url, dir = directory))
+
+	with open(fname) as file:
+		return json.load(file)
+
+def source_path(directory, url):
+	return os.path.join(directory, hashlib.sha1(url.encode()).hexdigest() + '.html')
+
+def save_source(directory, url, html):
+	with open(source_path(directory, url), 'w') as file:
+		file.write(html)
+
+def load_source(directory, url):
+	'''
+		Recorded page source of url, None when only its lines were recorded.
+	'''
+	fname = source_path(directory, url)
+	if not os.path.isfile(fname):
+		return None
+
+	with open(fname) as file:
+		return file.read()
+
+def parse_throughput(directory, repeat = 100):
+	'''
+		Parse every recorded page in directory `repeat` times, return pages parsed per second.
+	'''
+	from google_flight_analysis.scrape import _Scrape
+	from google_flight_analysis.flight import Flight
+
+	pages = []
+	for fname in glob(os.path.join(directory, '*.json')):
+		with open(fname) as file:
+			page = json.load(file)
+		if page['state'] == 'ready':
+			pages += [page['lines']]
+	assert len(pages) > 0, "No recorded pages in {dir}".format(dir = directory)
+
+	start = time.perf_counter()
+	for _ in range(repeat):
+		for lines in pages:
+			Flight.dataframe(_Scrape._clean_results(lines, '2023-01-01'))
+	return len(pages) * repeat / (time.perf_counter() - start)
+
+
+class _ReplayElement:
+
+	def __init__(self, text, on_click = None):
+		self.text = text
+		self.on_click = on_click
+
+	def click(self):
+		if self.on_click is not None:
+			self.on_click()
+
+
+class ReplayDriver:
+	'''
+		Stand-in for webdriver.Chrome serving pages recorded in directory.
+	'''
+
+	def __init__(self, directory):
+		self.directory = directory
+		self._page = None
+		self._source = None
+		self._url = 'about:blank'
+
+	def __repr__(self):
+		return "ReplayDriver({dir})".format(dir = self.directory)
+
+	def __str__(self):
+		return self.__repr__()
+
+	@property
+	def current_url(self):
+		return self._url
+
+	@property
+	def page_source(self):
+		# a page recorded without its source looks like one without a data blob
+		return self._source or '<html><head></head><body></body></html>'
+
+	def get(self, url):
+		self._source = load_source(self.directory, url)
+		self._page = None
+		# pages recorded with the payload extractor may have no lines when the blob was found
+		if self._source is None or os.path.isfile(page_path(self.directory, url)):
+			self._page = load_page(self.directory, url)
+		self._url = url
+
+	def find_element(self, by = None, value = None):
+		if value is not None and 'Date grid' in value:
+			# clicking the button shows the recorded grid instead of the results
+			return _ReplayElement('Date grid', lambda: self._show(self._url + GRID_SUFFIX))
+		return _ReplayElement('\n'.join(self._page['lines']))
+
+	def _show(self, key):
+		self._page = load_page(self.directory, key)
+
+	def set_script_timeout(self, timeout):
+		pass
+
+	def execute_async_script(self, script, *args):
+		return {'state': self._page['state'], 'lines': list(self._page['lines'])}
+
+	def execute_cdp_cmd(self, cmd, params):
+		return {}
+
+	def maximize_window(self):
+		pass
+
+	def quit(self):
+		self._page = None
@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qsl, unquote
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+__all__ = ['ResultCache', 'cache_key', 'use_result_cache']
+
+'''
+	Parsed result frames keyed by query URL, in front of the browser.
+
+	Two tiers: an in-memory LRU of at most max_entries frames and, when a directory is
+	given, pickled frames on disk limited to max_bytes (oldest files evicted first).
+	Entries older than ttl seconds are treated as missing in both tiers. Empty frames often
+	come from a page that hadn't rendered yet or a consent/interstitial page, so they are kept
+	for empty_ttl seconds only, and not at all by default.
+'''
+
+def cache_key(url):
+	'''
+		Normalized key for a results URL: the query text plus locale and currency.
+	'''
+	params = dict(parse_qsl(urlsplit(url).query))
+	return "{q}|hl={hl}|curr={curr}".format(
+		q = ' '.join(unquote(params.get('q', url)).split()).lower(),
+		hl = params.get('hl', '').lower(),
+		curr = params.get('curr', '').upper()
+	)
+
+def use_result_cache(cache):
+	'''
+		Consult cache for every scraped URL. Pass None to turn caching off.
+	'''
+	from google_flight_analysis.scrape import _Scrape
+
+	_Scrape.result_cache = cache
+
+
+class ResultCache:
+
+	def __init__(self, directory = None, ttl = 6 * 3600, max_entries = 256, max_bytes = 256 * 2**20, empty_ttl = 0):
+		self.directory = directory
+		self.ttl = ttl
+		self.empty_ttl = empty_ttl
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+
+		self._memory = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+		if directory is not None:
+			os.makedirs(directory, exist_ok = True)
+
+	def __getstate__(self):
+		# a copy (e.g. in a worker process) starts with an empty memory tier, the directory is shared
+		return {'directory': self.directory, 'ttl': self.ttl, 'max_entries': self.max_entries, 'max_bytes': self.max_bytes,
+			'empty_ttl': self.empty_ttl}
+
+	def __setstate__(self, state):
+		self.__init__(**state)
+
+	def __repr__(self):
+		return "ResultCache({n} in memory, dir:{dir}, ttl:{ttl}s)".format(
+			n = len(self._memory), dir = self.directory, ttl = self.ttl
+		)
+
+	def __str__(self):
+		return self.__repr__()
+
+	def __len__(self):
+		return len(self._memory)
+
+	def get(self, url):
+		key = cache_key(url)
+		now = time.time()
+
+		with self._lock:
+			entry = self._memory.get(key)
+			if entry is not None:
+				if now - entry[0] <= self._ttl(entry[1]):
+					self._memory.move_to_end(key)
+					self.hits += 1
+					return entry[1].copy()
+				del self._memory[key]
+
+		entry = self._read(key, now)
+		with self._lock:
+			if entry is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+			self._remember(key, entry)
+		return entry[1].copy()
+
+	def put(self, url, df):
+		if df.empty and self.empty_ttl <= 0:
+			return
+		key = cache_key(url)
+		entry = (time.time(), df.copy())
+
+		with self._lock:
+			self._remember(key, entry)
+		self._write(key, entry)
+
+	def clear(self):
+		with self._lock:
+			self._memory.clear()
+		if self.directory is not None:
+			for fname in self._files():
+				os.remove(fname)
+
+	def _ttl(self, df):
+		return self.empty_ttl if df.empty else self.ttl
+
+	def _remember(self, key, entry):
+		self._memory[key] = entry
+		self._memory.move_to_end(key)
+		while len(self._memory) > self.max_entries:
+			self._memory.popitem(last = False)
+
+	def _path(self, key):
+		return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.pkl')
+
+	def _files(self):
+		return [entry.path for entry in os.scandir(self.directory) if entry.name.endswith('.pkl')]
+
+	def _read(self, key, now):
+		if self.directory is None:
+			return None
+
+		fname = self._path(key)
+		try:
+			with open(fname, 'rb') as file:
+				stored_key, stored_at, df = pickle.load(file)
+		except (OSError, EOFError, pickle.UnpicklingError):
+			return None
+
+		if stored_key != key or now - stored_at > self._ttl(df):
+			return None
+		return stored_at, df
+
+	def _write(self, key, entry):
+		if self.directory is None:
+			return
+
+		# write then rename so readers never see a partial file
+		fname = self._path(key)
+		tmp = "{f}.{pid}.{tid}.tmp".format(f = fname, pid = os.getpid(), tid = threading.get_ident())
+		with open(tmp, 'wb') as file:
+			pickle.dump((key, entry[0], entry[1]), file, protocol = pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp, fname)
+		self._evict()
+
+	def _evict(self):
+		files = []
+		for fname in self._files():
+			try:
+				stat = os.stat(fname)
+			except OSError:
+				continue
+			files += [(stat.st_mtime, stat.st_size, fname)]
+
+		total = sum(size for _, size, _ in files)
+		for mtime, size, fname in sorted(files):
+			if total <= self.max_bytes and time.time() - mtime <= self.ttl:
+				continue
+			try:
+				os.remove(fname)
+			except OSError:
+				pass
+			total -= size
@@ -0,0 +1,127 @@
+import threading
+import psutil
+
+__all__ = ['ResourceScheduler', 'process_tree_rss']
+
+'''
+	Admission of browsers by measured cost.
+
+	A Chrome session is a chromedriver process with a tree of browser, renderer and GPU
+	processes below it, often several hundred MB together and growing with every page. The
+	scheduler sums the RSS of each tree, lets the pool start another browser only if the
+	average measured browser still fits in the memory budget (and the CPU is not saturated),
+	and flags browsers whose tree grew past recycle_rss so the pool replaces them.
+'''
+
+def process_tree_rss(pid):
+	'''
+		Resident memory of a process and all its descendants, in bytes.
+	'''
+	try:
+		proc = psutil.Process(pid)
+		procs = [proc] + proc.children(recursive = True)
+	except psutil.Error:
+		return 0
+
+	total = 0
+	for p in procs:
+		try:
+			total += p.memory_info().rss
+		except psutil.Error:
+			pass # exited while we looked
+	return total
+
+def _driver_pid(driver):
+	# selenium drivers expose the chromedriver process, browsers run below it
+	try:
+		return driver.service.process.pid
+	except AttributeError:
+		return getattr(driver, 'pid', None)
+
+
+class ResourceScheduler:
+	'''
+		max_memory: bytes all browsers together may use, defaults to 80% of the memory
+		available when the scheduler is created
+		max_cpu: no new browser while system CPU use is above this percentage
+		recycle_rss: replace a browser once its process tree exceeds this many bytes
+		reserve: bytes of system memory always left free
+		estimate: assumed cost of a browser before any has been measured
+	'''
+
+	def __init__(self, max_memory = None, max_cpu = 90.0, recycle_rss = 1.5 * 2**30, reserve = 512 * 2**20, estimate = 400 * 2**20):
+		if max_memory is None:
+			max_memory = psutil.virtual_memory().available * 0.8
+		self.max_memory = max_memory
+		self.max_cpu = max_cpu
+		self.recycle_rss = recycle_rss
+		self.reserve = reserve
+		self.estimate = estimate
+
+		self._pids = {}
+		self._lock = threading.Lock()
+		psutil.cpu_percent(interval = None) # start the CPU sampling window
+
+	def __repr__(self):
+		return "ResourceScheduler({n} browsers, {used:.0f}/{budget:.0f} MB)".format(
+			n = len(self._pids), used = self.usage() / 2**20, budget = self.max_memory / 2**20
+		)
+
+	def __str__(self):
+		return self.__repr__()
+
+	def register(self, driver):
+		pid = _driver_pid(driver)
+		if pid is not None:
+			with self._lock:
+				self._pids[id(driver)] = pid
+
+	def unregister(self, driver):
+		with self._lock:
+			self._pids.pop(id(driver), None)
+
+	def rss(self, driver):
+		with self._lock:
+			pid = self._pids.get(id(driver))
+		return 0 if pid is None else process_tree_rss(pid)
+
+	def usage(self):
+		'''
+			Measured RSS of all registered browsers.
+		'''
+		return sum(self._measure())
+
+	def cost(self):
+		'''
+			Expected RSS of one more browser: the average of the live ones.
+		'''
+		return self._cost(self._measure())
+
+	def admits(self, live):
+		'''
+			Whether a pool with `live` browsers may start another one. A pool may always
+			start its first browser, otherwise it could never make progress.
+		'''
+		if live == 0:
+			return True
+
+		sizes = self._measure()
+		cost = self._cost(sizes)
+		if sum(sizes) + cost > self.max_memory:
+			return False
+		if psutil.virtual_memory().available - cost < self.reserve:
+			return False
+		return psutil.cpu_percent(interval = None) < self.max_cpu
+
+	def oversized(self, driver):
+		return self.recycle_rss is not None and self.rss(driver) > self.recycle_rss
+
+	def _measure(self):
+		with self._lock:
+			pids = list(self._pids.values())
+		return [process_tree_rss(pid) for pid in pids]
+
+	def _cost(self, sizes):
+		if not sizes:
+			return self.estimate
+		return max(self.estimate, sum(sizes) / len(sizes))
@@ -2,21 +2,25 @@
   Written by Kaya Celebi, April 2023
 ****************************************************************************************************************************************************************/'''
 
-from selenium import webdriver
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
-import chromedriver_autoinstaller
-from datetime import date, datetime, timedelta
-import numpy as np
+from datetime import datetime
 import pandas as pd
 from tqdm import tqdm
 import re
+import time
 from google_flight_analysis.flight import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.replay import save_page, save_source
+from google_flight_analysis.result_cache import cache_key
+from google_flight_analysis.singleflight import SingleFlight
+from google_flight_analysis.policy import RetryPolicy, CircuitBreaker, ScrapeError
+from google_flight_analysis.spec import QuerySpec, date_format, _urls
+from google_flight_analysis.grid import parse_grid, GRID_SUFFIX, GRID_SCRIPT
+from google_flight_analysis.payload import payload_flights, return_date_of
 
-__all__ = ['Scrape', '_Scrape', 'ScrapeObjects']
+__all__ = ['Scrape', '_Scrape', 'ScrapeObjects', 'ScrapeGrid']
 
-date_format = "%Y-%m-%d"
 '''
 	Iterative scraping
 	If value in DB dont run just return query
@@ -26,25 +30,64 @@ date_format = "%Y-%m-%d"
 	Europe date display vs US date display!
 '''
 
-def ScrapeObjects(objs, deep_copy = False):
+def ScrapeObjects(objs, deep_copy = False, pool = None):
 	if type(objs) is _Scrape:
 		objs = [objs]
 
-
-	chromedriver_autoinstaller.install() # check if chromedriver is installed correctly and on path
-	driver = webdriver.Chrome()
-	driver.maximize_window()
+	# without a shared pool, browse with a single driver for this call only
+	owned = pool is None
+	if owned:
+		pool = DriverPool()
 
 	# modifies the objects in-place
-	debug = [obj._scrape_data(driver) for obj in tqdm(objs, desc="Scraping Objects")]
-	
-	driver.quit()
+	try:
+		for obj in tqdm(objs, desc="Scraping Objects"):
+			if obj._scrape_cached():
+				continue
+			with pool.driver(pages = len(obj.url)) as driver:
+				obj._scrape_data(driver)
+	finally:
+		if owned:
+			pool.close()
 
 	if deep_copy:
 		return objs # returns objs as copy
 
+def ScrapeGrid(objs, pool = None):
+	'''
+		Load the price calendar (date grid) of round-trip objects into obj.grid, one page each.
+	'''
+	if type(objs) is _Scrape:
+		objs = [objs]
+
+	owned = pool is None
+	if owned:
+		pool = DriverPool()
+
+	try:
+		for obj in tqdm(objs, desc="Scraping Grids"):
+			with pool.driver() as driver:
+				obj._scrape_grid(driver)
+	finally:
+		if owned:
+			pool.close()
+
+	return objs
+
 class _Scrape:
 
+	# when set, every scraped page is saved here (see replay.record_pages)
+	record_dir = None
+	# when set, results are looked up here before navigating (see result_cache.use_result_cache)
+	result_cache = None
+	# in-flight page loads, shared by every thread asking for the same URL
+	_inflight = SingleFlight()
+	# retries of timed out pages, and the breaker shared by all workers
+	retry_policy = RetryPolicy()
+	circuit_breaker = CircuitBreaker()
+	# 'text' reads the rendered results, 'payload' the data in the page source (see payload.use_extractor)
+	extractor = 'text'
+
 	def __init__(self):
 		self._origin = None
 		self._dest = None
@@ -52,13 +95,19 @@ class _Scrape:
 		self._data = pd.DataFrame()
 		self._url = None
 		self._type = None
+		self._spec = None
+		self._grid = None
+		self._failures = []
 
 	# if date leave and date return, return 2 objects?
 	def __call__(self, *args):
-		# base call protocol
-		self._set_properties(*args)
-		obj = self.clone(*args)
-		obj.data = self._data
+		# base call protocol, builds a new object and leaves this (shared) one untouched
+		return _Scrape.from_spec(QuerySpec.parse(*args))
+
+	@staticmethod
+	def from_spec(spec):
+		obj = _Scrape()
+		obj._apply_spec(spec)
 		return obj
 
 
@@ -79,7 +128,7 @@ class _Scrape:
 					return Scrape(self.origin[0], self.dest[0], *self.date, *other.date)
 				else:
 					obj = Scrape(self.origin[0], self.dest[0], *self.date)
-					obj.data = pd.concat([self.data, other.data])
+					obj.data = Flight.concat([self.data, other.data])
 					return obj
 
 			# otherwise, must be chain
@@ -93,7 +142,7 @@ class _Scrape:
 					*self.unpack([[self.origin[i], self.dest[i], date] for i, date in enumerate(self.date)]),
 					*self.unpack([[other.origin[i], other.dest[i], date] for i, date in enumerate(other.date)])
 				)
-				obj.data = pd.concat([self.data, other.data])
+				obj.data = Flight.concat([self.data, other.data])
 				return obj
 
 
@@ -115,7 +164,7 @@ class _Scrape:
 						*self.unpack([[self.origin[i], date] for i, date in enumerate(self.date)]),
 						*self.unpack([[other.origin[i], date] for i, date in enumerate(other.date)] + [[other.dest[-1]]])
 					)
-					obj.data = pd.concat([self.data, other.data])
+					obj.data = Flight.concat([self.data, other.data])
 					return obj
 
 			# otherwise, return chain
@@ -129,7 +178,7 @@ class _Scrape:
 					*self.unpack([[self.origin[i], self.dest[i], date] for i, date in enumerate(self.date)]),
 					*self.unpack([[other.origin[i], other.dest[i], date] for i, date in enumerate(other.date)])
 				)
-				obj.data = pd.concat([self.data, other.data])
+				obj.data = Flight.concat([self.data, other.data])
 				return obj
 
 		elif obj_type == 'chain-trip':
@@ -148,7 +197,7 @@ class _Scrape:
 					*self.unpack([[self.origin[i], self.dest[i], date] for i, date in enumerate(self.date)]),
 					*self.unpack([[other.origin[i], other.dest[i], date] for i, date in enumerate(other.date)])
 				)
-				obj.data = pd.concat([self.data, other.data])
+				obj.data = Flight.concat([self.data, other.data])
 				return obj
 
 		elif obj_type == 'perfect-chain':
@@ -169,7 +218,7 @@ class _Scrape:
 						*self.unpack([[self.origin[i], date] for i, date in enumerate(self.date)]),
 						*self.unpack([[other.origin[i], date] for i, date in enumerate(other.date)] + [[other.dest[-1]]])
 					)
-					obj.data = pd.concat([self.data, other.data])
+					obj.data = Flight.concat([self.data, other.data])
 					return obj
 
 			# otherwise, just chain
@@ -183,7 +232,7 @@ class _Scrape:
 					*self.unpack([[self.origin[i], self.dest[i], date] for i, date in enumerate(self.date)]),
 					*self.unpack([[other.origin[i], other.dest[i], date] for i, date in enumerate(other.date)])
 				)
-				obj.data = pd.concat([self.data, other.data])
+				obj.data = Flight.concat([self.data, other.data])
 				return obj
 
 		else:
@@ -213,9 +262,7 @@ class _Scrape:
 		return rep
 
 	def clone(self, *args):
-		obj = _Scrape()
-		obj._set_properties(*args)
-		return obj
+		return _Scrape.from_spec(QuerySpec.parse(*args))
 
 	def unpack(self, args):
 		arr = []
@@ -228,103 +275,20 @@ class _Scrape:
 			return Scrape(*args)
 		
 		obj = Scrape(*args)
-		obj.data = pd.concat([self.data, other.data])
+		obj.data = Flight.concat([self.data, other.data])
 		return obj
 
 	'''
-		Set properties upon scraper called.
+		Set properties upon scraper called. See QuerySpec.parse for the args format.
 	'''
 	def  _set_properties(self, *args):
-		'''
-			args Format
-
-			one-way:
-				org, dest, date
-
-			round-trip:
-				org, dest, dateleave, datereturn
-
-			chain-trip:
-				org, dest, date, org, dest, date, org, dest, date ...
-
-			perfect-chain:
-				org, date, org, date, org, date, org, date, ..., dest
-				implied condition: dest of prev city = origin of next city
-		'''
-
-		# one way
-		if len(args) == 3:
-			assert len(args[0]) == 3 and type(args[0]) == str, "Issue with arg 0, see docs"
-			assert len(args[1]) == 3 and type(args[1]) == str, "Issue with arg 1, see docs"
-			assert len(args[2]) == 10 and type(args[2]) == str, "Issue with arg 2, see docs"
-
-			self._origin, self._dest, self._date = [args[0]], [args[1]], [args[2]]
-
-			#assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
-			self._url = self._make_url()
-			self._type = 'one-way'
-
-		# round-trip
-		elif len(args) == 4:
-			assert type(args[0]) == str, "Issue with arg 0, see docs"
-			assert type(args[1]) == str, "Issue with arg 1, see docs"
-			assert len(args[2]) == 10 and type(args[2]) == str, "Issue with arg 2, see docs"
-			assert len(args[3]) == 10 and type(args[3]) == str, "Issue with arg 3, see docs"
-
-			assert datetime.strptime(args[2], date_format) < datetime.strptime(args[3], date_format), "Dates are not in order. Make sure to provide them in increasing order in YYYY-MM-DD format."
-
-			self._origin, self._dest, self._date = [args[0], args[1]], [args[1], args[0]], args[2:]
-
-			assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
-			self._type = 'round-trip'
-			self._url = self._make_url(self._type)
+		self._apply_spec(QuerySpec.parse(*args))
 
-		# chain-trip, chain is component of 3s, check that last one is an actual date to not confuse w perfect
-		elif len(args) >= 3 and len(args) % 3 == 0 and len(args[-1]) == 10 and type(args[-1]) == str:
-			self._origin, self._dest, self._date = [], [], []
-
-			for i in range(0, len(args), 3):
-				assert len(args[i]) == 3 and type(args[i]) == str, "Issue with arg {}, see docs".format(i)
-				assert len(args[i + 1]) == 3 and type(args[i+1]) == str, "Issue with arg {}, see docs".format(i+1)
-				assert len(args[i + 2]) == 10 and type(args[i + 2]) == str, "Issue with arg {}, see docs".format(i+2)
-				
-				if i > 0:
-					assert datetime.strptime(self._date[-1], date_format) < datetime.strptime(args[i + 2], date_format), "Dates are not in order ({d1} > {d2}). Make sure to provide them in increasing order in YYYY-MM-DD format.".format(d1 = self._date[-1], d2 = args[i+2])
-
-				self._origin += [args[i]]
-				self._dest += [args[i + 1]]
-				self._date += [args[i + 2]]
-
-			assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
-			self._url = self._make_url()
-			self._type = 'chain-trip'
-
-
-		# perfect-chain
-		elif len(args) >= 4 and len(args) % 2 == 1 and len(args[-1]) == 3 and type(args[-1]) == str:
-			assert len(args[0]) == 3 and type(args[0]) == str, "Issue with arg 0, see docs"
-			assert len(args[1]) == 10 and type(args[1]) == str, "Issue with arg 1, see docs"
-
-			self._origin, self._dest, self._date = [args[0]], [], [args[1]]
-
-			for i in range(2, len(args)-1, 2):
-				assert len(args[i]) == 3 and type(args[i]) == str, "Issue with arg {}, see docs".format(i)
-				assert len(args[i + 1]) == 10 and type(args[i + 1]) == str, "Issue with arg {}, see docs".format(i+1)
-				assert datetime.strptime(self._date[-1], date_format) < datetime.strptime(args[i + 1], date_format), "Dates are not in order ({d1} > {d2}). Make sure to provide them in increasing order in YYYY-MM-DD format.".format(d1 = self._date[-1], d2 = args[i+1])
-
-				self._origin += [args[i]]
-				self._dest += [args[i]]
-				self._date += [args[i+1]]
-
-			assert len(args[-1]) == 3 and type(args[-1]) == str, "Issue with last arg, see docs"
-			self._dest += [args[-1]]
-
-			assert len(self._origin) == len(self._dest) == len(self._date), "Issue with array lengths, talk to dev"
-			self._url = self._make_url()
-			self._type = 'perfect-chain'
-
-		else:
-			raise NotImplementedError()
+	def _apply_spec(self, spec):
+		self._spec = spec
+		self._origin, self._dest, self._date = list(spec.origin), list(spec.dest), list(spec.date)
+		self._url = list(spec.url)
+		self._type = spec.type
 
 	@property
 	def origin(self):
@@ -369,115 +333,387 @@ class _Scrape:
 	def type(self):
 		return self._type
 
+	@property
+	def failures(self):
+		return self._failures
+
+	@property
+	def grid(self):
+		return self._grid
+
+	@property
+	def spec(self):
+		return self._spec
+
+	@property
+	def args(self):
+		# kept so the query can be rebuilt elsewhere, e.g. by a queue worker
+		return None if self._spec is None else self._spec.args
+
 
 	'''
 		Scrape the object. Add support for multiple queries, iterative.
 	'''
 	def _scrape_data(self, driver):
-		results = [self._get_results(url, self._date[i], driver) for i, url in enumerate(self._url)]
-		try:
-			self._data = pd.concat(results, ignore_index = True)
-		except:
+		results = []
+		for i, url in enumerate(self._url):
+			try:
+				results += [self._get_results(url, self._date[i], driver)]
+			except ScrapeError as e:
+				results += [e]
+		self._merge_results(results)
+
+	'''
+		Price calendar around a round trip: a matrix of prices by return (rows) and departure
+		date (columns), see grid.parse_grid.
+	'''
+	def _scrape_grid(self, driver):
+		assert self._type == 'round-trip', "The date grid is only available for round trips."
+
+		policy = _Scrape.retry_policy
+		for attempt in range(policy.retries + 1):
+			try:
+				lines = _Scrape._grid_request(self._url[0], driver, timeout = policy.timeout)
+				break
+			except TimeoutException as e:
+				if attempt == policy.retries:
+					raise ScrapeError(self._url[0], self._date[0], attempt + 1, e)
+				time.sleep(policy.delay(attempt))
+
+		self._grid = parse_grid(lines, self._date[0])
+		return self._grid
+
+	'''
+		Fill the object from the result cache alone, if every URL is cached.
+	'''
+	def _scrape_cached(self):
+		if _Scrape.result_cache is None:
+			return False
+
+		results = [_Scrape.result_cache.get(url) for url in self._url]
+		if any(result is None for result in results):
+			return False
+
+		self._merge_results(results)
+		return True
+
+	'''
+		Combine the per-URL results of the object into its data. Failed legs (ScrapeError)
+		are kept out of the data and reported in self.failures.
+	'''
+	def _merge_results(self, results):
+		self._failures = [r.report() for r in results if isinstance(r, ScrapeError)]
+		frames = [r for r in results if not isinstance(r, ScrapeError)]
+
+		if self._failures:
+			print("{n} of {m} legs failed for query, see .failures".format(n = len(self._failures), m = len(results)))
+		if frames:
+			self._data = Flight.concat(frames, ignore_index = True)
+		else:
 			print("No results found for query.")
 
 	def _make_url(self, type = 'one-way'):
-		urls = []
-		
-		match type:
-			case 'round-trip':
-				urls = [
-					'https://www.google.com/travel/flights?hl=en&q=Flights%20to%20{dest}%20from%20{org}%20on%20{depart_date}%20roundtrip%20return%20on%20{return_date}&curr=USD'.format(
-						dest = self._dest[0],
-						org = self._origin[0],
-						depart_date = self._date[0],
-						return_date = self._date[1]
-					)
-				]
-				print("Round Trip!")
-   
-			case _:
-				for i in range(len(self._date)):
-					urls += [
-						'https://www.google.com/travel/flights?hl=en&q=Flights%20to%20{org}%20from%20{dest}%20on%20{date}%20oneway&curr=USD'.format(
-							dest = self._dest[i],
-							org = self._origin[i],
-							date = self._date[i]
-						)
-					]
-				print("One Way!")
-   
-
-		return urls
+		return list(_urls(type, self._origin, self._dest, self._date))
 
 	@staticmethod
 	def _get_results(url, date, driver):
-		results = None
-		try:
-			results = _Scrape._make_url_request(url, driver)
-		except TimeoutException:
-			print(
-				'''TimeoutException, try again and check your internet connection!\n
-				Also possible that no flights exist for your query :('''.replace('\t','')
-			)
-			return -1
+		if _Scrape.result_cache is not None:
+			cached = _Scrape.result_cache.get(url)
+			if cached is not None:
+				return cached
 
-		flights = _Scrape._clean_results(results, date)
-		return Flight.dataframe(flights)
+		# concurrent requests for the same query share one navigation
+		return _Scrape._inflight.do(cache_key(url), lambda: _Scrape._fetch_results(url, date, driver))
 
 	@staticmethod
-	def _clean_results(result, date):
-		res2 = [x.encode("ascii", "ignore").decode().strip() for x in result]
-  
-		#return_dates, special handling for round trips
-		return_dates = None 
-		# Regular expression to match the returning date pattern
-		pattern = r"returning (\d{4}-\d{2}-\d{2})"
-
-		for item in res2:
-			match = re.search(pattern, item)
-			if match:
-				# Extract the date from the matched group and stop searching
-				return_dates = match.group(1)
+	def _fetch_results(url, date, driver):
+		policy = _Scrape.retry_policy
+		breaker = _Scrape.circuit_breaker
+
+		flights = None
+		for attempt in range(policy.retries + 1):
+			# every worker pauses here while failures point at throttling
+			breaker.wait()
+			try:
+				flights = _Scrape._request_flights(url, date, driver, timeout = policy.timeout)
+			except TimeoutException as e:
+				breaker.record(False)
+				if attempt == policy.retries:
+					print(
+						'''TimeoutException, try again and check your internet connection!\n
+						Also possible that no flights exist for your query :('''.replace('\t','')
+					)
+					raise ScrapeError(url, date, attempt + 1, e)
+				time.sleep(policy.delay(attempt))
+			else:
+				breaker.record(True)
 				break
 
-		start = res2.index("Sort by:")+1
-		mid_start = res2.index("Price insights")
-		mid_end = -1
-		try:
-		    mid_end = res2.index("Other departing flights")+1
-		except:
-		    mid_end = res2.index("Other flights")+1
-		end  = [i for i, x in enumerate(res2) if x.endswith('more flights')][0]
+		if not flights:
+			print("No flights found for {url}".format(url = url))
 
-		res3 = res2[start:mid_start] + res2[mid_end:end]
+		df = Flight.dataframe(flights)
+		if _Scrape.result_cache is not None:
+			_Scrape.result_cache.put(url, df)
+		return df
 
-		matches = [i for i, x in enumerate(res3) if len(x) > 2 and ((x[-2] != '+' and (x.endswith('PM') or x.endswith('AM')) and ':' in x) or x[-2] == '+')][::2]
-		flights = [Flight(date, res3[matches[i]:matches[i+1]]) for i in range(len(matches)-1)]
+	@staticmethod
+	def _clean_results(result, date):
+		return list(_Scrape._iter_flights(result, date))
+
+	'''
+		Single pass over the page lines. Sections are tracked with a small state machine:
 
-		#post processing for round trip return dates
-		for flight in flights:
+		HEAD   --"Sort by:"-->                              TOP (top flights)
+		TOP    --"Price insights"-->                        MID (skipped)
+		MID    --"Other departing flights"/"Other flights"-->  BOTTOM (other flights)
+		BOTTOM --"... more flights"-->                      DONE
+
+		Every other time line in TOP/BOTTOM starts a flight, which is yielded when the next
+		one starts. Round trip flights seen before the "returning YYYY-MM-DD" line are held
+		back until it shows up (or the page ends) so they carry the return date.
+	'''
+	@staticmethod
+	def _iter_flights(result, date):
+		state = _HEAD
+		return_date = None
+		segment = None
+		anchors = 0
+		pending = []
+
+		for line in result:
+			if not line.isascii():
+				line = line.encode("ascii", "ignore").decode()
+			line = line.strip()
+
+			if return_date is None and 'returning ' in line:
+				match = _RETURNING.search(line)
+				if match:
+					return_date = match.group(1)
+					for flight in pending:
+						if flight.round_trip:
+							flight.round_trip_return_date = return_date
+					yield from pending
+					pending = []
+
+			if state == _TOP:
+				if line == "Price insights":
+					state = _MID
+					continue
+			elif state == _BOTTOM:
+				if line.endswith('more flights'):
+					# the open segment has no closing time line, it is dropped
+					state = _DONE
+					segment = None
+					continue
+			elif state == _HEAD:
+				if line == "Sort by:":
+					state = _TOP
+				continue
+			elif state == _MID:
+				if line == "Other departing flights" or line == "Other flights":
+					state = _BOTTOM
+				continue
+			else:
+				if return_date is not None:
+					break
+				continue
+
+			# time line: "10:45 PM" or "4:25 PM+1"
+			if len(line) > 2 and (line[-2] == '+' or (line[-1] == 'M' and line[-2] in 'AP' and ':' in line)):
+				if anchors % 2 == 0:
+					if segment is not None:
+						flight = Flight(date, segment)
+						if pending or (flight.round_trip and return_date is None):
+							pending += [flight]
+						else:
+							if flight.round_trip:
+								flight.round_trip_return_date = return_date
+							yield flight
+					segment = [line]
+				else:
+					segment += [line]
+				anchors += 1
+			elif segment is not None:
+				segment += [line]
+
+		for flight in pending:
 			if flight.round_trip:
-				flight.round_trip_return_date = return_dates
-    
-		return flights
+				flight.round_trip_return_date = return_date
+		yield from pending
 
 	@staticmethod
-	def _make_url_request(url, driver):
-		driver.get(url)
+	def _dismiss_consent(driver):
 		try:
 			driver.find_element(By.XPATH, '//*[@id="yDmH0d"]/c-wiz/div/div/div/div[2]/div[1]/div[3]/div[1]/div[1]/form[2]/div/div/button').click()
 		except:
 			pass
-		# Waiting and initial XPATH cleaning
-		WebDriverWait(driver, timeout = 10).until(lambda d: len(_Scrape._get_flight_elements(d)) > 100)
-		results = _Scrape._get_flight_elements(driver)
 
-		#driver.quit()
+	@staticmethod
+	def _grid_request(url, driver, timeout = 10):
+		driver.get(url)
+		_Scrape._dismiss_consent(driver)
+		driver.find_element(By.XPATH, '//button[.//span[text()="Date grid"]]').click()
+
+		driver.set_script_timeout(timeout)
+		page = driver.execute_async_script(GRID_SCRIPT)
+		if _Scrape.record_dir is not None:
+			save_page(_Scrape.record_dir, url + GRID_SUFFIX, page['lines'], page['state'])
+		return page['lines']
+
+	'''
+		Frame of a results page from its source, None when the source has no flight data.
+		Used by the HTTP fetch backend (see fetch.py).
+	'''
+	@staticmethod
+	def _parse_source(url, date, html):
+		if _Scrape.record_dir is not None:
+			save_source(_Scrape.record_dir, url, html)
+
+		flights = payload_flights(html, date, return_date_of(url))
+		if flights is None:
+			return None
+
+		df = Flight.dataframe(flights)
+		if _Scrape.result_cache is not None:
+			_Scrape.result_cache.put(url, df)
+		return df
 
-		return results
+	'''
+		Flights of one results page. With the payload extractor the page source is decoded
+		first; pages without a results blob are read as text from the already loaded page.
+	'''
+	@staticmethod
+	def _request_flights(url, date, driver, timeout = 10):
+		if _Scrape.extractor == 'payload':
+			driver.get(url)
+			html = driver.page_source
+			if _Scrape.record_dir is not None:
+				save_source(_Scrape.record_dir, url, html)
+
+			flights = payload_flights(html, date, return_date_of(url))
+			if flights is not None:
+				return flights
+			return list(_Scrape._iter_flights(_Scrape._make_url_request(url, driver, timeout = timeout, navigate = False), date))
+
+		return list(_Scrape._iter_flights(_Scrape._make_url_request(url, driver, timeout = timeout), date))
 
 	@staticmethod
-	def _get_flight_elements(driver):
-		return driver.find_element(by = By.XPATH, value = '//body[@id = "yDmH0d"]').text.split('\n')
+	def _make_url_request(url, driver, timeout = 10, navigate = True):
+		if navigate:
+			driver.get(url)
+		_Scrape._dismiss_consent(driver)
+		# Wait in the page for the results list, then read it in the same round trip
+		driver.set_script_timeout(timeout)
+		page = driver.execute_async_script(_RESULTS_SCRIPT)
+		if _Scrape.record_dir is not None:
+			save_page(_Scrape.record_dir, url, page['lines'], page['state'])
+
+		if page['state'] == 'empty':
+			return []
+
+		return page['lines']
+
+# _Scrape._iter_flights parser states
+_HEAD, _TOP, _MID, _BOTTOM, _DONE = range(5)
+
+_RETURNING = re.compile(r"returning (\d{4}-\d{2}-\d{2})")
+
+'''
+	Resolves once the results list has rendered, or Google reports there are no flights,
+	with the text of the results container. A MutationObserver re-checks the page as it
+	renders, so nothing crosses the WebDriver protocol until the results are ready.
+
+	Checks look for DOM markers only (querySelector and the text of a few small nodes), so
+	they cost no layout: the "Other flights" header or the "... more flights" expander mean
+	the list is complete, a status node the empty state. Short lists have neither marker, so
+	a list that stops changing for QUIET ms counts too. The container is serialized once, on
+	resolving, and the "returning YYYY-MM-DD" line, which sits outside it, is read from its
+	own node.
+'''
+_RESULTS_SCRIPT = '''
+var done = arguments[arguments.length - 1];
+var HEADER = /^Other (departing |returning )?flights$/;
+var EXPANDER = /\\d+ more flights/;
+var EMPTY = /No results returned|no flights (found|available|match)/i;
+var RETURNING = /returning \\d{4}-\\d{2}-\\d{2}/;
+var QUIET = 1500;
+
+function any(root, selector, pattern) {
+	var nodes = root.querySelectorAll(selector);
+	for (var i = 0; i < nodes.length; i++) {
+		if (pattern.test(nodes[i].textContent.trim())) return true;
+	}
+	return false;
+}
+
+function probe(settled) {
+	var main = document.querySelector('[role="main"]');
+	if (main && (any(main, 'h2, h3', HEADER) || any(main, 'button, [role="button"]', EXPANDER))) {
+		return 'ready';
+	}
+	if (any(document, '[role="alert"], [role="status"], [aria-live]', EMPTY)) {
+		return 'empty';
+	}
+	if (settled && main && main.querySelector('[role="list"] li, ul li')) {
+		return 'ready';
+	}
+	if (settled && EMPTY.test((main || document.body).textContent)) {
+		return 'empty';
+	}
+	return null;
+}
+
+function lines() {
+	var main = document.querySelector('[role="main"]');
+	var text = main ? main.innerText : '';
+	if (text.indexOf('Sort by:') < 0) {
+		text = document.body.innerText;
+	}
+	if (!RETURNING.test(text)) {
+		var node = document.evaluate("//*[text()[contains(., 'returning ')]]", document.body, null,
+			XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+		var match = node && node.textContent.match(RETURNING);
+		if (match) text = match[0] + '\\n' + text;
+	}
+	return text.split('\\n');
+}
+
+var finished = false, pending = false, quiet = null, observer = null;
+
+function finish(state) {
+	if (finished) return;
+	finished = true;
+	clearTimeout(quiet);
+	if (observer) observer.disconnect();
+	done({state: state, lines: state === 'ready' ? lines() : []});
+}
+
+function settle() {
+	clearTimeout(quiet);
+	quiet = setTimeout(function () {
+		var state = probe(true);
+		if (state) finish(state);
+	}, QUIET);
+}
+
+var state = probe(false);
+if (state) {
+	finish(state);
+} else {
+	observer = new MutationObserver(function () {
+		settle();
+		if (pending) return;
+		pending = true;
+		setTimeout(function () {
+			pending = false;
+			var state = probe(false);
+			if (state) finish(state);
+		}, 100);
+	});
+	observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+	settle();
+}
+'''
 
 Scrape = _Scrape()
\ No newline at end of file
@@ -0,0 +1,55 @@
+import threading
+
+__all__ = ['SingleFlight']
+
+
+class _Call:
+
+	def __init__(self):
+		self.done = threading.Event()
+		self.result = None
+		self.error = None
+		self.shared = 0
+
+
+class SingleFlight:
+	'''
+		Collapses concurrent calls with the same key into one: the first caller runs the
+		function, callers arriving while it runs wait and receive the same result (or error).
+	'''
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._calls = {}
+
+	def __repr__(self):
+		return "SingleFlight({n} in flight)".format(n = len(self._calls))
+
+	def __str__(self):
+		return self.__repr__()
+
+	def do(self, key, func):
+		with self._lock:
+			call = self._calls.get(key)
+			leader = call is None
+			if leader:
+				call = self._calls[key] = _Call()
+			else:
+				call.shared += 1
+
+		if not leader:
+			call.done.wait()
+			if call.error is not None:
+				raise call.error
+			return call.result
+
+		try:
+			call.result = func()
+			return call.result
+		except BaseException as e:
+			call.error = e
+			raise
+		finally:
+			with self._lock:
+				del self._calls[key]
+			call.done.set()
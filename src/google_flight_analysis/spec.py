@@ -0,0 +1,212 @@
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache, reduce
+import itertools
+import numpy as np
+
+__all__ = ['QuerySpec', 'plan_queries', 'plan_round_trips', 'plan_chains']
+
+date_format = "%Y-%m-%d"
+
+_BASE = 'https://www.google.com/travel/flights?hl=en&q=Flights%20to%20'
+_ONE_WAY = '{org}%20from%20{dest}%20on%20{date}%20oneway&curr=USD'
+_ROUND_TRIP = '{dest}%20from%20{org}%20on%20{depart_date}%20roundtrip%20return%20on%20{return_date}&curr=USD'
+
+@lru_cache(maxsize = 4096)
+def _day(date):
+	return datetime.strptime(date, date_format)
+
+def _concat(*parts):
+	# element-wise string concatenation of arrays and scalars
+	return reduce(np.char.add, parts)
+
+def _urls(type, origin, dest, date):
+	if type == 'round-trip':
+		return (_BASE + _ROUND_TRIP.format(dest = dest[0], org = origin[0], depart_date = date[0], return_date = date[1]),)
+	return tuple(_BASE + _ONE_WAY.format(org = origin[i], dest = dest[i], date = date[i]) for i in range(len(date)))
+
+
+class QuerySpec(namedtuple('QuerySpec', ['type', 'origin', 'dest', 'date', 'url'])):
+	'''
+		Immutable, hashable description of one query: its trip type, the origin, destination
+		and date of every leg, and the URLs to scrape. Safe to share between threads and
+		processes; Scrape objects are built on top of it.
+	'''
+	__slots__ = ()
+
+	@staticmethod
+	def parse(*args):
+		'''
+			args Format
+
+			one-way:
+				org, dest, date
+
+			round-trip:
+				org, dest, dateleave, datereturn
+
+			chain-trip:
+				org, dest, date, org, dest, date, org, dest, date ...
+
+			perfect-chain:
+				org, date, org, date, org, date, org, date, ..., dest
+				implied condition: dest of prev city = origin of next city
+		'''
+
+		# one way
+		if len(args) == 3:
+			assert len(args[0]) == 3 and type(args[0]) == str, "Issue with arg 0, see docs"
+			assert len(args[1]) == 3 and type(args[1]) == str, "Issue with arg 1, see docs"
+			assert len(args[2]) == 10 and type(args[2]) == str, "Issue with arg 2, see docs"
+
+			return QuerySpec.make('one-way', (args[0],), (args[1],), (args[2],))
+
+		# round-trip
+		elif len(args) == 4:
+			assert type(args[0]) == str, "Issue with arg 0, see docs"
+			assert type(args[1]) == str, "Issue with arg 1, see docs"
+			assert len(args[2]) == 10 and type(args[2]) == str, "Issue with arg 2, see docs"
+			assert len(args[3]) == 10 and type(args[3]) == str, "Issue with arg 3, see docs"
+
+			assert _day(args[2]) < _day(args[3]), "Dates are not in order. Make sure to provide them in increasing order in YYYY-MM-DD format."
+
+			return QuerySpec.make('round-trip', (args[0], args[1]), (args[1], args[0]), tuple(args[2:]))
+
+		# chain-trip, chain is component of 3s, check that last one is an actual date to not confuse w perfect
+		elif len(args) >= 3 and len(args) % 3 == 0 and len(args[-1]) == 10 and type(args[-1]) == str:
+			origin, dest, date = [], [], []
+
+			for i in range(0, len(args), 3):
+				assert len(args[i]) == 3 and type(args[i]) == str, "Issue with arg {}, see docs".format(i)
+				assert len(args[i + 1]) == 3 and type(args[i+1]) == str, "Issue with arg {}, see docs".format(i+1)
+				assert len(args[i + 2]) == 10 and type(args[i + 2]) == str, "Issue with arg {}, see docs".format(i+2)
+
+				if i > 0:
+					assert _day(date[-1]) < _day(args[i + 2]), "Dates are not in order ({d1} > {d2}). Make sure to provide them in increasing order in YYYY-MM-DD format.".format(d1 = date[-1], d2 = args[i+2])
+
+				origin += [args[i]]
+				dest += [args[i + 1]]
+				date += [args[i + 2]]
+
+			return QuerySpec.make('chain-trip', tuple(origin), tuple(dest), tuple(date))
+
+		# perfect-chain
+		elif len(args) >= 4 and len(args) % 2 == 1 and len(args[-1]) == 3 and type(args[-1]) == str:
+			assert len(args[0]) == 3 and type(args[0]) == str, "Issue with arg 0, see docs"
+			assert len(args[1]) == 10 and type(args[1]) == str, "Issue with arg 1, see docs"
+
+			origin, dest, date = [args[0]], [], [args[1]]
+
+			for i in range(2, len(args)-1, 2):
+				assert len(args[i]) == 3 and type(args[i]) == str, "Issue with arg {}, see docs".format(i)
+				assert len(args[i + 1]) == 10 and type(args[i + 1]) == str, "Issue with arg {}, see docs".format(i+1)
+				assert _day(date[-1]) < _day(args[i + 1]), "Dates are not in order ({d1} > {d2}). Make sure to provide them in increasing order in YYYY-MM-DD format.".format(d1 = date[-1], d2 = args[i+1])
+
+				origin += [args[i]]
+				dest += [args[i]]
+				date += [args[i+1]]
+
+			assert len(args[-1]) == 3 and type(args[-1]) == str, "Issue with last arg, see docs"
+			dest += [args[-1]]
+
+			return QuerySpec.make('perfect-chain', tuple(origin), tuple(dest), tuple(date))
+
+		else:
+			raise NotImplementedError()
+
+	@staticmethod
+	def make(type, origin, dest, date):
+		assert len(origin) == len(dest) == len(date), "Issue with array lengths, talk to dev"
+		return QuerySpec(type, origin, dest, date, _urls(type, origin, dest, date))
+
+	@property
+	def args(self):
+		'''
+			Arguments that build this query with Scrape(...).
+		'''
+		if self.type == 'one-way':
+			return (self.origin[0], self.dest[0], self.date[0])
+		if self.type == 'round-trip':
+			return (self.origin[0], self.dest[0], *self.date)
+		if self.type == 'perfect-chain':
+			return tuple(x for leg in zip(self.origin, self.date) for x in leg) + (self.dest[-1],)
+		return tuple(x for leg in zip(self.origin, self.dest, self.date) for x in leg)
+
+
+def plan_queries(origins, dests, dates, return_dates = None):
+	'''
+		Specs for every origin x destination x date, built column-wise with NumPy.
+
+		One-way queries when return_dates is None, otherwise round trips for every departure
+		and return date with departure < return. Dates may be 'YYYY-MM-DD' strings, dates or
+		datetimes. Repeated airports and dates are planned once. Ordered by date(s), then
+		origin, then destination.
+	'''
+	origins = np.array(list(dict.fromkeys(origins)), dtype = str)
+	dests = np.array(list(dict.fromkeys(dests)), dtype = str)
+	departs = np.unique(np.asarray(list(dates), dtype = 'datetime64[D]'))
+
+	if return_dates is None:
+		assert (np.char.str_len(origins) == 3).all() and (np.char.str_len(dests) == 3).all(), "Airport codes must have 3 letters, see docs"
+
+		t, o, d = (idx.ravel() for idx in np.indices((len(departs), len(origins), len(dests))))
+		depart_str = np.datetime_as_string(departs)[t]
+		urls = _concat(_BASE, origins[o], '%20from%20', dests[d], '%20on%20', depart_str, '%20oneway&curr=USD')
+
+		return [
+			QuerySpec('one-way', (org,), (dest,), (date,), (url,))
+			for org, dest, date, url in zip(origins[o].tolist(), dests[d].tolist(), depart_str.tolist(), urls.tolist())
+		]
+
+	returns = np.unique(np.asarray(list(return_dates), dtype = 'datetime64[D]'))
+	dep, ret = (idx.ravel() for idx in np.indices((len(departs), len(returns))))
+	keep = departs[dep] < returns[ret]
+	return _round_trips(origins, dests, departs[dep[keep]], returns[ret[keep]])
+
+def plan_round_trips(origins, dests, pairs):
+	'''
+		Round-trip specs for every origin x destination x (departure, return) pair, e.g. the
+		combinations of DateParser.generate_date_combinations. Ordered like plan_queries.
+	'''
+	origins = np.array(list(dict.fromkeys(origins)), dtype = str)
+	dests = np.array(list(dict.fromkeys(dests)), dtype = str)
+	pairs = np.asarray(list(pairs), dtype = 'datetime64[D]').reshape(-1, 2)
+	assert (pairs[:, 0] < pairs[:, 1]).all(), "Dates are not in order. Make sure to provide them in increasing order in YYYY-MM-DD format."
+	return _round_trips(origins, dests, pairs[:, 0], pairs[:, 1])
+
+def _round_trips(origins, dests, departs, returns):
+	p, o, d = (idx.ravel() for idx in np.indices((len(departs), len(origins), len(dests))))
+	depart_str = np.datetime_as_string(departs)[p]
+	return_str = np.datetime_as_string(returns)[p]
+	urls = _concat(
+		_BASE, dests[d], '%20from%20', origins[o], '%20on%20', depart_str,
+		'%20roundtrip%20return%20on%20', return_str, '&curr=USD'
+	)
+
+	return [
+		QuerySpec('round-trip', (org, dest), (dest, org), (depart, ret), (url,))
+		for org, dest, depart, ret, url in zip(origins[o].tolist(), dests[d].tolist(), depart_str.tolist(), return_str.tolist(), urls.tolist())
+	]
+
+def plan_chains(type, stops, combinations):
+	'''
+		Chain specs for every choice of airports and every date combination (one date per leg,
+		e.g. from DateParser.generate_date_combinations). Ordered by dates, then airports.
+
+		chain-trip: stops is one (origin codes, destination codes) pair per leg
+		perfect-chain: stops is the codes of every stop, origin first and destination last;
+		each leg flies from one stop to the next
+	'''
+	if type == 'perfect-chain':
+		routes = [(route[:-1], route[1:]) for route in itertools.product(*[dict.fromkeys(codes) for codes in stops])]
+	else:
+		assert type == 'chain-trip', "Unknown chain type {t}.".format(t = type)
+		origins = itertools.product(*[dict.fromkeys(leg[0]) for leg in stops])
+		dests = list(itertools.product(*[dict.fromkeys(leg[1]) for leg in stops]))
+		routes = [(origin, dest) for origin in origins for dest in dests]
+
+	specs = []
+	for dates in combinations:
+		dates = tuple(np.datetime_as_string(np.asarray(dates, dtype = 'datetime64[D]')).tolist())
+		specs += [QuerySpec.make(type, origin, dest, dates) for origin, dest in routes]
+	return specs
@@ -0,0 +1,169 @@
+from collections import deque
+from contextlib import contextmanager
+import threading
+import time
+
+__all__ = ['TokenBucket', 'AIMDController', 'Throttle']
+
+
+class TokenBucket:
+	'''
+		Caps the page rate: `pages_per_minute` tokens are refilled continuously, at most
+		`burst` can be saved up. acquire() blocks until a token is available.
+	'''
+
+	def __init__(self, pages_per_minute, burst = 1):
+		assert pages_per_minute > 0, "pages_per_minute must be positive."
+		self.rate = pages_per_minute / 60.0
+		self.burst = burst
+
+		self._tokens = float(burst)
+		self._stamp = time.monotonic()
+		self._lock = threading.Lock()
+
+	def __repr__(self):
+		return "TokenBucket({ppm:g} pages/min, burst:{b})".format(ppm = self.rate * 60, b = self.burst)
+
+	def __str__(self):
+		return self.__repr__()
+
+	def acquire(self):
+		while True:
+			with self._lock:
+				now = time.monotonic()
+				self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+				self._stamp = now
+				if self._tokens >= 1:
+					self._tokens -= 1
+					return
+				wait = (1 - self._tokens) / self.rate
+			time.sleep(wait)
+
+
+class AIMDController:
+	'''
+		Number of workers allowed to load pages at once, tuned from page outcomes:
+
+		- additive increase: +1 after `limit` pages in a row finished within target_latency
+		- multiplicative decrease: limit * decrease after a failure or a slow page, at most
+		  once per `cooldown` seconds so one burst of timeouts does not collapse it to the minimum
+	'''
+
+	def __init__(self, min_workers = 1, max_workers = 8, start = None, target_latency = 8.0, decrease = 0.5, cooldown = 10.0):
+		assert 1 <= min_workers <= max_workers, "Need 1 <= min_workers <= max_workers."
+		self.min_workers = min_workers
+		self.max_workers = max_workers
+		self.target_latency = target_latency
+		self.decrease = decrease
+		self.cooldown = cooldown
+
+		self._limit = max_workers if start is None else max(min_workers, min(max_workers, start))
+		self._active = 0
+		self._good = 0
+		self._last_decrease = float('-inf')
+		self._done = deque()
+		self._cond = threading.Condition()
+
+	def __repr__(self):
+		return "AIMDController(limit:{l}, active:{a}, {ppm:.1f} pages/min)".format(
+			l = self._limit, a = self._active, ppm = self.pages_per_minute
+		)
+
+	def __str__(self):
+		return self.__repr__()
+
+	@property
+	def limit(self):
+		return self._limit
+
+	@property
+	def pages_per_minute(self):
+		'''
+			Pages completed during the last minute.
+		'''
+		with self._cond:
+			self._trim(time.monotonic())
+			return float(len(self._done))
+
+	def acquire(self):
+		with self._cond:
+			while self._active >= self._limit:
+				self._cond.wait()
+			self._active += 1
+
+	def release(self):
+		with self._cond:
+			self._active -= 1
+			self._cond.notify_all()
+
+	def record(self, latency, ok):
+		with self._cond:
+			now = time.monotonic()
+			if ok:
+				self._done.append(now)
+				self._trim(now)
+
+			if ok and latency <= self.target_latency:
+				self._good += 1
+				if self._good >= self._limit and self._limit < self.max_workers:
+					self._limit += 1
+					self._good = 0
+					self._cond.notify_all()
+				return
+
+			self._good = 0
+			if now - self._last_decrease >= self.cooldown:
+				self._limit = max(self.min_workers, int(self._limit * self.decrease))
+				self._last_decrease = now
+
+	def _trim(self, now):
+		while self._done and now - self._done[0] > 60:
+			self._done.popleft()
+
+
+class Throttle:
+	'''
+		Token bucket and AIMD controller applied together around each page load.
+
+		pages_per_minute: hard cap on the page rate (None for no cap)
+		max_workers: upper bound for the controller, normally the browser pool size
+	'''
+
+	def __init__(self, pages_per_minute = None, max_workers = 8, min_workers = 1, target_latency = 8.0, burst = 1):
+		self.bucket = None if pages_per_minute is None else TokenBucket(pages_per_minute, burst = burst)
+		self.controller = AIMDController(
+			min_workers = min_workers, max_workers = max_workers, target_latency = target_latency
+		)
+
+	def __repr__(self):
+		return "Throttle({b}, {c})".format(b = self.bucket, c = self.controller)
+
+	def __str__(self):
+		return self.__repr__()
+
+	@contextmanager
+	def slot(self):
+		'''
+			Hold a worker slot for one unit of work. An exception counts as a failure, callers
+			that swallow their errors can set `.ok = False` on the yielded slot instead.
+		'''
+		self.controller.acquire()
+		slot = _Slot()
+		start = time.monotonic()
+		try:
+			if self.bucket is not None:
+				self.bucket.acquire()
+			start = time.monotonic()
+			yield slot
+		except BaseException:
+			slot.ok = False
+			raise
+		finally:
+			self.controller.record(time.monotonic() - start, slot.ok)
+			self.controller.release()
+
+
+class _Slot:
+
+	def __init__(self):
+		self.ok = True
@@ -0,0 +1,294 @@
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+
+try:
+	import fcntl
+except ImportError: # Windows, rely on SQLite's own locking
+	fcntl = None
+
+from google_flight_analysis.scrape import Scrape, ScrapeObjects
+from google_flight_analysis.driver import DriverPool
+
+__all__ = ['Task', 'WorkQueue', 'SQLiteWorkQueue', 'run_worker']
+
+'''
+	Work queue for spreading one plan of Scrape objects over several hosts.
+
+	Producers put queries (their Scrape arguments) on the queue. Workers lease one task at a
+	time for lease_ttl seconds, renew the lease with heartbeats while the page loads, and
+	return the result frame to the shared store. A lease that is not renewed in time (worker
+	crashed or lost its network) expires and the task goes back to pending for any worker.
+'''
+
+Task = namedtuple('Task', ['id', 'args', 'worker', 'attempts'])
+
+
+class WorkQueue(ABC):
+	'''
+		Interface of a work queue backend.
+	'''
+
+	@abstractmethod
+	def put(self, objs):
+		'''
+			Add the queries of objs (Scrape objects), skipping those already queued.
+		'''
+
+	@abstractmethod
+	def lease(self, worker):
+		'''
+			Lease the next pending task to worker, or return None when nothing is pending.
+		'''
+
+	@abstractmethod
+	def heartbeat(self, task):
+		'''
+			Renew the lease of task. Returns False if the lease was lost.
+		'''
+
+	@abstractmethod
+	def complete(self, task, df):
+		pass
+
+	@abstractmethod
+	def fail(self, task, error):
+		pass
+
+	@abstractmethod
+	def counts(self):
+		'''
+			Number of tasks per status (pending, leased, done, failed).
+		'''
+
+	@abstractmethod
+	def result(self, args):
+		'''
+			Result frame of the query built from args, or None if it is not done.
+		'''
+
+	def load(self, objs):
+		'''
+			Fill objs with their results from the store. Returns the objects still without one.
+		'''
+		missing = []
+		for obj in objs:
+			df = self.result(obj.args)
+			if df is None:
+				missing += [obj]
+			else:
+				obj.data = df
+		return missing
+
+	def finished(self):
+		counts = self.counts()
+		return counts.get('pending', 0) == 0 and counts.get('leased', 0) == 0
+
+
+_SCHEMA = '''
+	CREATE TABLE IF NOT EXISTS tasks (
+		id INTEGER PRIMARY KEY AUTOINCREMENT,
+		key TEXT NOT NULL UNIQUE,
+		args TEXT NOT NULL,
+		status TEXT NOT NULL DEFAULT 'pending',
+		worker TEXT,
+		lease_until REAL,
+		attempts INTEGER NOT NULL DEFAULT 0,
+		result TEXT,
+		error TEXT
+	)
+'''
+
+
+class SQLiteWorkQueue(WorkQueue):
+	'''
+		Queue in a SQLite file on shared storage, results pickled next to it.
+
+		Network filesystems do not always honour SQLite's locks, so every write also holds an
+		exclusive lock on a sidecar file (fcntl, where available).
+
+		lease_ttl: seconds a lease lasts without a heartbeat
+		max_attempts: leases per task before it is marked failed
+	'''
+
+	def __init__(self, path, result_dir = None, lease_ttl = 120, max_attempts = 3):
+		self.path = path
+		self.result_dir = result_dir if result_dir is not None else os.path.splitext(path)[0] + '_results'
+		self.lease_ttl = lease_ttl
+		self.max_attempts = max_attempts
+		os.makedirs(self.result_dir, exist_ok = True)
+
+		self._thread_lock = threading.Lock()
+		with self._transaction() as conn:
+			conn.execute(_SCHEMA)
+
+	def __repr__(self):
+		return "SQLiteWorkQueue({path}, {counts})".format(path = self.path, counts = self.counts())
+
+	def __str__(self):
+		return self.__repr__()
+
+	@contextmanager
+	def _transaction(self):
+		with self._thread_lock, open(self.path + '.lock', 'a') as lock_file:
+			if fcntl is not None:
+				fcntl.flock(lock_file, fcntl.LOCK_EX)
+			conn = sqlite3.connect(self.path, timeout = 30, isolation_level = None)
+			try:
+				conn.execute('BEGIN IMMEDIATE')
+				yield conn
+				conn.execute('COMMIT')
+			except BaseException:
+				conn.execute('ROLLBACK')
+				raise
+			finally:
+				conn.close()
+				if fcntl is not None:
+					fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+	@staticmethod
+	def _key(args):
+		return json.dumps(list(args))
+
+	def put(self, objs):
+		if not isinstance(objs, list):
+			objs = [objs]
+		rows = [(SQLiteWorkQueue._key(obj.args), json.dumps(list(obj.args))) for obj in objs]
+		with self._transaction() as conn:
+			conn.executemany('INSERT OR IGNORE INTO tasks (key, args) VALUES (?, ?)', rows)
+
+	def lease(self, worker):
+		now = time.time()
+		with self._transaction() as conn:
+			self._requeue(conn, now)
+			row = conn.execute(
+				"SELECT id, args, attempts FROM tasks WHERE status = 'pending' ORDER BY id LIMIT 1"
+			).fetchone()
+			if row is None:
+				return None
+
+			conn.execute(
+				"UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+				(worker, now + self.lease_ttl, row[0])
+			)
+		return Task(row[0], tuple(json.loads(row[1])), worker, row[2] + 1)
+
+	def heartbeat(self, task):
+		now = time.time()
+		with self._transaction() as conn:
+			cursor = conn.execute(
+				"UPDATE tasks SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased' AND lease_until >= ?",
+				(now + self.lease_ttl, task.id, task.worker, now)
+			)
+		return cursor.rowcount == 1
+
+	def complete(self, task, df):
+		# results are idempotent, a worker that lost its lease may still store them
+		fname = os.path.join(self.result_dir, hashlib.sha1(SQLiteWorkQueue._key(task.args).encode()).hexdigest() + '.pkl')
+		tmp = "{f}.{host}.{pid}.tmp".format(f = fname, host = socket.gethostname(), pid = os.getpid())
+		with open(tmp, 'wb') as file:
+			pickle.dump(df, file, protocol = pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp, fname)
+
+		with self._transaction() as conn:
+			conn.execute(
+				"UPDATE tasks SET status = 'done', result = ?, lease_until = NULL, error = NULL WHERE id = ?",
+				(fname, task.id)
+			)
+
+	def fail(self, task, error):
+		with self._transaction() as conn:
+			conn.execute(
+				"UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+				"lease_until = NULL, error = ? WHERE id = ? AND worker = ?",
+				(self.max_attempts, str(error), task.id, task.worker)
+			)
+
+	def counts(self):
+		with self._transaction() as conn:
+			self._requeue(conn, time.time())
+			return dict(conn.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall())
+
+	def result(self, args):
+		with self._transaction() as conn:
+			row = conn.execute(
+				"SELECT result FROM tasks WHERE key = ? AND status = 'done'", (SQLiteWorkQueue._key(args),)
+			).fetchone()
+		if row is None:
+			return None
+		with open(row[0], 'rb') as file:
+			return pickle.load(file)
+
+	def _requeue(self, conn, now):
+		# expired leases go back to pending, unless the task used up its attempts
+		conn.execute(
+			"UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+			"error = CASE WHEN attempts >= ? THEN 'lease expired' ELSE error END, lease_until = NULL "
+			"WHERE status = 'leased' AND lease_until < ?",
+			(self.max_attempts, self.max_attempts, now)
+		)
+
+
+def run_worker(queue, pool = None, worker = None, heartbeat = None, wait = True, poll = 5.0):
+	'''
+		Lease and scrape tasks until the queue is finished. Run one per node (or per browser).
+
+		worker: name of this worker in the queue, defaults to host:pid:thread
+		heartbeat: seconds between lease renewals, defaults to a third of the lease
+		wait: keep polling while other workers hold leases, in case they expire
+	'''
+	if worker is None:
+		worker = "{host}:{pid}:{tid}".format(host = socket.gethostname(), pid = os.getpid(), tid = threading.get_ident())
+	if heartbeat is None:
+		heartbeat = getattr(queue, 'lease_ttl', 60) / 3
+
+	owned = pool is None
+	if owned:
+		pool = DriverPool()
+
+	done = 0
+	try:
+		while True:
+			task = queue.lease(worker)
+			if task is None:
+				if not wait or queue.finished():
+					break
+				time.sleep(poll)
+				continue
+
+			stop = threading.Event()
+			beats = threading.Thread(target = _beat, args = (queue, task, heartbeat, stop), daemon = True)
+			beats.start()
+			try:
+				obj = Scrape(*task.args)
+				ScrapeObjects(obj, pool = pool)
+			except Exception as e:
+				queue.fail(task, repr(e))
+				continue
+			finally:
+				stop.set()
+				beats.join()
+
+			if obj.failures:
+				queue.fail(task, json.dumps(obj.failures))
+			else:
+				queue.complete(task, obj.data)
+				done += 1
+	finally:
+		if owned:
+			pool.close()
+
+	return done
+
+def _beat(queue, task, interval, stop):
+	while not stop.wait(interval):
+		if not queue.heartbeat(task):
+			return
@@ -0,0 +1,319 @@
+from abc import ABC, abstractmethod
+import importlib.util
+import os
+import sqlite3
+import pandas as pd
+
+__all__ = [
+	'ResultWriter', 'CsvWriter', 'SqliteWriter', 'ParquetWriter', 'ArrowWriter', 'ExcelExport',
+	'open_writer', 'read_results'
+]
+
+'''
+	Incremental output writers.
+
+	Results are written batch by batch as queries finish (e.g. from engine.iter_objects), so
+	only the batch at hand is held in memory:
+
+		CsvWriter      appends rows, header once
+		SqliteWriter   appends to a table, one transaction per batch
+		ParquetWriter  buffers up to row_group_size rows and writes them as one row group (pyarrow)
+		ArrowWriter    appends record batches to an Arrow IPC file (pyarrow)
+		ExcelExport    stages batches in a CSV and streams it into .xlsx on close (openpyxl write-only)
+
+	Categorical columns are written as their values, so batches with different categories
+	share one schema.
+'''
+
+# text in CSV and SQLite, parsed back by read_results
+_DATES = ['Departure datetime', 'Arrival datetime', 'Access Date', 'Round Trip Return Date']
+
+def _pyarrow(writer):
+	try:
+		import pyarrow as pa
+	except ImportError:
+		raise ImportError("{w} needs pyarrow, install it or write CSV/SQLite instead.".format(w = writer))
+	return pa
+
+def _plain(df):
+	categorical = [name for name in df.columns if isinstance(df[name].dtype, pd.CategoricalDtype)]
+	if not categorical:
+		return df
+	return df.astype({name: object for name in categorical})
+
+
+class ResultWriter(ABC):
+	'''
+		Base of the writers: write(df) takes one batch of rows, close() flushes what is left.
+		Use as a context manager or close explicitly.
+	'''
+
+	def __init__(self, path):
+		self.path = path
+		self.rows = 0
+		self.batches = 0
+		self.closed = False
+
+	def __repr__(self):
+		return "{cls}({path}, {n} rows in {b} batches)".format(cls = type(self).__name__, path = self.path, n = self.rows, b = self.batches)
+
+	def __str__(self):
+		return self.__repr__()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def write(self, df):
+		assert not self.closed, "Writer is closed."
+		if df is None or df.empty:
+			return
+		self._write(_plain(df))
+		self.rows += len(df)
+		self.batches += 1
+
+	def close(self):
+		if not self.closed:
+			self._close()
+			self.closed = True
+
+	def read(self):
+		'''
+			Everything written so far, as one frame.
+		'''
+		return read_results(self.path)
+
+	@abstractmethod
+	def _write(self, df):
+		pass
+
+	def _close(self):
+		pass
+
+
+class CsvWriter(ResultWriter):
+	'''
+		append: add to an existing file instead of replacing it
+	'''
+
+	def __init__(self, path, append = False):
+		super().__init__(path)
+		self._file = open(path, 'a' if append else 'w', newline = '')
+		self._header = self._file.tell() == 0
+
+	def _write(self, df):
+		df.to_csv(self._file, header = self._header, index = False)
+		self._file.flush()
+		self._header = False
+
+	def _close(self):
+		self._file.close()
+
+
+class SqliteWriter(ResultWriter):
+	'''
+		table: table the rows go to
+		append: add to an existing table instead of replacing it
+	'''
+
+	def __init__(self, path, table = 'flights', append = False):
+		super().__init__(path)
+		self.table = table
+		self._conn = sqlite3.connect(path)
+		if not append:
+			self._conn.execute('DROP TABLE IF EXISTS "{t}"'.format(t = table))
+			self._conn.commit()
+
+	def _write(self, df):
+		with self._conn:
+			df.to_sql(self.table, self._conn, if_exists = 'append', index = False)
+
+	def _close(self):
+		self._conn.close()
+
+
+class _ArrowWriter(ResultWriter):
+	# schema of the first batch, columns that are all missing in it are taken as strings
+
+	def __init__(self, path, name):
+		super().__init__(path)
+		self._pa = _pyarrow(name)
+		self._schema = None
+
+	def _table(self, df):
+		pa = self._pa
+		if self._schema is None:
+			schema = pa.Schema.from_pandas(df, preserve_index = False)
+			for i, field in enumerate(schema):
+				if pa.types.is_null(field.type):
+					schema = schema.set(i, field.with_type(pa.string()))
+			self._schema = schema.remove_metadata()
+		return pa.Table.from_pandas(df, schema = self._schema, preserve_index = False)
+
+
+class ParquetWriter(_ArrowWriter):
+	'''
+		row_group_size: rows buffered before they are written as one row group
+		compression: Parquet codec
+	'''
+
+	def __init__(self, path, row_group_size = 100000, compression = 'snappy'):
+		super().__init__(path, 'ParquetWriter')
+		self.row_group_size = row_group_size
+		self.compression = compression
+		self._buffer = []
+		self._buffered = 0
+		self._writer = None
+
+	def _write(self, df):
+		self._buffer += [df]
+		self._buffered += len(df)
+		if self._buffered >= self.row_group_size:
+			self._flush()
+
+	def _flush(self):
+		if not self._buffer:
+			return
+		import pyarrow.parquet as pq
+
+		table = self._table(pd.concat(self._buffer, ignore_index = True))
+		if self._writer is None:
+			self._writer = pq.ParquetWriter(self.path, self._schema, compression = self.compression)
+		self._writer.write_table(table, row_group_size = self.row_group_size)
+		self._buffer, self._buffered = [], 0
+
+	def _close(self):
+		self._flush()
+		if self._writer is not None:
+			self._writer.close()
+
+
+class ArrowWriter(_ArrowWriter):
+	'''
+		Arrow IPC file (readable as Feather v2), one record batch per written batch.
+	'''
+
+	def __init__(self, path):
+		super().__init__(path, 'ArrowWriter')
+		self._sink = None
+		self._writer = None
+
+	def _write(self, df):
+		table = self._table(df)
+		if self._writer is None:
+			self._sink = self._pa.OSFile(self.path, 'wb')
+			self._writer = self._pa.ipc.new_file(self._sink, self._schema)
+		self._writer.write_table(table)
+
+	def _close(self):
+		if self._writer is not None:
+			self._writer.close()
+			self._sink.close()
+
+
+class ExcelExport(ResultWriter):
+	'''
+		Excel output as a post-step: batches go to `staging` (<name>.staging.csv next to path by
+		default), which is copied into path chunk by chunk when the writer is closed, through a
+		write-only openpyxl workbook so only one chunk is in memory. Needs openpyxl.
+
+		chunk_size: staged rows read per chunk
+		keep_staging: leave the staging file in place after the conversion
+	'''
+
+	def __init__(self, path, staging = None, keep_staging = False, chunk_size = 50000):
+		if importlib.util.find_spec('openpyxl') is None:
+			# fail before scraping rather than after it
+			raise ImportError("ExcelExport needs openpyxl, install it or write CSV/SQLite/Parquet instead.")
+		super().__init__(path)
+		self.staging = CsvWriter(os.path.splitext(path)[0] + '.staging.csv') if staging is None else staging
+		self.keep_staging = keep_staging
+		self.chunk_size = chunk_size
+
+	def _write(self, df):
+		self.staging.write(df)
+
+	def _close(self):
+		self.staging.close()
+		if self.staging.rows > 0:
+			self._convert()
+		if not self.keep_staging and os.path.isfile(self.staging.path):
+			os.remove(self.staging.path)
+
+	def _chunks(self):
+		if isinstance(self.staging, CsvWriter):
+			for chunk in pd.read_csv(self.staging.path, chunksize = self.chunk_size):
+				yield _parse_dates(chunk)
+		else:
+			yield self.staging.read()
+
+	def _convert(self):
+		from openpyxl import Workbook
+
+		book = Workbook(write_only = True)
+		sheet = book.create_sheet()
+		header = True
+		for chunk in self._chunks():
+			if header:
+				sheet.append(list(chunk.columns))
+				header = False
+			chunk = chunk.astype(object).where(chunk.notna(), None)
+			for row in chunk.itertuples(index = False, name = None):
+				sheet.append(row)
+		book.save(self.path)
+
+	def read(self):
+		return pd.read_excel(self.path)
+
+
+_WRITERS = {
+	'.csv': CsvWriter,
+	'.db': SqliteWriter, '.sqlite': SqliteWriter, '.sqlite3': SqliteWriter,
+	'.parquet': ParquetWriter, '.pq': ParquetWriter,
+	'.arrow': ArrowWriter, '.feather': ArrowWriter, '.ipc': ArrowWriter,
+	'.xlsx': ExcelExport
+}
+
+def open_writer(target, **kwargs):
+	'''
+		Writer for target: a ResultWriter is returned as is, a file name gets the writer of
+		its extension (.csv, .db/.sqlite, .parquet, .arrow/.feather, .xlsx), kwargs go to it.
+	'''
+	if isinstance(target, ResultWriter):
+		return target
+
+	ext = os.path.splitext(target)[1].lower()
+	if ext not in _WRITERS:
+		raise ValueError("No writer for {f}, use one of {e}.".format(f = target, e = ', '.join(sorted(_WRITERS))))
+	return _WRITERS[ext](target, **kwargs)
+
+def read_results(path, table = 'flights'):
+	'''
+		Load a file written by one of the writers back into a frame.
+	'''
+	ext = os.path.splitext(path)[1].lower()
+	if ext == '.csv':
+		return _parse_dates(pd.read_csv(path))
+	if _WRITERS.get(ext) is SqliteWriter:
+		conn = sqlite3.connect(path)
+		try:
+			return _parse_dates(pd.read_sql('SELECT * FROM "{t}"'.format(t = table), conn))
+		finally:
+			conn.close()
+	if _WRITERS.get(ext) is ParquetWriter:
+		return pd.read_parquet(path)
+	if _WRITERS.get(ext) is ArrowWriter:
+		pa = _pyarrow('read_results')
+		with pa.OSFile(path, 'rb') as source:
+			return pa.ipc.open_file(source).read_pandas()
+	if _WRITERS.get(ext) is ExcelExport:
+		return pd.read_excel(path)
+	raise ValueError("Unknown result file {f}.".format(f = path))
+
+def _parse_dates(df):
+	for name in _DATES:
+		if name in df.columns:
+			df[name] = pd.to_datetime(df[name])
+	return df
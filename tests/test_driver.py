@@ -0,0 +1,156 @@
+import pytest
+import threading
+from selenium.common.exceptions import WebDriverException, TimeoutException
+
+from google_flight_analysis.driver import *
+
+class FakeDriver:
+	def __init__(self):
+		self.alive = True
+		self.quit_called = False
+
+	@property
+	def current_url(self):
+		if not self.alive:
+			raise RuntimeError("browser died")
+		return "about:blank"
+
+	def quit(self):
+		self.quit_called = True
+
+def make_pool(**kwargs):
+	made = []
+	def factory():
+		made.append(FakeDriver())
+		return made[-1]
+	return DriverPool(factory = factory, **kwargs), made
+
+def test_reuse():
+	pool, made = make_pool(size = 1)
+	for _ in range(5):
+		with pool.driver():
+			pass
+	assert len(made) == 1, "Driver was not reused."
+
+def test_recycle_after_max_pages():
+	pool, made = make_pool(size = 1, max_pages = 2)
+	for _ in range(4):
+		with pool.driver():
+			pass
+	assert len(made) == 2 and made[0].quit_called, "Driver was not recycled."
+
+def test_health_check():
+	pool, made = make_pool(size = 1)
+	with pool.driver() as driver:
+		pass
+	made[0].alive = False
+	with pool.driver() as driver:
+		assert driver is made[1], "Dead driver handed out."
+	assert made[0].quit_called
+
+def test_size_bound():
+	pool, made = make_pool(size = 2)
+	seen = set()
+	lock = threading.Lock()
+
+	def work():
+		for _ in range(10):
+			with pool.driver() as driver:
+				with lock:
+					seen.add(id(driver))
+
+	threads = [threading.Thread(target = work) for _ in range(6)]
+	[t.start() for t in threads]
+	[t.join() for t in threads]
+	assert len(made) <= 2 and len(seen) <= 2, "Pool exceeded its size."
+
+def test_close():
+	pool, made = make_pool(size = 2)
+	with pool.driver():
+		pass
+	pool.close()
+	assert all(d.quit_called for d in made)
+	with pytest.raises(AssertionError):
+		pool.acquire()
+
+def test_error_returns_slot():
+	pool, made = make_pool(size = 1)
+	with pytest.raises(ValueError):
+		with pool.driver():
+			raise ValueError("parse error")
+
+	# a routine failure keeps the healthy browser for the next caller
+	assert not made[0].quit_called and pool._created == 1
+	with pool.driver() as driver:
+		assert driver is made[0]
+	pool.close()
+	assert pool._created == 0
+
+@pytest.mark.parametrize('error', [WebDriverException("session deleted"), TimeoutException(), RuntimeError("browser died")])
+def test_broken_session_discarded(error):
+	pool, made = make_pool(size = 1)
+	with pytest.raises(type(error)):
+		with pool.driver() as driver:
+			driver.alive = not isinstance(error, RuntimeError)
+			raise error
+
+	# timeouts keep the browser, a dead or failed session is quit and its slot freed
+	kept = isinstance(error, TimeoutException)
+	assert made[0].quit_called != kept and pool._created == int(kept)
+	with pool.driver() as driver:
+		assert driver is made[0 if kept else 1]
+
+def test_lean_options():
+	options = lean_options()
+	assert '--headless=new' in options.arguments
+	assert options.page_load_strategy == 'eager'
+	assert options.experimental_options['prefs']['profile.managed_default_content_settings.images'] == 2
+
+def test_blocked_urls():
+	assert '*.woff2*' in BLOCKED_URLS and '*google-analytics.com*' in BLOCKED_URLS
+	# scripts from gstatic must load for results to render
+	assert not any('gstatic.com/' in url or url.endswith('.js*') for url in BLOCKED_URLS)
+
+class SlowScheduler:
+	'''
+		Budget check that blocks until allowed to finish, to catch scans under the pool lock.
+	'''
+	def __init__(self):
+		self.scanning = threading.Event()
+		self.proceed = threading.Event()
+
+	def admits(self, live):
+		self.scanning.set()
+		return self.proceed.wait(5)
+
+	def register(self, driver):
+		pass
+
+	def unregister(self, driver):
+		pass
+
+	def oversized(self, driver):
+		return False
+
+def test_budget_scan_outside_lock():
+	scheduler = SlowScheduler()
+	pool, made = make_pool(size = 2, scheduler = scheduler)
+	scheduler.proceed.set()
+	first = pool.acquire()
+
+	scheduler.proceed.clear()
+	scheduler.scanning.clear()
+	got = []
+	waiter = threading.Thread(target = lambda: got.append(pool.acquire()))
+	waiter.start()
+	scheduler.scanning.wait(5)
+
+	releaser = threading.Thread(target = pool.release, args = (first,))
+	releaser.start()
+	releaser.join(1)
+	assert not releaser.is_alive(), "release() waited for the budget scan."
+
+	# the released driver is found on the re-check, no second browser is started
+	scheduler.proceed.set()
+	waiter.join(5)
+	assert got == [first] and len(made) == 1 and pool._created == 1
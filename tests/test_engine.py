@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+import pandas as pd
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.engine import *
+
+class Driver:
+	def quit(self):
+		pass
+
+	@property
+	def current_url(self):
+		return "about:blank"
+
+def fake_results(monkeypatch, delay = 0.02):
+	state = {'active': 0, 'peak': 0}
+	lock = threading.Lock()
+
+	def get_results(url, date, driver):
+		with lock:
+			state['active'] += 1
+			state['peak'] = max(state['peak'], state['active'])
+		time.sleep(delay)
+		with lock:
+			state['active'] -= 1
+		return pd.DataFrame({'url': [url], 'date': [date]})
+
+	monkeypatch.setattr(_Scrape, '_get_results', staticmethod(get_results))
+	return state
+
+def test_order_and_fill(monkeypatch):
+	fake_results(monkeypatch)
+	objs = [
+		Scrape("JFK", "IST", "2023-12-05"),
+		Scrape("JFK", "AMS", "2023-11-10", "CDG", "AMS", "2023-11-17", "AMS", "IST", "2023-11-25"),
+		Scrape("CDG", "JFK", "2023-12-15")
+	]
+	out = scrape_objects(objs, concurrency = 3, pool = DriverPool(size = 3, factory = Driver))
+
+	assert out == objs
+	for obj in objs:
+		assert list(obj.data['url']) == obj.url, "Results out of order."
+		assert list(obj.data['date']) == obj.date
+
+def test_concurrency_bound(monkeypatch):
+	state = fake_results(monkeypatch)
+	objs = [Scrape("JFK", "IST", "2023-12-{:02d}".format(d)) for d in range(1, 21)]
+	scrape_objects(objs, concurrency = 4, pool = DriverPool(size = 4, factory = Driver))
+
+	assert 1 < state['peak'] <= 4, "Peak concurrency {} outside (1, 4].".format(state['peak'])
+
+def test_on_done(monkeypatch):
+	fake_results(monkeypatch)
+	done = []
+	objs = [
+		Scrape("JFK", "AMS", "2023-11-10", "CDG", "AMS", "2023-11-17"),
+		Scrape("CDG", "JFK", "2023-12-15")
+	]
+	scrape_objects(objs, concurrency = 2, pool = DriverPool(size = 2, factory = Driver), on_done = lambda obj: done.append((obj, obj.data.shape[0])))
+
+	assert sorted(n for _, n in done) == [1, 2] and set(id(obj) for obj, _ in done) == set(map(id, objs))
+
+def test_stream_in_completion_order(monkeypatch):
+	fake_results(monkeypatch)
+	slow = Scrape("JFK", "IST", "2023-12-05")
+	fast = Scrape("CDG", "JFK", "2023-12-15")
+
+	def get_results(url, date, driver):
+		time.sleep(0.2 if url == slow.url[0] else 0.01)
+		return pd.DataFrame({'url': [url], 'date': [date]})
+	monkeypatch.setattr(_Scrape, '_get_results', staticmethod(get_results))
+
+	seen = []
+	stream = iter_objects([slow, fast], concurrency = 2, pool = DriverPool(size = 2, factory = Driver), on_result = lambda obj, df: seen.append(obj))
+	out = [(obj, df['url'][0]) for obj, df in stream]
+
+	assert [obj for obj, _ in out] == [fast, slow] and seen == [fast, slow]
+	assert [url for _, url in out] == [fast.url[0], slow.url[0]]
+	assert not slow.data.empty and not fast.data.empty
+
+def test_stream_without_keeping(monkeypatch):
+	fake_results(monkeypatch)
+	objs = [Scrape("JFK", "AMS", "2023-11-10", "CDG", "AMS", "2023-11-17"), Scrape("CDG", "JFK", "2023-12-15")]
+	out = list(iter_objects(objs, concurrency = 2, pool = DriverPool(size = 2, factory = Driver), keep = False))
+
+	assert len(out) == 3 and sorted(df['url'][0] for _, df in out) == sorted(objs[0].url + objs[1].url)
+	assert all(obj.data.empty and obj.failures == [] for obj in objs)
+
+def test_stream_early_exit(monkeypatch):
+	state = fake_results(monkeypatch)
+	objs = [Scrape("JFK", "IST", "2023-12-{:02d}".format(d)) for d in range(1, 21)]
+	for obj, df in iter_objects(objs, concurrency = 2, pool = DriverPool(size = 2, factory = Driver)):
+		break
+
+	# pages in flight finish, the rest are never loaded
+	time.sleep(0.05)
+	assert state['active'] == 0 and sum(not obj.data.empty for obj in objs) < len(objs)
+
+def test_async_stream(monkeypatch):
+	fake_results(monkeypatch)
+	objs = [Scrape("JFK", "IST", "2023-12-05"), Scrape("CDG", "JFK", "2023-12-15")]
+
+	async def collect():
+		return [obj async for obj, _ in stream_objects(objs, concurrency = 2, pool = DriverPool(size = 2, factory = Driver))]
+
+	assert sorted(map(id, asyncio.run(collect()))) == sorted(map(id, objs))
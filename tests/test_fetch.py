@@ -0,0 +1,109 @@
+import pytest
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+httpx = pytest.importorskip('httpx')
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.replay import ReplayDriver, source_path
+from google_flight_analysis.policy import RetryPolicy
+from google_flight_analysis.fetch import *
+
+PAGES = 'tests/test_data/pages'
+ORIGIN = 'https://www.google.com'
+
+class StandIn(BaseHTTPRequestHandler):
+	'''
+		Serves the page sources in server.pages under the path of their Google URL, pages
+		without a recorded source get a page without data.
+	'''
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self):
+		self.server.requests += [(self.path, self.client_address[1])]
+		url = ORIGIN + self.path
+		fname = source_path(self.server.pages, url)
+		if self.server.fail:
+			body, status = b'busy', 503
+		elif os.path.isfile(fname):
+			with open(fname, 'rb') as file:
+				body, status = file.read(), 200
+		else:
+			body, status = b'<html><body>Loading...</body></html>', 200
+
+		self.send_response(status)
+		self.send_header('Content-Type', 'text/html; charset=utf-8')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+@pytest.fixture
+def server():
+	server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+	server.requests = []
+	server.pages = PAGES
+	server.fail = False
+	thread = threading.Thread(target = server.serve_forever, daemon = True)
+	thread.start()
+	yield server
+	server.shutdown()
+	server.server_close()
+
+def fetcher(server, **kwargs):
+	return HttpFetcher(host = 'http://127.0.0.1:{port}'.format(port = server.server_address[1]), **kwargs)
+
+class NoBrowser:
+	def driver(self, *args, **kwargs):
+		raise AssertionError("the browser was not needed")
+
+def test_fetch_objects(server):
+	objs = [Scrape("JFK", "IST", "2023-12-05"), Scrape("LGA", "RDU", "2023-05-15", "2023-06-15")]
+	fetch_objects(objs, fetcher = fetcher(server), pool = NoBrowser())
+
+	assert list(objs[0].data['Price ($)']) == [612, 655, 548, 1139, 501]
+	assert objs[1].data['Round Trip'].all() and objs[1].data.shape[0] == 5
+	assert len(server.requests) == 2
+
+def test_keep_alive(server):
+	objs = [Scrape("JFK", "IST", "2023-12-05"), Scrape("LGA", "RDU", "2023-05-15", "2023-06-15"), Scrape("JFK", "IST", "2023-12-06")]
+	fetch_objects(objs, fetcher = fetcher(server, max_connections = 1), pool = NoBrowser(), fallback = False)
+
+	# three requests over one connection
+	assert len(server.requests) == 3 and len({port for _, port in server.requests}) == 1
+
+def test_falls_back_to_browser(server, tmp_path):
+	# the stand-in has no source for JFK-IST, only its recorded text is left
+	rdu = Scrape("LGA", "RDU", "2023-05-15", "2023-06-15")
+	with open(source_path(PAGES, rdu.url[0])) as src, open(source_path(str(tmp_path), rdu.url[0]), 'w') as dst:
+		dst.write(src.read())
+	server.pages = str(tmp_path)
+
+	res = Scrape("JFK", "IST", "2023-12-05")
+	fetch_objects([res, rdu], fetcher = fetcher(server), pool = DriverPool(factory = lambda: ReplayDriver(PAGES)))
+	assert list(res.data['Price ($)']) == [612, 655, 548, 1139]
+	assert rdu.data.shape[0] == 5
+
+	res = Scrape("JFK", "IST", "2023-12-05")
+	fetch_objects(res, fetcher = fetcher(server), pool = NoBrowser(), fallback = False)
+	assert res.data.empty and res.failures[0]['error'] == 'ValueError'
+
+@pytest.fixture
+def quick_retries():
+	policy = _Scrape.retry_policy
+	_Scrape.retry_policy = RetryPolicy(retries = 1, backoff = 0.01)
+	yield _Scrape.retry_policy
+	_Scrape.retry_policy = policy
+
+def test_http_errors_are_retried(server, quick_retries):
+	server.fail = True
+	res = Scrape("JFK", "IST", "2023-12-05")
+	fetch_objects(res, fetcher = fetcher(server), pool = DriverPool(factory = lambda: ReplayDriver(PAGES)))
+
+	# 503s until the retries run out, then the recorded page through the browser
+	assert len(server.requests) == quick_retries.retries + 1
+	assert list(res.data['Price ($)']) == [612, 655, 548, 1139]
@@ -0,0 +1,61 @@
+import pytest
+from datetime import datetime
+
+from google_flight_analysis.flight import *
+
+SEGMENT = [
+	'10:45 PM', '', '4:25 PM+1', 'Turkish Airlines', '9 hr 40 min', 'JFKIST', '1 stop',
+	'2 hr 15 min WAW', '1,021 kg CO2', '-12% emissions', '$1,139'
+]
+
+def test_fields():
+	flight = Flight('2023-12-05', SEGMENT)
+	assert flight.time_leave == datetime(2023, 12, 5, 22, 45)
+	assert flight.time_arrive == datetime(2023, 12, 6, 16, 25)
+	assert (flight.origin, flight.dest) == ('JFK', 'IST')
+	assert flight.airline == 'Turkish Airlines' and flight.flight_time == '9 hr 40 min'
+	assert flight.num_stops == 1 and flight.stops == '2 hr 15 min WAW'
+	assert flight.co2 == 1021 and flight.emissions == -12 and flight.price == 1139
+	assert flight.dow == 2
+
+def test_noon_midnight():
+	flight = Flight('2023-12-05', ['12:05 AM', '12:30 PM'])
+	assert flight.time_leave == datetime(2023, 12, 5, 0, 5)
+	assert flight.time_arrive == datetime(2023, 12, 5, 12, 30)
+
+def test_narrow_space_and_day_offsets():
+	flight = Flight('2023-12-31', ['11:50\u202fPM', '1:10\u202fAM-1'])
+	assert flight.time_leave == datetime(2023, 12, 31, 23, 50)
+	assert flight.time_arrive == datetime(2023, 12, 30, 1, 10)
+
+def test_round_trip():
+	flight = Flight('2023-05-15', ['8:37 AM', '10:25 AM', 'JetBlue', '$158', 'round trip'])
+	assert flight.round_trip and flight.round_trip_return_date == datetime(2023, 5, 16, 8, 37)
+
+def test_slots():
+	flight = Flight('2023-12-05', SEGMENT)
+	with pytest.raises(AttributeError):
+		flight.extra = 1
+
+def test_dataframe_dtypes():
+	df = Flight.dataframe([Flight('2023-12-05', SEGMENT), Flight('2023-12-05', ['9:00 AM', '11:00 AM', 'Delta'])])
+	assert str(df['Departure datetime'].dtype) == 'datetime64[ns]'
+	assert df['Origin'].dtype == 'category' and df['Airline(s)'].dtype == 'category'
+	assert str(df['Price ($)'].dtype) == 'Int32' and df['Price ($)'].isna().tolist() == [False, True]
+	assert str(df['CO2 Emission (kg)'].dtype) == 'Int32' and str(df['Emission Diff (%)'].dtype) == 'Int16'
+	assert df['Access Date'].nunique() == 1
+
+def test_dataframe_compact_ints():
+	df = Flight.dataframe(Flight('2023-12-05', SEGMENT) for _ in range(3))
+	# nullable even when nothing is missing, so every page has the same dtypes
+	assert str(df['Price ($)'].dtype) == 'Int32' and str(df['Num Stops'].dtype) == 'Int8'
+	assert df.shape[0] == 3
+
+def test_concat_keeps_categoricals():
+	first = Flight.dataframe([Flight('2023-12-05', SEGMENT)])
+	second = Flight.dataframe([Flight('2023-12-05', ['9:00 AM', '11:00 AM', 'Delta'])])
+	df = Flight.concat([first, second], ignore_index = True)
+
+	assert df['Airline(s)'].dtype == 'category' and df['Origin'].dtype == 'category'
+	assert df['Airline(s)'].astype(str).tolist() == [first['Airline(s)'][0], 'Delta']
+	assert str(df['Price ($)'].dtype) == 'Int32' and str(df['Num Stops'].dtype) == 'Int8'
@@ -0,0 +1,87 @@
+import pytest
+import pandas as pd
+
+from google_flight_analysis.fuzzy.fuzzy_all import FuzzyDateLocationScrape
+from google_flight_analysis.fuzzy.fuzzy_date import FuzzyDateScrape
+from google_flight_analysis.fuzzy.utils.location import LocationCls
+
+def test_location_dedup():
+	search = FuzzyDateLocationScrape(LocationCls(['SHA', 'PVG', 'SHA']), LocationCls('AMS'), '2024-09-27+1')
+	urls = [tuple(obj.url) for obj in search.generated_scrape_objs]
+	assert len(urls) == len(set(urls)) == 4
+
+def test_combinations_match_product():
+	import itertools
+	from google_flight_analysis.fuzzy.utils.date_process import DateParser
+
+	date_strings = ['2023-06-15+2', '2023-06-18-3', '2023-06-18+3']
+	lists = [DateParser._parse_date(d) for d in date_strings]
+	expected = [c for c in itertools.product(*lists) if all(a < b for a, b in zip(c, c[1:]))]
+	assert list(DateParser.generate_date_combinations(date_strings)) == expected
+
+def test_combination_constraints():
+	from google_flight_analysis.fuzzy.utils.date_process import DateParser
+
+	combinations = list(DateParser.generate_date_combinations(
+		['2024-09-01+30', '2024-09-01+60'], min_stay = 7, max_stay = 10, weekdays = [[4], [6]]
+	))
+	assert combinations and all(
+		7 <= (ret - dep).days <= 10 and dep.weekday() == 4 and ret.weekday() == 6 for dep, ret in combinations
+	)
+	assert len(list(DateParser.generate_date_combinations(['2024-09-01+30', '2024-09-01+60'], limit = 5))) == 5
+
+def test_round_trip_constraints():
+	search = FuzzyDateScrape('AMS', 'PVG', '2024-09-27+5-2', '2024-10-01+10-2', min_stay = 4, max_stay = 6)
+	assert search.generated_scrape_objs
+	for obj in search.generated_scrape_objs:
+		stay = (pd.Timestamp(obj.date[1]) - pd.Timestamp(obj.date[0])).days
+		assert obj.type == 'round-trip' and 4 <= stay <= 6
+
+def test_min_stay_at_least_one_day():
+	from google_flight_analysis.fuzzy.utils.date_process import DateParser
+
+	with pytest.raises(AssertionError):
+		DateParser.generate_date_combinations(['2024-09-01+3', '2024-09-01+3'], min_stay = 0)
+	with pytest.raises(AssertionError):
+		FuzzyDateScrape('AMS', 'PVG', '2024-09-01+3', '2024-09-01+3', min_stay = 0)
+
+def test_chain_trip():
+	search = FuzzyDateScrape('AMS', 'PVG', '2024-09-27+1', 'PVG', 'HND', '2024-09-28+1', max_stay = 1)
+	specs = [obj.spec for obj in search.generated_scrape_objs]
+	assert [spec.date for spec in specs] == [('2024-09-27', '2024-09-28'), ('2024-09-28', '2024-09-29')]
+	assert all(spec.type == 'chain-trip' and spec.origin == ('AMS', 'PVG') and spec.dest == ('PVG', 'HND') for spec in specs)
+	assert all(len(obj.url) == 2 for obj in search.generated_scrape_objs)
+
+def test_perfect_chain():
+	search = FuzzyDateScrape('AMS', '2024-09-27', 'PVG', '2024-10-01+1', 'HND')
+	assert [obj.spec.date for obj in search.generated_scrape_objs] == [('2024-09-27', '2024-10-01'), ('2024-09-27', '2024-10-02')]
+	assert all(obj.spec.origin == ('AMS', 'PVG') and obj.spec.dest == ('PVG', 'HND') for obj in search.generated_scrape_objs)
+
+def test_location_chain():
+	search = FuzzyDateLocationScrape(LocationCls('AMS'), '2024-09-27', LocationCls(['SHA', 'PVG']), '2024-10-01', 'HND')
+	assert {obj.spec.origin for obj in search.generated_scrape_objs} == {('AMS', 'SHA'), ('AMS', 'PVG')}
+	assert {obj.spec.dest for obj in search.generated_scrape_objs} == {('SHA', 'HND'), ('PVG', 'HND')}
+
+	search = FuzzyDateLocationScrape('AMS', LocationCls(['SHA', 'PVG']), '2024-09-27', 'PVG', 'HND', '2024-10-01+1')
+	assert len(search.generated_scrape_objs) == 4
+	assert all(obj.spec.type == 'chain-trip' for obj in search.generated_scrape_objs)
+
+def v_price(best_day):
+	# synthetic prices: cheapest on best_day, rising 10 per day away from it
+	def scrape(obj):
+		days = abs((pd.Timestamp(obj.date[0]) - pd.Timestamp(best_day)).days)
+		obj.data = pd.DataFrame({'Price ($)': [300 + 10 * days, 400 + 10 * days]})
+	return scrape
+
+def test_best_first_finds_minimum_with_fewer_pages():
+	search = FuzzyDateScrape('AMS', 'PVG', '2024-09-30+30-30')
+	progress = list(search.search_best(tolerance = 0.05, radius = 3, scrape = v_price('2024-10-07')))
+
+	assert progress[-1].best_price == 300 and progress[-1].best.date == ['2024-10-07']
+	assert len(progress) < len(search.generated_scrape_objs) / 2
+	assert all(a.best_price >= b.best_price for a, b in zip(progress, progress[1:])), "Best so far got worse."
+
+def test_best_first_target():
+	search = FuzzyDateScrape('AMS', 'PVG', '2024-09-30+30-30')
+	progress = list(search.search_best(target = 1000, scrape = v_price('2024-10-07')))
+	assert len(progress) == 1
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.replay import ReplayDriver, load_page
+from google_flight_analysis.grid import *
+from google_flight_analysis.fuzzy.fuzzy_date import FuzzyDateScrape
+from google_flight_analysis.fuzzy.grid_shortlist import grid_centers, shortlist
+from google_flight_analysis.policy import ScrapeError
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+
+PAGES = 'tests/test_data/pages'
+
+def replay_pool():
+	return DriverPool(factory = lambda: ReplayDriver(PAGES))
+
+def recorded():
+	obj = Scrape("LGA", "RDU", "2023-05-15", "2023-06-15")
+	return load_page(PAGES, obj.url[0] + GRID_SUFFIX)['lines']
+
+def test_parse_grid():
+	grid = parse_grid(recorded(), '2023-05-15')
+
+	assert grid.shape == (7, 7)
+	assert list(grid.columns) == list(pd.date_range('2023-05-12', '2023-05-18'))
+	assert list(grid.index) == list(pd.date_range('2023-06-12', '2023-06-18'))
+	assert grid.loc['2023-06-15', '2023-05-15'] == 185 and grid.loc['2023-06-12', '2023-05-12'] == 228
+	assert np.isnan(grid.loc['2023-06-12', '2023-05-18']) and grid.isna().sum().sum() == 2
+
+def test_parse_grid_year_boundary():
+	lines = ['Date grid', 'Sun, Dec 31', 'Mon, Jan 1', 'Fri, Jan 5', '$300', '$310']
+	grid = parse_grid(lines, '2023-12-31')
+	assert list(grid.columns) == [pd.Timestamp('2023-12-31'), pd.Timestamp('2024-01-01')]
+	assert grid.index[0] == pd.Timestamp('2024-01-05')
+
+def test_scrape_grid_replay():
+	obj = Scrape("LGA", "RDU", "2023-05-15", "2023-06-15")
+	ScrapeGrid(obj, pool = replay_pool())
+	assert obj.grid.equals(parse_grid(recorded(), '2023-05-15'))
+
+def test_shortlist():
+	search = FuzzyDateScrape('LGA', 'RDU', '2023-05-15+3-3', '2023-06-15+3-3')
+	assert len(search.generated_scrape_objs) == 49
+	assert [obj.date for obj in grid_centers(search.generated_scrape_objs)] == [['2023-05-15', '2023-06-15']]
+
+	grid = parse_grid(recorded(), '2023-05-15')
+	kept = search.shortlist(k = 3, pool = replay_pool())
+	prices = [grid.loc[obj.date[1], obj.date[0]] for obj in kept]
+
+	assert len(search.generated_scrape_objs) == 3
+	assert prices == sorted(grid.stack().dropna())[:3]
+
+class NoGridDriver(ReplayDriver):
+	# pages other than the recorded query load without a "Date grid" button
+	def get(self, url):
+		if url == Scrape("LGA", "RDU", "2023-05-15", "2023-06-15").url[0]:
+			return super().get(url)
+		self._url, self._page, self._source = url, {'lines': []}, None
+
+	def find_element(self, by = None, value = None):
+		if value is not None and 'Date grid' in value and not self._page['lines']:
+			raise NoSuchElementException(value)
+		return super().find_element(by, value)
+
+def test_shortlist_failed_grid_last():
+	search = FuzzyDateScrape('LGA', 'RDU', '2023-05-12+10', '2023-06-12')
+	assert len(grid_centers(search.generated_scrape_objs)) == 2
+
+	started = []
+	pool = DriverPool(factory = lambda: started.append(1) or NoGridDriver(PAGES))
+	kept = shortlist(search.generated_scrape_objs, k = 11, pool = pool)
+	assert [obj.date[0] for obj in kept[:7]] == sorted(
+		['2023-05-{d}'.format(d = d) for d in range(12, 19)],
+		key = lambda dep: parse_grid(recorded(), '2023-05-15').loc['2023-06-12', dep]
+	)
+	assert {obj.date[0] for obj in kept[7:]} == {'2023-05-19', '2023-05-20', '2023-05-21', '2023-05-22'}
+	# the browser without a button is kept for the next grid
+	assert len(started) == 1
+
+def test_shortlist_grid_error():
+	search = FuzzyDateScrape('LGA', 'RDU', '2023-05-12+10', '2023-06-12')
+	def scrape_grid(grids):
+		if grids[0].date[0] != '2023-05-15':
+			raise ScrapeError(grids[0].url[0], grids[0].date[0], 1, TimeoutException())
+		ScrapeGrid(grids, pool = replay_pool())
+	kept = shortlist(search.generated_scrape_objs, k = 11, scrape_grid = scrape_grid)
+	assert {obj.date[0] for obj in kept[7:]} == {'2023-05-19', '2023-05-20', '2023-05-21', '2023-05-22'}
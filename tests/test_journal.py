@@ -0,0 +1,52 @@
+import pytest
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.replay import ReplayDriver
+from google_flight_analysis.journal import *
+
+PAGES = 'tests/test_data/pages'
+
+class CountingReplay(ReplayDriver):
+	loads = 0
+
+	def get(self, url):
+		CountingReplay.loads += 1
+		super().get(url)
+
+def job():
+	# the last query has no recording, so the first run crashes on it
+	return [Scrape("JFK", "IST", "2023-12-05"), Scrape("LGA", "RDU", "2023-05-15", "2023-06-15"), Scrape("JFK", "IST", "2023-12-06")]
+
+def test_resume_after_crash(tmp_path):
+	path = str(tmp_path / 'job.sqlite')
+	pool = lambda: DriverPool(factory = lambda: CountingReplay(PAGES))
+
+	with JobJournal(path) as journal:
+		with pytest.raises(FileNotFoundError):
+			journal.run(job(), pool = pool())
+		assert journal.status() == {'done': 2, 'running': 1}
+
+	CountingReplay.loads = 0
+	objs = job()
+	with JobJournal(path) as journal:
+		with pytest.raises(FileNotFoundError):
+			journal.run(objs, pool = pool())
+		items = {item['key']: item for item in journal.items(JobJournal.job_id(objs))}
+
+	assert CountingReplay.loads == 1, "Finished queries were scraped again."
+	assert objs[0].data.shape[0] == 4 and objs[1].data['Round Trip'].all()
+	assert items[JobJournal.item_key(objs[2])]['attempts'] == 2
+
+def test_same_spec_same_job():
+	assert JobJournal.job_id(job()) == JobJournal.job_id(job()[::-1])
+	assert JobJournal.job_id(job()) != JobJournal.job_id(job()[:2])
+
+def test_shared_pool_after_crash(tmp_path):
+	pool = DriverPool(size = 1, factory = lambda: ReplayDriver(PAGES))
+	with JobJournal(str(tmp_path / 'job.sqlite')) as journal:
+		with pytest.raises(FileNotFoundError):
+			journal.run([Scrape("JFK", "IST", "2023-12-06")], pool = pool)
+		# the crashed run gave its browser slot back
+		objs = journal.run([Scrape("JFK", "IST", "2023-12-05")], pool = pool)
+	assert objs[0].data.shape[0] == 4
@@ -0,0 +1,54 @@
+import sqlite3
+import pandas as pd
+
+from google_flight_analysis.normalize import *
+from google_flight_analysis.normalize import duration_minutes, stop_airports, carrier_code, operating_code
+from google_flight_analysis.scrape import *
+from google_flight_analysis.cache import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.replay import ReplayDriver
+
+PAGES = 'tests/test_data/pages'
+NORMALIZED = ['Travel Time (min)', 'Layover (min)', 'Stop Airports', 'Marketing Carrier', 'Operating Carrier']
+
+def test_duration():
+	assert duration_minutes('6 hr 10 min') == 370
+	assert duration_minutes('45 min') == 45 and duration_minutes('13 hr') == 780
+	assert duration_minutes('1 hr 15 min WAW') == 75
+	assert duration_minutes('AMS, BUD') is None
+
+def test_stop_airports():
+	assert stop_airports('1 hr 15 min WAW') == 'WAW'
+	assert stop_airports('AMS, BUD') == 'AMS,BUD'
+
+def test_carriers():
+	assert carrier_code('American') == 'AA' and carrier_code('LOTDelta') == 'LO'
+	assert carrier_code('JetBlue, American') == 'B6'
+	assert carrier_code('Some New Air') == 'Some New Air'
+	assert operating_code('AmericanOperated by Republic Airways as American Eagle') == 'YX'
+
+def test_normalize_cached_frame():
+	df = pd.read_csv('tests/test_data/test2.csv').rename(columns = {'Layover Time': 'Layover'})
+	out = normalize(df)
+	assert str(out['Travel Time (min)'].dtype) == 'Int16'
+	assert out['Travel Time (min)'].notna().all()
+	assert out['Marketing Carrier'].dtype == 'category'
+	assert normalize(out) is out, "normalize should be idempotent."
+
+def test_cache_adds_columns_to_old_table(tmp_path):
+	res = Scrape("JFK", "IST", "2023-12-05")
+	ScrapeObjects(res, pool = DriverPool(factory = lambda: ReplayDriver(PAGES)))
+	db = str(tmp_path / 'flights.db')
+
+	# a table written before the normalized columns existed
+	old = res.data.drop(columns = NORMALIZED)
+	conn = sqlite3.connect(db)
+	old.astype({name: str for name in old.columns if old[name].dtype == 'category'}).to_sql('flights', conn, index = False)
+	conn.close()
+
+	CacheControl(db, res, True)
+	conn = sqlite3.connect(db)
+	df = pd.read_sql('SELECT * FROM flights', conn)
+	conn.close()
+	assert df.shape[0] == 2 * res.data.shape[0]
+	assert df['Travel Time (min)'].isna().sum() == res.data.shape[0]
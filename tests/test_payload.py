@@ -0,0 +1,102 @@
+'''
+	The pages under tests/test_data/pages are synthetic: the .json line recordings and the .html
+	sources with their AF_initDataCallback blobs were written by hand after Google Flights' page
+	layout, not saved from live pages. They pin the parsers to that assumed layout only.
+'''
+import pytest
+import shutil
+from datetime import datetime
+import pandas as pd
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.flight import Flight
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.replay import ReplayDriver, load_page, load_source, page_path, record_pages
+from google_flight_analysis.payload import *
+
+PAGES = 'tests/test_data/pages'
+
+SHARED = [
+	'Departure datetime', 'Arrival datetime', 'Origin', 'Destination', 'Travel Time', 'Price ($)',
+	'Num Stops', 'Layover', 'CO2 Emission (kg)', 'Emission Diff (%)', 'Round Trip', 'Round Trip Return Date',
+	'Travel Time (min)', 'Stop Airports', 'Marketing Carrier', 'Operating Carrier'
+]
+
+def replay_pool(directory = PAGES):
+	return DriverPool(factory = lambda: ReplayDriver(directory))
+
+def frames(*args):
+	obj = Scrape(*args)
+	url, date = obj.url[0], obj.date[0]
+	text = Flight.dataframe(Scrape._iter_flights(load_page(PAGES, url)['lines'], date))
+	payload = Flight.dataframe(payload_flights(load_source(PAGES, url), date, return_date_of(url)))
+	return text, payload
+
+@pytest.fixture
+def payload_extractor():
+	use_extractor('payload')
+	yield
+	use_extractor('text')
+
+def test_extract_blobs():
+	html = load_source(PAGES, Scrape("JFK", "IST", "2023-12-05").url[0])
+	blobs = extract_blobs(html)
+	assert sorted(blobs) == ['ds:0', 'ds:1']
+	assert find_results(html) == blobs['ds:1']
+	assert find_results('<html><script>AF_initDataCallback({key: \'ds:0\', data:[1, 2], sideChannel: {}});</script></html>') is None
+	# result sections without a single flight entry
+	assert find_results('<html><script>AF_initDataCallback({key: \'ds:0\', data:[null, null, [[]], [[]]], sideChannel: {}});</script></html>') is None
+
+@pytest.mark.parametrize('args', [("JFK", "IST", "2023-12-05"), ("LGA", "RDU", "2023-05-15", "2023-06-15")])
+def test_payload_matches_text(args):
+	text, payload = frames(*args)
+	n = text.shape[0]
+	for column in SHARED:
+		left, right = text[column].astype(object), payload[column].iloc[:n].astype(object)
+		assert left.fillna(-1).tolist() == right.fillna(-1).tolist(), column
+
+def test_payload_keeps_what_text_loses():
+	text, payload = frames("JFK", "IST", "2023-12-05")
+	# the last listed flight has no closing line in the text view
+	assert payload.shape[0] == text.shape[0] + 1 and payload['Airline(s)'].iloc[-1] == 'Pegasus'
+	# multi-stop layovers have minutes, multiple airlines are separated
+	assert pd.isna(text['Layover (min)'][3]) and payload['Layover (min)'][3] == 135
+	assert text['Airline(s)'][2] == 'LOTDelta' and payload['Airline(s)'][2] == 'LOT, Delta'
+
+def test_return_date_of():
+	assert return_date_of(Scrape("LGA", "RDU", "2023-05-15", "2023-06-15").url[0]) == '2023-06-15'
+	assert return_date_of(Scrape("JFK", "IST", "2023-12-05").url[0]) is None
+
+def test_from_fields():
+	flight = Flight.from_fields(
+		'2023-12-05', 'JFK', 'IST', datetime(2023, 12, 5, 22, 45), datetime(2023, 12, 6, 16, 25),
+		airline = 'Turkish Airlines', flight_time = '9 hr 40 min', num_stops = 0, price = 612
+	)
+	df = Flight.dataframe([flight])
+	assert df['Travel Time (min)'][0] == 580 and df['Marketing Carrier'][0] == 'TK'
+	assert flight.time_arrive == datetime(2023, 12, 6, 16, 25) and flight.price == 612
+
+def test_scrape_with_payload(payload_extractor):
+	res = Scrape("LGA", "RDU", "2023-05-15", "2023-06-15")
+	ScrapeObjects(res, pool = replay_pool())
+	assert res.data.shape[0] == 5
+	assert list(res.data['Price ($)']) == [148, 158, 168, 158, 229]
+	assert (res.data['Round Trip Return Date'] == '2023-06-15').all()
+
+def test_payload_falls_back_to_text(payload_extractor, tmp_path):
+	# only the lines were recorded, so the page source has no blob
+	url = Scrape("JFK", "IST", "2023-12-05").url[0]
+	shutil.copy(page_path(PAGES, url), str(tmp_path))
+
+	res = Scrape("JFK", "IST", "2023-12-05")
+	ScrapeObjects(res, pool = replay_pool(str(tmp_path)))
+	assert list(res.data['Price ($)']) == [612, 655, 548, 1139]
+
+def test_record_source(payload_extractor, tmp_path):
+	res = Scrape("JFK", "IST", "2023-12-05")
+	record_pages(str(tmp_path))
+	try:
+		ScrapeObjects(res, pool = replay_pool())
+	finally:
+		record_pages(None)
+	assert load_source(str(tmp_path), res.url[0]) == load_source(PAGES, res.url[0])
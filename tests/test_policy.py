@@ -0,0 +1,100 @@
+import pytest
+import threading
+import time
+from selenium.common.exceptions import TimeoutException
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.policy import *
+from google_flight_analysis.replay import load_page
+
+PAGE = load_page('tests/test_data/pages', Scrape("JFK", "IST", "2023-12-05").url[0])
+
+class FlakyDriver:
+	'''
+		Times out on the first `failures` page loads of every URL containing `bad`.
+	'''
+	def __init__(self, failures, bad = ''):
+		self.failures = failures
+		self.bad = bad
+		self.loads = 0
+
+	def get(self, url):
+		self.url = url
+
+	def find_element(self, *args, **kwargs):
+		raise Exception("no consent form")
+
+	def set_script_timeout(self, timeout):
+		pass
+
+	def execute_async_script(self, script, *args):
+		self.loads += 1
+		if self.bad in self.url and self.loads <= self.failures:
+			raise TimeoutException()
+		return PAGE
+
+@pytest.fixture
+def fast_policy(monkeypatch):
+	monkeypatch.setattr(_Scrape, 'retry_policy', RetryPolicy(retries = 2, backoff = 0))
+	monkeypatch.setattr(_Scrape, 'circuit_breaker', CircuitBreaker(threshold = 100))
+
+def test_delay():
+	policy = RetryPolicy(backoff = 1, max_backoff = 3, jitter = 0.5)
+	assert 0.5 <= policy.delay(0) <= 1 and 1 <= policy.delay(1) <= 2
+	assert policy.delay(10) <= 3
+
+def test_retry_then_success(fast_policy):
+	driver = FlakyDriver(failures = 2)
+	df = _Scrape._get_results(PAGE['url'], '2023-12-05', driver)
+	assert df.shape[0] == 4 and driver.loads == 3
+
+def test_failed_leg_reported(fast_policy):
+	res = Scrape("JFK", "AMS", "2023-11-10", "CDG", "AMS", "2023-11-17")
+	res._scrape_data(FlakyDriver(failures = 100, bad = 'CDG'))
+
+	assert res.data.shape[0] == 4, "The successful leg was lost."
+	assert len(res.failures) == 1
+	assert res.failures[0]['url'] == res.url[1] and res.failures[0]['attempts'] == 3
+	assert res.failures[0]['error'] == 'TimeoutException'
+
+def test_breaker_opens_and_pauses():
+	breaker = CircuitBreaker(threshold = 2, cooldown = 0.2)
+	breaker.record(False)
+	assert breaker.state == 'closed'
+	breaker.record(False)
+	assert breaker.state == 'open' and breaker.trips == 1
+
+	start = time.monotonic()
+	breaker.wait()
+	assert time.monotonic() - start >= 0.15
+	assert breaker.state == 'half-open'
+
+	breaker.record(True)
+	assert breaker.state == 'closed'
+
+def test_half_open_lets_one_trial_through():
+	breaker = CircuitBreaker(threshold = 1, cooldown = 0.1, trial_timeout = 10)
+	breaker.record(False)
+
+	passed = []
+	def worker(n):
+		breaker.wait()
+		passed.append(n)
+
+	threads = [threading.Thread(target = worker, args = (n,)) for n in range(3)]
+	for thread in threads:
+		thread.start()
+	time.sleep(0.3)
+	assert len(passed) == 1, "Only the trial should go through."
+
+	# a failed trial opens the breaker again, the next trial follows the cooldown
+	breaker.record(False)
+	time.sleep(0.05)
+	assert len(passed) == 1 and breaker.trips == 2
+	time.sleep(0.2)
+	assert len(passed) == 2
+
+	breaker.record(True)
+	for thread in threads:
+		thread.join()
+	assert len(passed) == 3 and breaker.state == 'closed'
@@ -0,0 +1,72 @@
+import functools
+import os
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.replay import ReplayDriver
+from google_flight_analysis.procpool import *
+from google_flight_analysis.result_cache import ResultCache, use_result_cache
+
+PAGES = 'tests/test_data/pages'
+
+class CrashOnceDriver(ReplayDriver):
+	'''
+		Kills its worker process on the first page load, leaving a marker so it happens once.
+	'''
+	def __init__(self, directory, marker):
+		super().__init__(directory)
+		self.marker = marker
+
+	def get(self, url):
+		if not os.path.exists(self.marker):
+			open(self.marker, 'w').close()
+			os._exit(1)
+		super().get(url)
+
+def plan():
+	return [Scrape("JFK", "IST", "2023-12-05"), Scrape("LGA", "RDU", "2023-05-15", "2023-06-15"), Scrape("JFK", "IST", "2023-12-05")]
+
+def replayed():
+	objs = plan()
+	ScrapeObjects(objs, pool = DriverPool(factory = lambda: ReplayDriver(PAGES)))
+	return objs
+
+def test_encode_round_trip():
+	for obj in replayed():
+		back = decode_frame(encode_frame(obj.data))
+		assert back.equals(obj.data) and (back.dtypes == obj.data.dtypes).all()
+
+def test_processes_match_threads():
+	expected = replayed()
+	done = []
+	objs = scrape_processes(plan(), processes = 2, factory = functools.partial(ReplayDriver, PAGES), on_done = done.append)
+
+	assert len(done) == 3
+	for obj, ref in zip(objs, expected):
+		assert obj.data.equals(ref.data)
+
+def test_worker_crash_isolated(tmp_path):
+	factory = functools.partial(CrashOnceDriver, PAGES, str(tmp_path / 'crashed'))
+	objs = scrape_processes(plan()[:2], processes = 1, factory = factory)
+
+	assert os.path.exists(str(tmp_path / 'crashed'))
+	assert objs[0].data.shape[0] == 4 and objs[1].data.shape[0] == 4
+
+def test_error_frees_worker():
+	# 2023-12-07 was never recorded, the replay raises FileNotFoundError
+	objs = scrape_processes([Scrape('JFK', 'IST', '2023-12-07'), Scrape('JFK', 'IST', '2023-12-05')],
+		processes = 1, factory = functools.partial(ReplayDriver, PAGES))
+
+	assert objs[0].data.empty and objs[0].failures[0]['error'] == 'FileNotFoundError'
+	assert objs[1].data.shape[0] == 4
+
+def test_workers_get_settings(tmp_path):
+	cache = ResultCache(str(tmp_path / 'cache'))
+	cache.put(Scrape('JFK', 'IST', '2023-12-05').url[0], replayed()[0].data)
+	use_result_cache(cache)
+	try:
+		# nothing is recorded, so the page can only come from the cache directory
+		objs = scrape_processes(Scrape('JFK', 'IST', '2023-12-05'), processes = 1, factory = functools.partial(ReplayDriver, str(tmp_path)))
+	finally:
+		use_result_cache(None)
+	assert objs[0].data.shape[0] == 4
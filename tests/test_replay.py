@@ -0,0 +1,68 @@
+import pytest
+import pandas as pd
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.replay import *
+
+PAGES = 'tests/test_data/pages'
+
+def replay_pool(directory = PAGES):
+	return DriverPool(factory = lambda: ReplayDriver(directory))
+
+def test_replay_one_way():
+	res = Scrape("JFK", "IST", "2023-12-05")
+	ScrapeObjects(res, pool = replay_pool())
+
+	assert res.data.shape[0] == 4, "Replay produced {} flights.".format(res.data.shape[0])
+	assert list(res.data['Price ($)']) == [612, 655, 548, 1139]
+	assert list(res.data['Num Stops']) == [0, 0, 1, 2]
+	assert (res.data['Origin'] == 'JFK').all() and (res.data['Destination'] == 'IST').all()
+	assert res.data['Arrival datetime'][0] == pd.Timestamp('2023-12-06 16:25')
+
+def test_replay_round_trip():
+	res = Scrape("LGA", "RDU", "2023-05-15", "2023-06-15")
+	ScrapeObjects(res, pool = replay_pool())
+
+	assert res.data.shape[0] == 4
+	assert res.data['Round Trip'].all()
+	assert (res.data['Round Trip Return Date'] == '2023-06-15').all()
+	assert res.data['Airline(s)'][0] == 'American'
+
+def test_replay_missing_page():
+	driver = ReplayDriver(PAGES)
+	with pytest.raises(FileNotFoundError):
+		driver.get('https://www.google.com/travel/flights?q=nowhere')
+
+class LiveDriver:
+	def __init__(self, page):
+		self.page = page
+
+	def get(self, url):
+		pass
+
+	def find_element(self, *args, **kwargs):
+		raise Exception("no consent form")
+
+	def set_script_timeout(self, timeout):
+		pass
+
+	def execute_async_script(self, script, *args):
+		return self.page
+
+def test_record_then_replay(tmp_path):
+	page = load_page(PAGES, Scrape("JFK", "IST", "2023-12-05").url[0])
+	res = Scrape("CDG", "JFK", "2023-12-15")
+
+	record_pages(str(tmp_path))
+	try:
+		res._scrape_data(LiveDriver(page))
+	finally:
+		record_pages(None)
+
+	replayed = Scrape("CDG", "JFK", "2023-12-15")
+	ScrapeObjects(replayed, pool = replay_pool(str(tmp_path)))
+	assert replayed.data.drop(columns = 'Access Date').equals(res.data.drop(columns = 'Access Date'))
+
+def test_parse_throughput():
+	assert parse_throughput(PAGES, repeat = 2) > 0
@@ -0,0 +1,85 @@
+import time
+import pandas as pd
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.replay import ReplayDriver
+from google_flight_analysis.result_cache import *
+
+URL = 'https://www.google.com/travel/flights?hl=en&q=Flights%20to%20JFK%20from%20IST%20on%202023-12-05%20oneway&curr=USD'
+DF = pd.DataFrame({'Price ($)': [100, 200]})
+
+def test_key():
+	assert cache_key(URL) == cache_key(URL.replace('hl=en&', '') + '&hl=EN')
+	assert cache_key(URL) != cache_key(URL.replace('curr=USD', 'curr=EUR'))
+
+def test_memory_hit_and_copy():
+	cache = ResultCache()
+	assert cache.get(URL) is None
+	cache.put(URL, DF)
+	hit = cache.get(URL)
+	hit.loc[0, 'Price ($)'] = 0
+	assert cache.get(URL).equals(DF), "Cached frame was mutated through a returned copy."
+	assert cache.hits == 2 and cache.misses == 1
+
+def test_ttl():
+	cache = ResultCache(ttl = 0.05)
+	cache.put(URL, DF)
+	time.sleep(0.1)
+	assert cache.get(URL) is None
+
+def test_empty_frames(tmp_path):
+	cache = ResultCache(directory = str(tmp_path))
+	cache.put(URL, pd.DataFrame())
+	assert cache.get(URL) is None and len(list(tmp_path.iterdir())) == 0
+
+	cache = ResultCache(empty_ttl = 0.05)
+	cache.put(URL, DF.iloc[:0])
+	assert cache.get(URL).empty
+	time.sleep(0.1)
+	assert cache.get(URL) is None
+
+def test_empty_page_not_cached(monkeypatch):
+	# a page that hadn't rendered (or an interstitial) reads as no flights
+	monkeypatch.setattr(_Scrape, '_request_flights', staticmethod(lambda url, date, driver, timeout: []))
+	cache = ResultCache()
+	use_result_cache(cache)
+	try:
+		assert _Scrape._get_results(URL, '2023-12-05', None).empty
+	finally:
+		use_result_cache(None)
+	assert len(cache) == 0
+
+def test_lru():
+	cache = ResultCache(max_entries = 2)
+	urls = [URL.replace('2023-12-05', '2023-12-0{}'.format(d)) for d in range(1, 4)]
+	cache.put(urls[0], DF)
+	cache.put(urls[1], DF)
+	cache.get(urls[0])
+	cache.put(urls[2], DF)
+	assert cache.get(urls[1]) is None and cache.get(urls[0]) is not None
+
+def test_disk_tier(tmp_path):
+	ResultCache(directory = str(tmp_path)).put(URL, DF)
+	assert ResultCache(directory = str(tmp_path)).get(URL).equals(DF)
+
+def test_disk_size_eviction(tmp_path):
+	cache = ResultCache(directory = str(tmp_path), max_bytes = 1)
+	cache.put(URL, DF)
+	assert len(list(tmp_path.iterdir())) == 0
+
+def no_browser():
+	raise AssertionError("Browser started for a cached query.")
+
+def test_scrape_uses_cache():
+	use_result_cache(ResultCache())
+	try:
+		first = Scrape("JFK", "IST", "2023-12-05")
+		ScrapeObjects(first, pool = DriverPool(factory = lambda: ReplayDriver('tests/test_data/pages')))
+
+		second = Scrape("JFK", "IST", "2023-12-05")
+		ScrapeObjects(second, pool = DriverPool(factory = no_browser))
+	finally:
+		use_result_cache(None)
+
+	assert second.data.equals(first.data)
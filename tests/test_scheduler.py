@@ -0,0 +1,80 @@
+import psutil
+import subprocess
+import sys
+import threading
+import time
+
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.scheduler import *
+
+MB = 2**20
+
+class ProcessDriver:
+	'''
+		Stands in for a browser: a child process holding `mb` MB, plus a grandchild.
+	'''
+	def __init__(self, mb = 60):
+		code = "import subprocess, sys, time; subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']); b = b'x' * {n}; time.sleep(30)".format(n = mb * MB)
+		self.process = subprocess.Popen([sys.executable, '-c', code])
+		self.pid = self.process.pid
+		self.quit_called = False
+
+	@property
+	def current_url(self):
+		return "about:blank"
+
+	def quit(self):
+		self.quit_called = True
+		for child in psutil.Process(self.pid).children(recursive = True):
+			child.kill()
+		self.process.kill()
+		self.process.wait()
+
+def wait_rss(driver, mb):
+	for _ in range(100):
+		if process_tree_rss(driver.pid) > mb * MB:
+			return
+		time.sleep(0.05)
+	raise AssertionError("Process never reached {} MB.".format(mb))
+
+def test_tree_rss():
+	driver = ProcessDriver(mb = 60)
+	try:
+		wait_rss(driver, 60)
+		while not psutil.Process(driver.pid).children():
+			time.sleep(0.01)
+		assert process_tree_rss(driver.pid) > psutil.Process(driver.pid).memory_info().rss, 'Children not counted.'
+	finally:
+		driver.quit()
+
+def test_budget_limits_browsers():
+	scheduler = ResourceScheduler(max_memory = 100 * MB, max_cpu = 100.1, reserve = 0, estimate = 0)
+	pool = DriverPool(size = 3, factory = ProcessDriver, scheduler = scheduler, poll = 0.05)
+	try:
+		first = pool.acquire()
+		wait_rss(first, 60)
+		assert not scheduler.admits(1), "A second 60 MB browser fits in 100 MB."
+
+		got = []
+		waiter = threading.Thread(target = lambda: got.append(pool.acquire()))
+		waiter.start()
+		waiter.join(0.3)
+		assert waiter.is_alive() and pool._created == 1
+
+		pool.release(first)
+		waiter.join(2)
+		assert got == [first]
+		pool.release(first)
+	finally:
+		pool.close()
+
+def test_oversized_recycled():
+	scheduler = ResourceScheduler(max_memory = 10**12, recycle_rss = 30 * MB, reserve = 0)
+	pool = DriverPool(size = 1, factory = ProcessDriver, scheduler = scheduler)
+	try:
+		with pool.driver() as driver:
+			wait_rss(driver, 60)
+		assert driver.quit_called and pool._created == 0
+		assert scheduler.usage() == 0
+	finally:
+		pool.close()
@@ -0,0 +1,111 @@
+import pytest
+import json
+import shutil
+import subprocess
+import pandas as pd
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.scrape import _RESULTS_SCRIPT
+
+class PageDriver:
+	'''
+		Minimal driver answering the results wait with a canned page.
+	'''
+	def __init__(self, page):
+		self.page = page
+		self.scripts = []
+
+	def get(self, url):
+		self.url = url
+
+	def find_element(self, *args, **kwargs):
+		raise Exception("no consent form")
+
+	def set_script_timeout(self, timeout):
+		self.timeout = timeout
+
+	def execute_async_script(self, script, *args):
+		self.scripts += [script]
+		return self.page
+
+def test_wait_ready():
+	driver = PageDriver({'state': 'ready', 'lines': ['Sort by:', '$100']})
+	lines = _Scrape._make_url_request('url', driver, timeout = 5)
+	assert lines == ['Sort by:', '$100'] and driver.timeout == 5
+	assert driver.scripts == [_RESULTS_SCRIPT], "Results should be read in one script call."
+
+def test_wait_no_flights():
+	driver = PageDriver({'state': 'empty', 'lines': []})
+	assert _Scrape._make_url_request('url', driver) == []
+
+def test_no_flights_results():
+	driver = PageDriver({'state': 'empty', 'lines': []})
+	df = _Scrape._get_results('url', '2023-12-05', driver)
+	assert isinstance(df, pd.DataFrame) and df.shape[0] == 0
+
+def page_lines(url_args):
+	from google_flight_analysis.replay import load_page
+	return load_page('tests/test_data/pages', Scrape(*url_args).url[0])['lines']
+
+def test_iter_flights_streams():
+	lines = page_lines(("JFK", "IST", "2023-12-05"))
+	flights = _Scrape._iter_flights(lines, "2023-12-05")
+	assert next(flights).price == 612, "First flight should be yielded before the page is consumed."
+	assert [f.price for f in flights] == [655, 548, 1139]
+
+def test_iter_flights_late_return_date():
+	lines = page_lines(("LGA", "RDU", "2023-05-15", "2023-06-15"))
+	lines = [l.replace(" returning 2023-06-15", "") for l in lines] + ["returning 2023-06-20"]
+	flights = _Scrape._clean_results(lines, "2023-05-15")
+	assert len(flights) == 4 and all(f.round_trip_return_date == "2023-06-20" for f in flights)
+
+def test_iter_flights_non_ascii():
+	lines = page_lines(("JFK", "IST", "2023-12-05"))
+	# route lines hold an en dash ("JFK–IST"), pad every line with a zero width space too
+	flights = _Scrape._clean_results([l + "\u200b" for l in lines], "2023-12-05")
+	assert [f.origin for f in flights] == ["JFK"] * 4
+
+
+# runs _RESULTS_SCRIPT on a page in jsdom; jsdom has no layout, so innerText is emulated
+# with one line per leaf element
+JSDOM_HARNESS = """
+const {JSDOM} = require('jsdom');
+const [html, script, later] = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const window = new JSDOM(html, {runScripts: 'outside-only'}).window;
+Object.defineProperty(window.HTMLElement.prototype, 'innerText', {get() {
+	return Array.from(this.querySelectorAll('*')).filter(e => !e.children.length).map(e => e.textContent).join('\\n');
+}});
+window.resolve = result => { console.log(JSON.stringify(result)); process.exit(0); };
+if (later) setTimeout(() => { window.document.querySelector('[role="main"]').insertAdjacentHTML('beforeend', later); }, 50);
+window.eval('(function () {' + script + '})(resolve)');
+setTimeout(() => { console.log('null'); process.exit(0); }, 5000);
+"""
+
+def _has_jsdom():
+	node = shutil.which('node')
+	return node is not None and subprocess.run([node, '-e', "require('jsdom')"], capture_output = True).returncode == 0
+
+def run_results_script(html, later = None):
+	out = subprocess.run([shutil.which('node'), '-e', JSDOM_HARNESS], input = json.dumps([html, _RESULTS_SCRIPT, later]),
+		capture_output = True, text = True, timeout = 30, check = True)
+	return json.loads(out.stdout)
+
+LIST = '<div>Sort by:</div><ul><li><span>10:45 PM</span><span>4:25 PM+1</span></li></ul>'
+
+@pytest.mark.skipif(not _has_jsdom(), reason = "needs node with jsdom")
+@pytest.mark.parametrize('html, later, state', [
+	('<div role="main">' + LIST + '<h3>Other flights</h3><button>12 more flights</button></div>', None, 'ready'),
+	('<div role="main"></div>', LIST + '<h3>Other departing flights</h3>', 'ready'),
+	# no header nor expander, ready once the list stops changing
+	('<div role="main">' + LIST + '</div>', None, 'ready'),
+	('<div role="main"><div role="status">No results returned.</div></div>', None, 'empty')
+])
+def test_results_script(html, later, state):
+	result = run_results_script('<html><body>' + html + '</body></html>', later)
+	assert result['state'] == state
+	assert ('Sort by:' in result['lines']) == (state == 'ready')
+
+@pytest.mark.skipif(not _has_jsdom(), reason = "needs node with jsdom")
+def test_results_script_returning_line():
+	html = '<html><body><div>Round trip, returning 2023-06-15</div><div role="main">' + LIST + '<h3>Other flights</h3></div></body></html>'
+	assert run_results_script(html)['lines'][0] == 'returning 2023-06-15'
@@ -0,0 +1,66 @@
+import threading
+import time
+import pandas as pd
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.engine import scrape_objects
+from google_flight_analysis.singleflight import *
+
+def test_shared_call():
+	flight = SingleFlight()
+	calls = []
+	results = []
+
+	def slow():
+		calls.append(1)
+		time.sleep(0.1)
+		return object()
+
+	threads = [threading.Thread(target = lambda: results.append(flight.do('key', slow))) for _ in range(5)]
+	[t.start() for t in threads]
+	[t.join() for t in threads]
+
+	assert len(calls) == 1, "{} calls for one key.".format(len(calls))
+	assert len(results) == 5 and all(r is results[0] for r in results)
+
+def test_shared_error():
+	flight = SingleFlight()
+	errors = []
+
+	def fail():
+		time.sleep(0.05)
+		raise ValueError("boom")
+
+	def call():
+		try:
+			flight.do('key', fail)
+		except ValueError as e:
+			errors.append(e)
+
+	threads = [threading.Thread(target = call) for _ in range(3)]
+	[t.start() for t in threads]
+	[t.join() for t in threads]
+	assert len(errors) == 3
+
+class Driver:
+	def quit(self):
+		pass
+
+	@property
+	def current_url(self):
+		return "about:blank"
+
+def test_duplicate_queries_navigate_once(monkeypatch):
+	fetched = []
+
+	def fetch_results(url, date, driver):
+		fetched.append(url)
+		time.sleep(0.1)
+		return pd.DataFrame({'url': [url]})
+
+	monkeypatch.setattr(_Scrape, '_fetch_results', staticmethod(fetch_results))
+	objs = [Scrape("JFK", "IST", "2023-12-05") for _ in range(4)]
+	scrape_objects(objs, concurrency = 4, pool = DriverPool(size = 4, factory = Driver))
+
+	assert len(fetched) == 1 and all(obj.data.shape[0] == 1 for obj in objs)
@@ -0,0 +1,46 @@
+import pytest
+import pandas as pd
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.spec import *
+
+def test_parse_matches_scrape():
+	for args in [
+		("JFK", "IST", "2023-12-05"),
+		("LGA", "RDU", "2023-05-15", "2023-06-15"),
+		("JFK", "AMS", "2023-11-10", "CDG", "AMS", "2023-11-17", "AMS", "IST", "2023-11-25"),
+		("JFK", "2023-11-10", "AMS", "2023-11-17", "CDG", "2023-11-20", "IST", "2023-11-25", "JFK")
+	]:
+		spec = QuerySpec.parse(*args)
+		obj = Scrape(*args)
+		assert spec.args == args and obj.spec == spec
+		assert list(spec.url) == obj.url and spec.type == obj.type
+
+def test_hashable():
+	assert len({QuerySpec.parse("JFK", "IST", "2023-12-05"), QuerySpec.parse("JFK", "IST", "2023-12-05")}) == 1
+	with pytest.raises(AttributeError):
+		QuerySpec.parse("JFK", "IST", "2023-12-05").type = 'round-trip'
+
+def test_call_leaves_singleton_and_stdout(capsys):
+	Scrape("JFK", "IST", "2023-12-05")
+	Scrape("LGA", "RDU", "2023-05-15", "2023-06-15")
+	assert Scrape.spec is None and Scrape.origin is None
+	assert capsys.readouterr().out == ""
+
+def test_order_checked():
+	with pytest.raises(AssertionError):
+		QuerySpec.parse("LGA", "RDU", "2023-06-15", "2023-05-15")
+
+def test_plan_one_way():
+	specs = plan_queries(["JFK", "LGA", "JFK"], ["IST"], pd.date_range("2023-12-05", "2023-12-07"))
+	assert len(specs) == 6
+	assert specs == [QuerySpec.parse(o, "IST", d) for d in ["2023-12-05", "2023-12-06", "2023-12-07"] for o in ["JFK", "LGA"]]
+
+def test_plan_round_trip():
+	specs = plan_queries(["LGA"], ["RDU", "CLT"], ["2023-05-15", "2023-05-16"], ["2023-05-16", "2023-06-15"])
+	expected = [
+		QuerySpec.parse("LGA", dest, depart, ret)
+		for depart, ret in [("2023-05-15", "2023-05-16"), ("2023-05-15", "2023-06-15"), ("2023-05-16", "2023-06-15")]
+		for dest in ["RDU", "CLT"]
+	]
+	assert specs == expected
@@ -0,0 +1,73 @@
+import pytest
+import time
+import threading
+import pandas as pd
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.engine import scrape_objects
+from google_flight_analysis.throttle import *
+
+def test_token_bucket_rate():
+	bucket = TokenBucket(pages_per_minute = 1200) # 20 per second
+	start = time.monotonic()
+	for _ in range(6):
+		bucket.acquire()
+	assert time.monotonic() - start >= 0.2
+
+def test_additive_increase():
+	controller = AIMDController(min_workers = 1, max_workers = 4, start = 1)
+	for _ in range(1 + 2 + 3):
+		controller.record(0.1, True)
+	assert controller.limit == 4
+
+def test_multiplicative_decrease():
+	controller = AIMDController(min_workers = 1, max_workers = 8, cooldown = 60)
+	controller.record(1.0, False)
+	assert controller.limit == 4
+	controller.record(1.0, False)
+	assert controller.limit == 4, "Decreased twice within the cooldown."
+
+def test_slow_page_decreases():
+	controller = AIMDController(max_workers = 8, target_latency = 1.0)
+	controller.record(5.0, True)
+	assert controller.limit == 4 and controller.pages_per_minute == 1
+
+def test_slot_failure():
+	throttle = Throttle(max_workers = 2)
+	with pytest.raises(ValueError):
+		with throttle.slot():
+			raise ValueError()
+	assert throttle.controller.limit == 1
+
+	with throttle.slot() as slot:
+		slot.ok = False
+	assert throttle.controller.limit == 1
+
+class Driver:
+	def quit(self):
+		pass
+
+	@property
+	def current_url(self):
+		return "about:blank"
+
+def test_engine_respects_limit(monkeypatch):
+	state = {'active': 0, 'peak': 0}
+	lock = threading.Lock()
+
+	def get_results(url, date, driver):
+		with lock:
+			state['active'] += 1
+			state['peak'] = max(state['peak'], state['active'])
+		time.sleep(0.02)
+		with lock:
+			state['active'] -= 1
+		return pd.DataFrame({'url': [url]})
+
+	monkeypatch.setattr(_Scrape, '_get_results', staticmethod(get_results))
+	throttle = Throttle(max_workers = 2)
+	objs = [Scrape("JFK", "IST", "2023-12-{:02d}".format(d)) for d in range(1, 11)]
+	scrape_objects(objs, concurrency = 6, pool = DriverPool(size = 6, factory = Driver), throttle = throttle)
+
+	assert state['peak'] <= 2 and throttle.controller.pages_per_minute == 10
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.replay import ReplayDriver
+from google_flight_analysis.workqueue import *
+
+PAGES = 'tests/test_data/pages'
+
+def plan():
+	return [Scrape("JFK", "IST", "2023-12-05"), Scrape("LGA", "RDU", "2023-05-15", "2023-06-15")]
+
+def test_two_nodes(tmp_path):
+	path = str(tmp_path / 'queue.sqlite')
+	SQLiteWorkQueue(path).put(plan() + plan())
+
+	counts = []
+	def node(name):
+		queue = SQLiteWorkQueue(path) # every node opens the shared file itself
+		counts.append(run_worker(queue, pool = DriverPool(factory = lambda: ReplayDriver(PAGES)), worker = name, poll = 0.01))
+
+	nodes = [threading.Thread(target = node, args = ('node{}'.format(i),)) for i in range(2)]
+	for thread in nodes:
+		thread.start()
+	for thread in nodes:
+		thread.join()
+
+	queue = SQLiteWorkQueue(path)
+	objs = plan()
+	assert sum(counts) == 2 and queue.counts() == {'done': 2}
+	assert queue.load(objs) == []
+	assert objs[0].data.shape[0] == 4 and objs[1].data['Round Trip'].all()
+
+def test_expired_lease_requeued(tmp_path):
+	queue = SQLiteWorkQueue(str(tmp_path / 'queue.sqlite'), lease_ttl = 0.05)
+	queue.put(plan()[0])
+
+	task = queue.lease('crashed')
+	assert queue.lease('other') is None
+	time.sleep(0.1)
+
+	assert not queue.heartbeat(task)
+	retry = queue.lease('other')
+	assert retry.id == task.id and retry.attempts == 2
+
+def test_failed_after_max_attempts(tmp_path):
+	queue = SQLiteWorkQueue(str(tmp_path / 'queue.sqlite'), max_attempts = 2)
+	queue.put(plan()[0])
+
+	queue.fail(queue.lease('a'), 'boom')
+	assert queue.counts() == {'pending': 1}
+	queue.fail(queue.lease('a'), 'boom')
+	assert queue.counts() == {'failed': 1} and queue.finished()
+
+def test_worker_survives_failing_task(tmp_path):
+	queue = SQLiteWorkQueue(str(tmp_path / 'queue.sqlite'), max_attempts = 1)
+	# 2023-12-07 was never recorded, so its task raises; the next one needs the same browser slot
+	queue.put([Scrape("JFK", "IST", "2023-12-07"), Scrape("JFK", "IST", "2023-12-05")])
+
+	pool = DriverPool(size = 1, factory = lambda: ReplayDriver(PAGES))
+	assert run_worker(queue, pool = pool, wait = False) == 1
+	assert queue.counts() == {'done': 1, 'failed': 1}
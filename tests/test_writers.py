@@ -0,0 +1,110 @@
+import pytest
+import pandas as pd
+
+from google_flight_analysis.scrape import *
+from google_flight_analysis.driver import DriverPool
+from google_flight_analysis.replay import ReplayDriver
+from google_flight_analysis.writers import *
+from google_flight_analysis.fuzzy.fuzzy_date import FuzzyDateScrape
+
+PAGES = 'tests/test_data/pages'
+
+def batches():
+	objs = [Scrape("JFK", "IST", "2023-12-05"), Scrape("LGA", "RDU", "2023-05-15", "2023-06-15")]
+	ScrapeObjects(objs, pool = DriverPool(factory = lambda: ReplayDriver(PAGES)))
+	return [obj.data for obj in objs]
+
+def check(df, frames):
+	expected = pd.concat(frames, ignore_index = True)
+	assert df.shape == expected.shape and list(df.columns) == list(expected.columns)
+	assert list(df['Price ($)']) == list(expected['Price ($)'])
+	assert list(df['Airline(s)'].astype(str)) == list(expected['Airline(s)'].astype(str))
+	assert (pd.to_datetime(df['Departure datetime']) == expected['Departure datetime']).all()
+
+@pytest.mark.parametrize('name', ['out.csv', 'out.db'])
+def test_roundtrip(tmp_path, name):
+	frames = batches()
+	with open_writer(str(tmp_path / name)) as writer:
+		for df in frames:
+			writer.write(df)
+		writer.write(pd.DataFrame())
+
+	assert writer.rows == 8 and writer.batches == 2
+	check(writer.read(), frames)
+
+@pytest.mark.parametrize('name', ['out.parquet', 'out.arrow'])
+def test_roundtrip_arrow(tmp_path, name):
+	pytest.importorskip('pyarrow')
+	frames = batches()
+	with open_writer(str(tmp_path / name)) as writer:
+		for df in frames:
+			writer.write(df)
+	check(writer.read(), frames)
+
+def test_parquet_row_groups(tmp_path):
+	pq = pytest.importorskip('pyarrow.parquet')
+	frames = batches() * 3
+	with ParquetWriter(str(tmp_path / 'out.parquet'), row_group_size = 8) as writer:
+		for df in frames:
+			writer.write(df)
+	assert pq.ParquetFile(writer.path).num_row_groups == 3
+
+def test_csv_append(tmp_path):
+	frames = batches()
+	with CsvWriter(str(tmp_path / 'out.csv')) as writer:
+		writer.write(frames[0])
+	with CsvWriter(str(tmp_path / 'out.csv'), append = True) as writer:
+		writer.write(frames[1])
+
+	# one header, rows of both runs
+	check(read_results(writer.path), frames)
+
+def test_sqlite_replaces_table(tmp_path):
+	frames = batches()
+	for _ in range(2):
+		with SqliteWriter(str(tmp_path / 'out.db')) as writer:
+			writer.write(frames[0])
+	assert read_results(writer.path).shape[0] == frames[0].shape[0]
+
+def test_excel_post_step(tmp_path):
+	pytest.importorskip('openpyxl')
+	frames = batches()
+	with open_writer(str(tmp_path / 'out.xlsx')) as writer:
+		for df in frames:
+			writer.write(df)
+	assert writer.read().shape[0] == 8 and not (tmp_path / 'out.staging.csv').exists()
+
+def test_excel_in_chunks(tmp_path):
+	pytest.importorskip('openpyxl')
+	frames = batches()
+	with ExcelExport(str(tmp_path / 'out.xlsx'), chunk_size = 3) as writer:
+		for df in frames:
+			writer.write(df)
+	check(writer.read(), frames)
+
+def test_unknown_format():
+	with pytest.raises(ValueError):
+		open_writer('out.txt')
+
+def fuzzy(monkeypatch):
+	def get_results(url, date, driver):
+		return pd.DataFrame({'Departure datetime': [pd.Timestamp(date)], 'Price ($)': [100]})
+	monkeypatch.setattr(_Scrape, '_get_results', staticmethod(get_results))
+	return FuzzyDateScrape('JFK', 'IST', '2023-12-05+2-2'), DriverPool(size = 2, factory = lambda: ReplayDriver(PAGES))
+
+def test_fuzzy_merges(monkeypatch, tmp_path):
+	search, pool = fuzzy(monkeypatch)
+	df = search.search_and_merge_multithread(str(tmp_path / 'out.csv'), max_threads = 2, pool = pool)
+
+	assert df.shape[0] == read_results(str(tmp_path / 'out.csv')).shape[0] == 5
+	assert all(obj.data.shape[0] == 1 for obj in search.generated_scrape_objs)
+
+def test_fuzzy_writes_incrementally(monkeypatch, tmp_path):
+	search, pool = fuzzy(monkeypatch)
+	writer = search.search_and_write(str(tmp_path / 'out.csv'), max_threads = 2, pool = pool)
+
+	df = writer.read()
+	assert writer.closed and df.shape[0] == len(search.generated_scrape_objs) == 5
+	assert sorted(df['Departure datetime'].dt.day) == [3, 4, 5, 6, 7]
+	# frames went to the file only
+	assert all(obj.data.empty for obj in search.generated_scrape_objs)